@@ -2,7 +2,7 @@ from setuptools import setup
 
 setup(
     name='wowicache',
-    version='1.0.24',
+    version='1.1.0',
     description='OPENWOWI Wowiport SQLAlchemy overlay',
     url='https://github.com/seb-bau/wowicache',
     author='Sebastian Bauhaus',
@@ -30,8 +30,13 @@ setup(
         'url-normalize>=1.4.3',
         'urllib3>=2.0.4',
         'wowipy>=1.1.14',
-        'SQLAlchemy>=1.4.52'
+        'SQLAlchemy>=2.0'
                       ],
+    extras_require={
+        'async': ['aiosqlite>=0.19.0', 'asyncpg>=0.28.0', 'greenlet>=2.0.2'],
+        'export': ['pyarrow>=14.0.0'],
+        'test': ['pytest>=7.0'],
+    },
 
     classifiers=[
         'Development Status :: 5 - Production/Stable',
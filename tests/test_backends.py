@@ -0,0 +1,175 @@
+import io
+from datetime import date, datetime
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from wowicache import backends
+from wowicache.backends import (LoadBackend, MySQLBackend, PostgresBackend, SQLiteBackend, _copy_date, _copy_text,
+                                create_backend)
+from wowicache.models import Base, District, UseUnit
+
+SCALE = 150
+
+
+@pytest.fixture
+def reference(tmp_path, run_sync, checksums):
+    # Generischer Pfad (einzelne ORM-Inserts) als Referenz für alle Backends
+    connection_string = f"sqlite:///{tmp_path / 'reference.db'}"
+    run_sync(connection_string, scale=SCALE, load_backend="generic")
+    return checksums(connection_string)
+
+
+@pytest.mark.parametrize("load_mode", ["orm", "bulk"])
+@pytest.mark.parametrize("load_backend", ["generic", "auto"])
+def test_sync_matches_reference(test_database_url, run_sync, checksums, reference, load_mode, load_backend):
+    run_sync(test_database_url, scale=SCALE, load_mode=load_mode, load_backend=load_backend)
+    assert checksums(test_database_url) == reference
+
+
+def test_create_backend():
+    engine = create_engine("sqlite://")
+    assert type(create_backend(engine)) is SQLiteBackend
+    assert type(create_backend(engine, "generic")) is LoadBackend
+    for dialect, backend_class in [("postgresql", PostgresBackend), ("mysql", MySQLBackend),
+                                   ("mariadb", MySQLBackend), ("mssql", LoadBackend)]:
+        assert type(create_backend(SimpleNamespace(dialect=SimpleNamespace(name=dialect)))) is backend_class
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, "\\N"),
+    (True, "t"),
+    (False, "f"),
+    (0, "0"),
+    (1.5, "1.5"),
+    ("", ""),
+    ("a\tb", "a\\tb"),
+    ("Zeile 1\nZeile 2\r\n", "Zeile 1\\nZeile 2\\r\\n"),
+    ("C:\\Daten\\N", "C:\\\\Daten\\\\N"),
+    (date(2024, 2, 29), "2024-02-29"),
+    (datetime(2024, 2, 29, 13, 5, 1), "2024-02-29 13:05:01"),
+])
+def test_copy_text(value, expected):
+    assert _copy_text(value) == expected
+
+
+def test_copy_date():
+    assert _copy_date(datetime(2024, 2, 29, 13, 5)) == "2024-02-29"
+    assert _copy_date(None) == "\\N"
+
+
+class FakePsycopg2Cursor:
+    def __init__(self):
+        self.copied = []
+        self.closed = False
+
+    def copy_expert(self, statement, buffer):
+        self.copied.append((statement, buffer.read()))
+
+    def close(self):
+        self.closed = True
+
+
+class FakePsycopg3Cursor:
+    def __init__(self):
+        self.copied = []
+        self.closed = False
+
+    def copy(self, statement):
+        cursor = self
+
+        class Copy:
+            def __enter__(self):
+                self.buffer = io.StringIO()
+                return self
+
+            def write(self, data):
+                self.buffer.write(data)
+
+            def __exit__(self, *exc):
+                cursor.copied.append((statement, self.buffer.getvalue()))
+        return Copy()
+
+    def close(self):
+        self.closed = True
+
+
+def fake_session(cursor):
+    dbapi_connection = SimpleNamespace(cursor=lambda: cursor)
+    return SimpleNamespace(connection=lambda: SimpleNamespace(connection=dbapi_connection),
+                           bind=SimpleNamespace(dialect=postgresql.dialect()))
+
+
+@pytest.mark.parametrize("cursor_class", [FakePsycopg2Cursor, FakePsycopg3Cursor])
+def test_postgres_copy(cursor_class):
+    cursor = cursor_class()
+    rows = [
+        {"internal_id": 1, "id_num": "001.01", "move_in_date": datetime(2020, 5, 1, 12, 0), "usable_space": 61.5,
+         "position_description": "links\tvorne\nHinterhaus"},
+        {"internal_id": 2, "id_num": None, "move_in_date": None, "usable_space": None,
+         "position_description": "\\N"},
+    ]
+    PostgresBackend(None).insert(fake_session(cursor), UseUnit.__table__, rows)
+    assert cursor.closed
+    assert cursor.copied == [(
+        'COPY wowi_use_units (internal_id, id_num, move_in_date, usable_space, position_description) FROM STDIN',
+        "1\t001.01\t2020-05-01\t61.5\tlinks\\tvorne\\nHinterhaus\n"
+        "2\t\\N\t\\N\t\\N\t\\\\N\n",
+    )]
+
+
+def test_postgres_without_copy_uses_generic_insert(monkeypatch):
+    inserted = []
+    monkeypatch.setattr(LoadBackend, "insert", lambda self, session, table, rows: inserted.append(rows))
+    cursor = SimpleNamespace(close=lambda: None)
+    rows = [{"internal_id": 1, "name": "Mitte"}]
+    PostgresBackend(None).insert(fake_session(cursor), District.__table__, rows)
+    assert inserted == [rows]
+
+
+def test_mysql_multi_row_chunks(monkeypatch):
+    # Gegen sqlite, geprüft wird nur die Aufteilung in mehrzeilige Anweisungen
+    monkeypatch.setattr(backends, "MYSQL_MAX_PARAMETERS", 10)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[District.__table__])
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, parameters, context, executemany: statements.append(parameters))
+    rows = [{"internal_id": number, "name": f"Bezirk {number}"} for number in range(12)]
+    with Session(engine) as session:
+        MySQLBackend(engine).insert(session, District.__table__, rows)
+        session.commit()
+        assert session.query(District).count() == 12
+    # Zwei Spalten, höchstens 10 Parameter: 5 + 5 + 2 Zeilen
+    assert [len(parameters) for parameters in statements[:3]] == [10, 10, 4]
+
+
+def pragma(engine, name: str):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+@pytest.mark.parametrize("keep_wal", [False, True])
+def test_sqlite_fast_load_profile(tmp_path, keep_wal):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pragma.db'}")
+    defaults = (pragma(engine, "journal_mode"), pragma(engine, "synchronous"), pragma(engine, "cache_size"))
+    backend = SQLiteBackend(engine)
+    backend.prepare()
+    assert pragma(engine, "journal_mode") == "wal"
+    assert pragma(engine, "synchronous") == 1
+    assert pragma(engine, "cache_size") == -backends.SQLITE_CACHE_MB * 1024
+    backend.restore(keep_wal=keep_wal)
+    assert pragma(engine, "journal_mode") == ("wal" if keep_wal else defaults[0])
+    assert (pragma(engine, "synchronous"), pragma(engine, "cache_size")) == defaults[1:]
+    # Ein zweites restore ist ohne Wirkung
+    backend.restore()
+    engine.dispose()
+
+
+def test_sqlite_memory_database_is_left_alone():
+    engine = create_engine("sqlite://")
+    backend = SQLiteBackend(engine)
+    backend.prepare()
+    assert pragma(engine, "journal_mode") == "memory"
+    backend.restore()
@@ -0,0 +1,90 @@
+import gc
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from wowicache.checkpoints import STATUS_DONE, STATUS_RUNNING
+from wowicache.models import SyncCheckpoint
+from wowicache.synthetic import SyntheticWowiPy
+
+SCALE = 300
+FAIL_OFFSET = 200
+
+
+class FlakySyntheticWowiPy(SyntheticWowiPy):
+    # Bricht beim ersten Abruf der Personen ab FAIL_OFFSET ab und protokolliert alle Abrufe
+    calls = []
+    failed = False
+
+    def __init__(self, **kwargs):
+        super().__init__(scale=SCALE, **kwargs)
+
+    def __getattribute__(self, name):
+        attribute = super().__getattribute__(name)
+        if not name.startswith("get_"):
+            return attribute
+
+        def fetch(*args, **kwargs):
+            FlakySyntheticWowiPy.calls.append((name, kwargs.get("offset", 0)))
+            if name == "get_persons" and kwargs.get("offset", 0) >= FAIL_OFFSET and not FlakySyntheticWowiPy.failed:
+                FlakySyntheticWowiPy.failed = True
+                raise ConnectionError("API not reachable")
+            return attribute(*args, **kwargs)
+        return fetch
+
+
+@pytest.fixture
+def flaky_client():
+    FlakySyntheticWowiPy.calls = []
+    FlakySyntheticWowiPy.failed = False
+    return FlakySyntheticWowiPy
+
+
+def crash(run_sync, *args, **overrides):
+    with pytest.raises(ConnectionError):
+        run_sync(*args, **overrides)
+    # Wie beim Ende des Prozesses: Session und Verbindung des abgebrochenen Laufs freigeben
+    gc.collect()
+
+
+def read_checkpoints(connection_string: str) -> dict:
+    engine = create_engine(connection_string)
+    with Session(engine) as session:
+        progress = {checkpoint.entity: (checkpoint.status, checkpoint.record_offset)
+                    for checkpoint in session.scalars(select(SyncCheckpoint))}
+    engine.dispose()
+    return progress
+
+
+@pytest.mark.parametrize("fetch_workers", ["0", "2"])
+def test_resume_after_crash(tmp_path, run_sync, checksums, flaky_client, fetch_workers):
+    reference = f"sqlite:///{tmp_path / 'reference.db'}"
+    run_sync(reference, scale=SCALE)
+    expected = checksums(reference)
+
+    connection_string = f"sqlite:///{tmp_path / 'resume.db'}"
+    crash(run_sync, connection_string, flaky_client, streaming="True", resume_sync="True",
+          fetch_workers=fetch_workers)
+    progress = read_checkpoints(connection_string)
+    assert progress["persons"] == (STATUS_RUNNING, FAIL_OFFSET)
+    finished = {entity for entity, (status, _) in progress.items() if status == STATUS_DONE}
+    assert {"districts", "economic_units", "buildings", "use_units"} <= finished
+
+    flaky_client.calls = []
+    run_sync(connection_string, flaky_client, streaming="True", resume_sync="True", fetch_workers=fetch_workers)
+    fetched = {name for name, _ in flaky_client.calls}
+    # Fertige Entitäten werden nicht erneut abgerufen, Personen setzen am gespeicherten Offset fort
+    assert not fetched & {"get_districts", "get_economic_units", "get_building_lands", "get_use_units"}
+    assert [offset for name, offset in flaky_client.calls if name == "get_persons"][0] == FAIL_OFFSET
+    assert read_checkpoints(connection_string) == {}
+    assert checksums(connection_string) == expected
+
+
+def test_without_resume_restarts_from_scratch(tmp_path, run_sync, checksums, flaky_client):
+    connection_string = f"sqlite:///{tmp_path / 'cache.db'}"
+    crash(run_sync, connection_string, flaky_client, streaming="True")
+    assert read_checkpoints(connection_string) == {}
+
+    flaky_client.calls = []
+    run_sync(connection_string, flaky_client, streaming="True")
+    assert ("get_districts", 0) in flaky_client.calls
+    assert [offset for name, offset in flaky_client.calls if name == "get_persons"][0] == 0
@@ -0,0 +1,29 @@
+import csv
+import pytest
+from sqlalchemy import create_engine, func, select
+from wowicache.export import export_cache
+from wowicache.models import UseUnit
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_export_in_batches(tmp_path, run_sync, file_format):
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    connection_string = f"sqlite:///{tmp_path / 'export.db'}"
+    run_sync(connection_string, scale=50)
+    engine = create_engine(connection_string)
+    with engine.connect() as conn:
+        expected = conn.scalar(select(func.count()).select_from(UseUnit.__table__))
+    # Kleine Blöcke, damit mehrere Teile aus dem Server-Cursor gelesen werden
+    result, = export_cache(engine, str(tmp_path / "export"), ["wowi_use_units"], file_format, batch_size=7)
+    engine.dispose()
+    assert result["rows"] == expected > 7
+    path, = result["files"]
+    if file_format == "csv":
+        with open(path, newline="", encoding="utf-8") as export_file:
+            rows = list(csv.DictReader(export_file))
+    else:
+        import pyarrow.parquet
+        rows = pyarrow.parquet.read_table(path).to_pylist()
+    assert len(rows) == expected
+    assert len({int(row["internal_id"]) for row in rows}) == expected
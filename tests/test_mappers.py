@@ -0,0 +1,52 @@
+from datetime import date, datetime
+from types import SimpleNamespace as Record
+import pytest
+from wowicache import mappers
+from wowicache.mappers import compile_mapper, map_building, parse_date, parse_datetime
+from wowicache.synthetic import SyntheticWowiPy
+
+
+def test_compile_mapper_paths_and_converters():
+    mapper = compile_mapper("sample", {
+        "id": "id_",
+        "district_id": "district?.id_",
+        "start": ("start", parse_date),
+        "label": lambda entry: f"#{entry.id_}",
+        "owner": "parent.name",
+    })
+    entry = Record(id_=7, district=Record(id_=3), start="2024-02-29")
+    assert mapper(entry, Record(name="Muster")) == {
+        "id": 7, "district_id": 3, "start": datetime(2024, 2, 29), "label": "#7", "owner": "Muster"}
+    # Ein leeres optionales Teilobjekt ergibt None statt eines AttributeError
+    assert mapper(Record(id_=8, district=None, start=None), Record(name=None))["district_id"] is None
+    with pytest.raises(AttributeError):
+        compile_mapper("strict", {"district_id": "district.id_"})(Record(district=None))
+
+
+@pytest.mark.parametrize("path", ["a.import", "a.b-c", "1a"])
+def test_compile_mapper_rejects_invalid_paths(path):
+    with pytest.raises(ValueError):
+        compile_mapper("invalid", {"field": path})
+
+
+def test_parse_date_is_memoized():
+    mappers._parse_date.cache_clear()
+    assert parse_date("2020-01-02") == datetime(2020, 1, 2)
+    assert parse_date("2020-01-02") == datetime(2020, 1, 2)
+    assert parse_date(date(2020, 1, 2)) == datetime(2020, 1, 2)
+    info = mappers._parse_date.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+    assert parse_date(None) is None and parse_date("") is None
+    assert parse_datetime("2020-01-02 03:04:05") == datetime(2020, 1, 2, 3, 4, 5)
+
+
+def test_map_building_synthetic_record():
+    record = SyntheticWowiPy(scale=80).get_building_lands(limit=5)[3]
+    row = map_building(record)
+    assert set(row) == set(mappers.BUILDING_FIELDS)
+    assert row["internal_id"] == record.id_
+    assert row["street"] == record.estate_address.street
+    assert row["postcode"] == record.estate_address.zip_
+    assert row["building_type_name"] == record.building.building_type.name
+    assert row["entry_date"] == datetime.fromisoformat(record.entry_date)
+    assert row["district_id"] is None
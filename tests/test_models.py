@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from wowicache.models import Base, Building, UseUnit, Address, PostalAddress, Communication, Contract, Contractor
+from wowicache.models import BuildingType, ContractStatus
+
+ADDRESS = ("10115", "Berlin", "Hauptstraße", "5", "a", 1, "DE", "Hauptstraße 5a", "5a")
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def test_legacy_constructor_signatures(session):
+    # Positionsargumente wie vor der Adressdimension
+    building = Building(1, "0001.00001", 1, "Building", None, 1, *ADDRESS, 1990, None, None, None)
+    use_unit = UseUnit(1, "0001.0000001", 1, 1, 1, *ADDRESS)
+    address = Address(1, *ADDRESS, address_type_id=None, address_type=None, valid_from=None, valid_to=None,
+                      person_id=None)
+    for instance in (building, use_unit, address):
+        session.merge(instance)
+    session.commit()
+    assert session.scalar(select(PostalAddress.internal_id).where(PostalAddress.street == "Hauptstraße"))
+    assert len(session.scalars(select(PostalAddress)).all()) == 1
+    for model in (Building, UseUnit, Address):
+        instance = session.get(model, 1)
+        assert (instance.street_complete, instance.postcode, instance.town) == ("Hauptstraße 5a", "10115", "Berlin")
+    assert session.get(Building, 1).construction_year == 1990
+
+
+def test_without_address(session):
+    address = Address(2, postal_address_id=None)
+    assert address.postal_address is None and address.street is None
+
+
+@pytest.mark.parametrize("attribute", ["street", "postcode", "street_complete"])
+def test_address_proxies_are_read_only(attribute):
+    building = Building(1, "0001.00001", 1, "Building", None, 1, *ADDRESS)
+    with pytest.raises(AttributeError, match="read-only"):
+        setattr(building, attribute, "Nebenstraße")
+    with pytest.raises(AttributeError, match="read-only"):
+        delattr(building, attribute)
+    assert building.street == "Hauptstraße"
+
+
+def test_legacy_category_names(session):
+    building = Building(1, "0001.00001", 1, "Building", None, 1, *ADDRESS, 1990, None, 2, "Reihenhaus", None)
+    use_unit = UseUnit(1, "0001.0000001", 1, 1, 1, *ADDRESS, 1, "frei finanziert", 1, "Wohnung", 61.5,
+                       floor_id=0, floor_name="EG", floor_level=0)
+    communication = Communication(1, None, "0301234567", None, 1, "Telefon", None)
+    contract = Contract(1, "V1", 1, None, None, False, 1, "aktiv", 2, "unbefristet", None, None)
+    contractor = Contractor(1, 1, 1, None, 1, "Hauptmieter", None, None)
+    for instance in (building, use_unit, communication, contract, contractor):
+        session.merge(instance)
+    session.commit()
+    session.expunge_all()
+    assert session.get(Building, 1).building_type_name == "Reihenhaus"
+    use_unit = session.get(UseUnit, 1)
+    assert (use_unit.financing_type, use_unit.use_unit_usage_type, use_unit.floor_name) == \
+        ("frei finanziert", "Wohnung", "EG")
+    assert session.get(Communication, 1).communication_type == "Telefon"
+    contract = session.get(Contract, 1)
+    assert (contract.restriction_name, contract.status_name, contract.life_name) == (None, "aktiv", "unbefristet")
+    assert session.get(Contractor, (1, 1, 1)).type_name == "Hauptmieter"
+    assert session.get(BuildingType, 2).name == "Reihenhaus"
+    assert session.get(ContractStatus, 1).name == "aktiv"
+
+
+@pytest.mark.parametrize("model, attribute", [(Building, "building_type_name"), (Contract, "status_name"),
+                                              (Contractor, "type_name"), (UseUnit, "floor_name")])
+def test_category_proxies_are_read_only(model, attribute):
+    # Früher legte die Zuweisung einen Eintrag ohne ID an, der erst beim Speichern scheiterte
+    instance = model.__new__(model)
+    with pytest.raises(AttributeError, match="read-only"):
+        setattr(instance, attribute, "x")
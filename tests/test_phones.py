@@ -0,0 +1,26 @@
+import pytest
+from wowicache.phones import canonical_phone, phone_suffix_params, reversed_digits
+from wowicache.queries import normalize_phone
+
+
+@pytest.mark.parametrize("raw, content, canonical", [
+    ("+49 30 1234567", "0301234567", "+49301234567"),
+    ("0049 30 1234567", "0301234567", "+49301234567"),
+    ("+49 (0)30 1234567", "0(0)301234567", "+49301234567"),
+    ("(030) 123 45 67", "(030)1234567", "+49301234567"),
+    ("+43 1 234567", "+431234567", "+431234567"),
+    ("1234567", "1234567", "1234567"),
+    (None, None, None),
+])
+def test_content_keeps_previous_format(raw, content, canonical):
+    # content wie vor der Einführung von phone_number, die einheitliche Form nur in phone_number
+    assert normalize_phone(raw) == content
+    assert canonical_phone(raw) == canonical
+
+
+def test_reversed_digits_and_suffix():
+    assert reversed_digits("+49301234567") == "76543210394"
+    assert phone_suffix_params("12345") is None
+    params = phone_suffix_params("1234567")
+    assert params["reversed"] == "7654321"
+    assert params["reversed_prefixes"] == ["765432", "7654321"]
@@ -0,0 +1,141 @@
+import threading
+import time
+import pytest
+from wowicache import scheduler
+from wowicache.scheduler import FetchScheduler
+from wowicache.stream import PAGE_SIZE
+
+
+class FakeClient:
+    # Liefert je Endpunkt count Datensätze, optional mit einem Fehler ab einem Offset
+    def __init__(self, counts: dict, fail_at: dict = None):
+        self.counts = counts
+        self.fail_at = fail_at or {}
+        self.calls = []
+        self.thread = None
+
+    def __getattr__(self, name):
+        if not name.startswith("get_"):
+            raise AttributeError(name)
+
+        def fetch(fetch_all: bool = False, limit: int = PAGE_SIZE, offset: int = 0, **kwargs):
+            self.thread = threading.current_thread().name
+            self.calls.append((name, offset))
+            if name in self.fail_at and offset >= self.fail_at[name]:
+                raise RuntimeError(f"{name} failed at {offset}")
+            count = self.counts[name]
+            end = count if fetch_all else min(offset + limit, count)
+            return list(range(offset, end))
+        return fetch
+
+
+def consume(fetcher, name: str) -> list:
+    return [record for page in fetcher.pages(name) for record in page]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+@pytest.mark.parametrize("streaming", [False, True])
+def test_pages_in_order(workers, streaming):
+    clients = []
+
+    def factory():
+        clients.append(FakeClient({"get_a": 250, "get_b": 30, "get_c": 0}))
+        return clients[-1]
+
+    fetcher = FetchScheduler(factory, streaming, workers)
+    fetcher.submit("a", "get_a")
+    fetcher.submit("b", "get_b", start_offset=10)
+    fetcher.submit("c", "get_c")
+    try:
+        assert consume(fetcher, "a") == list(range(250))
+        assert consume(fetcher, "b") == list(range(10, 30))
+        assert consume(fetcher, "c") == []
+    finally:
+        fetcher.close()
+    # Ein eigener Client je Worker-Thread, ohne Worker genau einer
+    assert 1 <= len(clients) <= max(1, workers)
+    if workers:
+        assert all(client.thread.startswith("wowicache-fetch-") for client in clients)
+
+
+def test_unpaged_task_honours_start_offset():
+    fetcher = FetchScheduler(lambda: FakeClient({"get_districts": 12}), streaming=True, workers=1)
+    fetcher.submit("districts", "get_districts", paged=False, start_offset=5)
+    try:
+        assert consume(fetcher, "districts") == list(range(5, 12))
+    finally:
+        fetcher.close()
+
+
+def test_bounded_queue_blocks_the_worker(monkeypatch):
+    # Im Streaming-Modus darf ein Endpunkt höchstens PREFETCH_PAGES Seiten vorausladen
+    monkeypatch.setattr(scheduler, "PREFETCH_PAGES", 3)
+    client = FakeClient({"get_a": 50 * PAGE_SIZE})
+    fetcher = FetchScheduler(lambda: client, streaming=True, workers=1)
+    fetcher.submit("a", "get_a")
+    try:
+        deadline = time.monotonic() + 5
+        while len(client.calls) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.2)
+        # Drei Seiten im Puffer, die vierte wartet im Worker auf einen freien Platz
+        assert len(client.calls) == 4
+        assert fetcher._queues["a"].qsize() == 3
+        assert len(consume(fetcher, "a")) == 50 * PAGE_SIZE
+    finally:
+        fetcher.close()
+
+
+def test_unbounded_without_streaming():
+    client = FakeClient({"get_a": 10 * PAGE_SIZE})
+    fetcher = FetchScheduler(lambda: client, streaming=False, workers=1)
+    fetcher.submit("a", "get_a")
+    try:
+        assert fetcher._queues["a"].maxsize == 0
+        assert len(consume(fetcher, "a")) == 10 * PAGE_SIZE
+    finally:
+        fetcher.close()
+
+
+@pytest.mark.parametrize("workers", [0, 1, 3])
+def test_worker_error_reaches_consumer(workers):
+    client = FakeClient({"get_a": 1000, "get_b": 150}, fail_at={"get_a": 300})
+    fetcher = FetchScheduler(lambda: client, streaming=True, workers=workers)
+    fetcher.submit("a", "get_a")
+    fetcher.submit("b", "get_b")
+    received = []
+    try:
+        with pytest.raises(RuntimeError, match="get_a failed at 300"):
+            for page in fetcher.pages("a"):
+                received.extend(page)
+        # Die Seiten vor dem Fehler kommen vollständig an, andere Endpunkte laufen weiter
+        assert received == list(range(300))
+        assert consume(fetcher, "b") == list(range(150))
+    finally:
+        fetcher.close()
+
+
+def test_client_factory_error_reaches_consumer():
+    def factory():
+        raise ConnectionError("login failed")
+
+    fetcher = FetchScheduler(factory, streaming=True, workers=1)
+    fetcher.submit("a", "get_a")
+    try:
+        with pytest.raises(ConnectionError, match="login failed"):
+            consume(fetcher, "a")
+    finally:
+        fetcher.close()
+
+
+def test_close_stops_workers():
+    before = set(threading.enumerate())
+    fetcher = FetchScheduler(lambda: FakeClient({"get_a": 10}), streaming=True, workers=2)
+    workers = [thread for thread in threading.enumerate() if thread not in before]
+    assert len(workers) == 2
+    fetcher.submit("a", "get_a")
+    consume(fetcher, "a")
+    fetcher.close()
+    for worker in workers:
+        worker.join(timeout=5)
+    assert not any(worker.is_alive() for worker in workers)
@@ -0,0 +1,64 @@
+from sqlalchemy import create_engine, inspect
+from wowicache.models import POSTAL_FIELDS
+
+LEGACY_TABLES = ("wowi_buildings", "wowi_use_units", "wowi_addresses")
+# Alte Bezeichnungsspalten: Tabelle -> (Spalte, Fremdschlüssel, Nachschlagetabelle)
+LEGACY_NAMES = {
+    "wowi_buildings": [("building_type_name", "building_type_id", "wowi_building_types")],
+    "wowi_use_units": [("financing_type", "financing_type_id", "wowi_financing_types"),
+                       ("use_unit_usage_type", "use_unit_usage_type_id", "wowi_usage_types"),
+                       ("floor_name", "floor_id", "wowi_floors")],
+    "wowi_communications": [("communication_type", "communication_type_id", "wowi_communication_types")],
+    "wowi_contracts": [("status_name", "status_id", "wowi_contract_statuses"),
+                       ("life_name", "life_id", "wowi_contract_lives"),
+                       ("restriction_name", "restriction_id", "wowi_contract_restrictions")],
+    "wowi_contractors": [("type_name", "type_id", "wowi_contractor_types")],
+}
+
+
+def add_legacy_columns(connection_string: str, columns: dict):
+    engine = create_engine(connection_string)
+    with engine.begin() as conn:
+        for table_name, names in columns.items():
+            for name in names:
+                conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {name} VARCHAR(100)")
+    engine.dispose()
+
+
+def fetch(connection_string: str, sql: str) -> list:
+    engine = create_engine(connection_string)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(sql).all()
+    engine.dispose()
+    return rows
+
+
+def test_legacy_columns_are_filled_until_staging_rebuild(tmp_path, run_sync):
+    connection_string = f"sqlite:///{tmp_path / 'legacy.db'}"
+    run_sync(connection_string, scale=50)
+    # Datenbank einer älteren Version: Anschriftsspalten stehen noch in den Tabellen
+    add_legacy_columns(connection_string, {table_name: POSTAL_FIELDS for table_name in LEGACY_TABLES})
+    add_legacy_columns(connection_string, {table_name: [name for name, _, _ in columns]
+                                           for table_name, columns in LEGACY_NAMES.items()})
+
+    for sync_mode in ("full", "delta"):
+        run_sync(connection_string, scale=50, sync_mode=sync_mode)
+        for table_name in LEGACY_TABLES:
+            mismatches = fetch(connection_string, f"""
+                SELECT COUNT(*) FROM {table_name} t
+                LEFT JOIN wowi_postal_addresses p ON p.internal_id = t.postal_address_id
+                WHERE {' OR '.join(f't.{name} IS NOT p.{name}' for name in POSTAL_FIELDS)}""")
+            assert mismatches == [(0,)]
+        for table_name, columns in LEGACY_NAMES.items():
+            for name, id_column, category in columns:
+                mismatches = fetch(connection_string, f"""
+                    SELECT COUNT(*) FROM {table_name} t LEFT JOIN {category} c ON c.internal_id = t.{id_column}
+                    WHERE t.{name} IS NOT c.name""")
+                assert mismatches == [(0,)]
+        assert fetch(connection_string, "SELECT COUNT(street), COUNT(building_type_name) FROM wowi_buildings")[0] \
+            == fetch(connection_string, "SELECT COUNT(*), COUNT(*) FROM wowi_buildings")[0]
+
+    # Der Neuaufbau über Staging-Tabellen entfernt die alten Spalten
+    run_sync(connection_string, scale=50, staging_rebuild="True")
+    columns = {item["name"] for item in inspect(create_engine(connection_string)).get_columns("wowi_buildings")}
+    assert not columns & {*POSTAL_FIELDS, "building_type_name"}
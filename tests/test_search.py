@@ -0,0 +1,37 @@
+import logging
+from contextlib import contextmanager
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from wowicache.search import SEARCH_TABLE, build_search_index, normalize_search_text
+
+
+@pytest.mark.parametrize("error_class", [ProgrammingError, OperationalError])
+def test_missing_pg_trgm_is_logged(caplog, error_class):
+    executed = []
+
+    @contextmanager
+    def begin():
+        def exec_driver_sql(sql):
+            executed.append(sql)
+            raise error_class(sql, {}, Exception("permission denied to create extension \"pg_trgm\""))
+        yield SimpleNamespace(exec_driver_sql=exec_driver_sql)
+
+    engine = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"), begin=begin)
+    with caplog.at_level(logging.ERROR, logger="root"):
+        assert build_search_index(engine) == 0
+    assert executed == ["CREATE EXTENSION IF NOT EXISTS pg_trgm"]
+    assert "extension pg_trgm is not available" in caplog.text
+
+
+def test_search_index_only_when_enabled(tmp_path, run_sync):
+    connection_string = f"sqlite:///{tmp_path / 'search.db'}"
+    run_sync(connection_string, scale=50)
+    assert not inspect(create_engine(connection_string)).has_table(SEARCH_TABLE)
+    run_sync(connection_string, scale=50, search_index="True")
+    assert inspect(create_engine(connection_string)).has_table(SEARCH_TABLE)
+
+
+def test_normalize_search_text():
+    assert normalize_search_text("Müllerstraße 5a") == normalize_search_text("MUELLERSTR. 5a") == "muellerstr 5a"
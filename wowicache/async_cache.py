@@ -0,0 +1,120 @@
+from datetime import date
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from wowicache.models import read_only_url, read_only_options
+from wowicache.phones import canonical_phone, phone_suffix_params
+from wowicache.queries import PERSONS_BY_PHONE, PERSONS_BY_PHONE_SUFFIX, PERSONS_BY_USE_UNIT, \
+    CURRENT_TENANTS_OF_BUILDING, USE_UNITS_BY_STREET, CONTRACT_BY_VIRTUAL_IBAN, LOAD_PRESETS, normalize_virtual_iban
+from wowicache.queries import PERSONS_WITH_ADDRESS_AT_BUILDING
+from wowicache.search import search_index, load_instances
+from wowicache.queries import OCCUPANCY_BY_USE_UNIT, OCCUPANCY_BY_BUILDING, OCCUPANCY_BY_PERSON, OCCUPANCY_BY_PHONE
+
+# Async-Treiber je Datenbank, wenn der Verbindungsstring den synchronen Treiber nennt
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_connection_url(connection_string: str):
+    # Derselbe Verbindungsstring wie für update_cache, z.B. sqlite:///cache.db -> sqlite+aiosqlite:///cache.db
+    url = make_url(connection_string)
+    if url.get_dialect().is_async:
+        return url
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver known for '{url.drivername}', "
+                         f"please name one in the connection string")
+    return url.set(drivername=driver)
+
+
+class AsyncWowiCache:
+    def __init__(self, connection_string: str, query_cache_size: int = 500, read_only: bool = False,
+                 phone_country_code: str = "49", **engine_options):
+        self.phone_country_code = phone_country_code
+        url = async_connection_url(connection_string)
+        if read_only:
+            url = read_only_url(url)
+            engine_options = {**read_only_options(url), **engine_options}
+        self.engine = create_async_engine(url, echo=False, pool_pre_ping=True, query_cache_size=query_cache_size,
+                                          **engine_options)
+        # Eine AsyncSession darf nicht von mehreren Tasks gleichzeitig benutzt werden, deshalb holt sich jede
+        # Abfrage eine eigene Session (und Verbindung aus dem Pool). Die Objekte bleiben nach dem Schließen
+        # lesbar, Beziehungen werden aber nicht nachgeladen.
+        self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        await self.engine.dispose()
+
+    async def _all(self, statement, params: dict) -> list:
+        async with self.Session() as session:
+            return (await session.scalars(statement, params)).all()
+
+    async def get(self, model, primary_key):
+        async with self.Session() as session:
+            return await session.get(model, primary_key)
+
+    async def load_preset(self, name: str, ids) -> list:
+        # Alle Ebenen werden vorab geladen und sind nach dem Schließen der Session lesbar
+        if name not in LOAD_PRESETS:
+            raise ValueError(f"Unknown load preset '{name}', available: {', '.join(LOAD_PRESETS)}")
+        ids = [ids] if isinstance(ids, int) else list(ids)
+        async with self.Session() as session:
+            return (await session.scalars(LOAD_PRESETS[name], {"ids": ids})).unique().all()
+
+    async def persons_by_phone(self, phone: str, match_suffix: bool = True) -> list:
+        phone = canonical_phone(phone, self.phone_country_code)
+        persons = await self._all(PERSONS_BY_PHONE, {"phone": phone}) if phone else []
+        suffix_params = phone_suffix_params(phone) if match_suffix and not persons else None
+        if suffix_params:
+            persons = await self._all(PERSONS_BY_PHONE_SUFFIX, suffix_params)
+        return persons
+
+    async def persons_by_use_unit(self, use_unit_id: int) -> list:
+        return await self._all(PERSONS_BY_USE_UNIT, {"use_unit_id": use_unit_id})
+
+    async def current_tenants(self, building_id: int, on_date: date = None) -> list:
+        return await self._all(CURRENT_TENANTS_OF_BUILDING, {"building_id": building_id,
+                                                             "on_date": on_date or date.today()})
+
+    async def persons_with_address_at_building(self, building_id: int) -> list:
+        return await self._all(PERSONS_WITH_ADDRESS_AT_BUILDING, {"building_id": building_id})
+
+    async def use_units_by_street(self, street: str) -> list:
+        return await self._all(USE_UNITS_BY_STREET, {"street": street})
+
+    async def contract_by_virtual_iban(self, virtual_iban: str):
+        async with self.Session() as session:
+            return (await session.scalars(CONTRACT_BY_VIRTUAL_IBAN,
+                                          {"virtual_iban": normalize_virtual_iban(virtual_iban)})).first()
+
+    async def search(self, query: str, kinds: list = None, limit: int = 20, fuzzy: bool = True,
+                     load: bool = False) -> list:
+        # Suchindex aus cache_to_db, gleiche Abfragen wie WowiCache.search über die synchrone Sicht der Session
+        def run_search(session):
+            hits = search_index(session, query, kinds, limit, fuzzy)
+            if load:
+                load_instances(session, hits)
+            return hits
+
+        async with self.Session() as session:
+            return await session.run_sync(run_search)
+
+    # Vorberechnete Belegung (wowi_current_occupancy), siehe WowiCache
+    async def occupancy_by_use_unit(self, use_unit_id: int) -> list:
+        return await self._all(OCCUPANCY_BY_USE_UNIT, {"use_unit_id": use_unit_id})
+
+    async def occupancy_by_building(self, building_id: int) -> list:
+        return await self._all(OCCUPANCY_BY_BUILDING, {"building_id": building_id})
+
+    async def occupancy_by_person(self, person_id: int) -> list:
+        return await self._all(OCCUPANCY_BY_PERSON, {"person_id": person_id})
+
+    async def occupancy_by_phone(self, phone: str) -> list:
+        return await self._all(OCCUPANCY_BY_PHONE, {"phone": canonical_phone(phone, self.phone_country_code)})
@@ -0,0 +1,152 @@
+import io
+import logging
+from datetime import date, datetime
+from sqlalchemy import Date, event
+
+logger = logging.getLogger('root')
+
+BACKEND_AUTO = "auto"
+BACKEND_GENERIC = "generic"
+# Cache je Verbindung während des Ladens (sqlite), negativ = KiB
+SQLITE_CACHE_MB = 256
+# Höchstzahl gebundener Parameter je mehrzeiligem INSERT (MySQL/MariaDB)
+MYSQL_MAX_PARAMETERS = 30000
+
+
+class LoadBackend:
+    name = BACKEND_GENERIC
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def prepare(self):
+        pass
+
+    def restore(self, keep_wal: bool = False):
+        pass
+
+    def insert(self, session, table, rows: list):
+        session.execute(table.insert(), rows)
+
+
+class SQLiteBackend(LoadBackend):
+    name = "sqlite"
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        self._journal_mode = None
+
+    def _configure(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    def prepare(self):
+        if self.engine.url.database in (None, "", ":memory:"):
+            # Eine In-Memory-Datenbank ginge beim Leeren des Pools verloren
+            return
+        # Schnelllade-Profil: WAL, synchronous=NORMAL und großer Cache. synchronous und cache_size gelten
+        # je Verbindung, deshalb über das connect-Ereignis für alle Verbindungen des Pools.
+        with self.engine.connect() as conn:
+            self._journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+        self.engine.dispose()
+        event.listen(self.engine, "connect", self._configure)
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        logger.info(f"SQLite fast load profile enabled (journal mode was {self._journal_mode}).")
+
+    def restore(self, keep_wal: bool = False):
+        if not event.contains(self.engine, "connect", self._configure):
+            return
+        event.remove(self.engine, "connect", self._configure)
+        # Neue Verbindungen bekommen wieder die Standardwerte
+        self.engine.dispose()
+        if self._journal_mode and self._journal_mode.lower() != "wal" and not keep_wal:
+            with self.engine.connect() as conn:
+                conn.exec_driver_sql(f"PRAGMA journal_mode={self._journal_mode}")
+        logger.info("SQLite fast load profile restored.")
+
+
+def _copy_text(value) -> str:
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _copy_date(value) -> str:
+    # datetime-Werte aus den Mappern in Date-Spalten nur mit Datumsteil übertragen
+    if isinstance(value, datetime):
+        value = value.date()
+    return _copy_text(value)
+
+
+class PostgresBackend(LoadBackend):
+    name = "postgresql"
+
+    def insert(self, session, table, rows: list):
+        cursor = session.connection().connection.cursor()
+        if not hasattr(cursor, "copy_expert") and not hasattr(cursor, "copy"):
+            # Treiber ohne COPY-Unterstützung (z.B. pg8000)
+            cursor.close()
+            super().insert(session, table, rows)
+            return
+
+        keys = list(rows[0].keys())
+        columns = [table.c[key] for key in keys]
+        formatters = [_copy_date if isinstance(column.type, Date) else _copy_text for column in columns]
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(formatter(row[key]) for key, formatter in zip(keys, formatters)))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        preparer = session.bind.dialect.identifier_preparer
+        statement = (f"COPY {preparer.format_table(table)} "
+                     f"({', '.join(preparer.quote(column.name) for column in columns)}) FROM STDIN")
+        try:
+            if hasattr(cursor, "copy_expert"):
+                # psycopg2
+                cursor.copy_expert(statement, buffer)
+            else:
+                # psycopg 3
+                with cursor.copy(statement) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
+
+
+class MySQLBackend(LoadBackend):
+    name = "mysql"
+
+    def insert(self, session, table, rows: list):
+        # Mehrzeilige INSERT ... VALUES (...), (...) statt einzelner Anweisungen je Zeile
+        rows_per_statement = max(1, MYSQL_MAX_PARAMETERS // max(1, len(rows[0])))
+        for start in range(0, len(rows), rows_per_statement):
+            session.execute(table.insert().values(rows[start:start + rows_per_statement]))
+
+
+BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "postgresql": PostgresBackend,
+    "mysql": MySQLBackend,
+    "mariadb": MySQLBackend,
+}
+
+
+def create_backend(engine, name: str = None) -> LoadBackend:
+    if name is not None and name.lower() == BACKEND_GENERIC:
+        backend = LoadBackend(engine)
+    else:
+        backend = BACKENDS.get(engine.dialect.name, LoadBackend)(engine)
+    logger.info(f"Load backend: {backend.name}")
+    return backend
@@ -0,0 +1,168 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+from wowicache.models import Base
+from wowicache.queries import LOAD_PRESETS, LOAD_PRESET_PATHS
+from wowicache.stream import peak_rss_mb
+from wowicache.synthetic import SyntheticWowiPy
+
+ENTITY_SETTINGS = ["enable_buildings", "enable_contractors", "enable_persons", "enable_economic_units",
+                   "enable_license_agreements", "enable_use_units", "enable_memberships", "enable_payment_modes"]
+
+
+def write_settings(path: str, settings: dict):
+    with open(path, "w", encoding="utf-8") as env_file:
+        for key, value in settings.items():
+            env_file.write(f'{key}="{value}"\n')
+
+
+def count_rows(connection_string: str) -> dict:
+    engine = create_engine(connection_string)
+    with engine.connect() as conn:
+        counts = {table.name: conn.execute(select(func.count()).select_from(table)).scalar()
+                  for table in Base.metadata.sorted_tables}
+    engine.dispose()
+    return counts
+
+
+def run_benchmark(scale: int, workdir: str, db_path: str = None, latency: float = 0.0, overrides: dict = None) -> dict:
+    db_path = db_path or os.path.join(workdir, "benchmark.db")
+    connection_string = f"sqlite:///{db_path}"
+    settings = {key: "True" for key in ENTITY_SETTINGS}
+    settings.update(db_connection_string=connection_string, log_method="file",
+                    log_file_path=os.path.join(workdir, "log"), log_level="info")
+    settings.update(overrides or {})
+    env_path = os.path.join(workdir, "benchmark.env")
+    write_settings(env_path, settings)
+
+    # update_cache liest beim Import die Einstellungen aus dem ersten Argument
+    sys.argv = [sys.argv[0], env_path]
+    from wowicache import update_cache
+
+    client_class = partial(SyntheticWowiPy, scale=scale, latency=latency)
+    start = time.perf_counter()
+    report = update_cache.cache_to_db(env_path, client_class=client_class)
+    wall_time = time.perf_counter() - start
+    return {
+        "scale": scale,
+        "settings": {key: value for key, value in settings.items() if key not in ENTITY_SETTINGS},
+        "wall_time": wall_time,
+        "peak_rss_mb": peak_rss_mb(),
+        "sections": [section.as_dict() for section in report.sections],
+        "phases": {name: stopwatch.seconds for name, stopwatch in report.phases.items()},
+        "row_counts": count_rows(connection_string),
+    }
+
+
+def walk_graph(instances: list, path: tuple) -> int:
+    # Greift wie ein Bericht Ebene für Ebene auf die Beziehungen zu, liefert die Zahl besuchter Objekte
+    if not path:
+        return len(instances)
+    next_level = []
+    for instance in instances:
+        value = getattr(instance, path[0].key)
+        if isinstance(value, list):
+            next_level.extend(value)
+        elif value is not None:
+            next_level.append(value)
+    return len(instances) + walk_graph(next_level, path[1:])
+
+
+def benchmark_presets(connection_string: str, samples: int = 50) -> list:
+    # Vergleicht je Ladevorgabe Lazy Loading mit der Vorgabe: Anzahl SQL-Abfragen und Laufzeit
+    engine = create_engine(connection_string)
+    statements = [0]
+
+    def count_statement(*args):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    Session = sessionmaker(bind=engine)
+    results = []
+    for name, (model, paths) in LOAD_PRESET_PATHS.items():
+        with Session() as session:
+            ids = session.scalars(select(model.internal_id).order_by(model.internal_id).limit(samples)).all()
+        result = {"preset": name, "roots": len(ids)}
+        for strategy in ("lazy", "preset"):
+            with Session() as session:
+                statements[0] = 0
+                start = time.perf_counter()
+                if strategy == "lazy":
+                    roots = session.scalars(select(model).where(model.internal_id.in_(ids))).all()
+                else:
+                    roots = session.scalars(LOAD_PRESETS[name], {"ids": ids}).unique().all()
+                result["objects"] = sum(walk_graph(roots, path) for path in paths)
+                result[f"{strategy}_seconds"] = time.perf_counter() - start
+                result[f"{strategy}_queries"] = statements[0]
+        results.append(result)
+    engine.dispose()
+    return results
+
+
+def print_presets(results: list):
+    print(f"{'preset':<20}{'roots':>7}{'objects':>9}{'lazy q.':>9}{'lazy s':>9}{'preset q.':>11}{'preset s':>10}")
+    for result in results:
+        print(f"{result['preset']:<20}{result['roots']:>7}{result['objects']:>9}{result['lazy_queries']:>9}"
+              f"{result['lazy_seconds']:>9.3f}{result['preset_queries']:>11}{result['preset_seconds']:>10.3f}")
+
+
+def print_report(result: dict):
+    settings = result["settings"]
+    print(f"Scale {result['scale']}, load_mode {settings.get('load_mode', 'orm')}, "
+          f"sync_mode {settings.get('sync_mode', 'full')}, streaming {settings.get('streaming', 'False')}, "
+          f"fetch_workers {settings.get('fetch_workers', 0)}")
+    print(f"{'entity':<16}{'rows':>10}{'pages':>8}{'fetch s':>10}{'transf. s':>10}{'write s':>10}{'rows/s':>10}")
+    for section in result["sections"]:
+        print(f"{section['section']:<16}{section['rows']:>10}{section['pages']:>8}{section['fetch_seconds']:>10.2f}"
+              f"{section['transform_seconds']:>10.2f}{section['write_seconds']:>10.2f}"
+              f"{section['rows_per_second'] or 0:>10.0f}")
+    for name, seconds in result["phases"].items():
+        print(f"{name:<20}{seconds:>54.2f}")
+    total_rows = sum(result["row_counts"].values())
+    wall_time = result["wall_time"]
+    peak = result["peak_rss_mb"]
+    print(f"Total: {total_rows} rows in {wall_time:.2f}s ({total_rows / wall_time:.0f} rows/s end to end), "
+          f"peak RSS {f'{peak:.1f} MB' if peak is not None else 'n/a'}")
+
+
+def parse_setting(value: str) -> tuple:
+    key, _, setting = value.partition("=")
+    if not key or not _:
+        raise argparse.ArgumentTypeError(f"Expected key=value, got '{value}'")
+    return key, setting
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run cache_to_db against synthetic data in a local SQLite file.")
+    parser.add_argument("--scale", type=int, default=10000, help="number of use units, other entities scale along")
+    parser.add_argument("--load-mode", default="orm", help="orm or bulk")
+    parser.add_argument("--sync-mode", default="full", help="full or delta")
+    parser.add_argument("--streaming", action="store_true", help="fetch and write page by page")
+    parser.add_argument("--fetch-workers", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per API request")
+    parser.add_argument("--db", help="SQLite file to use (kept after the run), default: temporary file")
+    parser.add_argument("--set", dest="overrides", type=parse_setting, action="append", default=[],
+                        metavar="KEY=VALUE", help="additional .env setting, may be repeated")
+    parser.add_argument("--presets", type=int, default=0, metavar="N",
+                        help="afterwards compare the load presets with lazy loading for N root objects each")
+    args = parser.parse_args()
+
+    overrides = {"load_mode": args.load_mode, "sync_mode": args.sync_mode, "streaming": str(args.streaming),
+                 "fetch_workers": args.fetch_workers}
+    overrides.update(dict(args.overrides))
+    with tempfile.TemporaryDirectory(prefix="wowicache_benchmark_") as workdir:
+        result = run_benchmark(args.scale, workdir, args.db, args.latency, overrides)
+        presets = benchmark_presets(f"sqlite:///{args.db or os.path.join(workdir, 'benchmark.db')}", args.presets) \
+            if args.presets > 0 else None
+    print_report(result)
+    if presets:
+        print_presets(presets)
+
+
+if __name__ == '__main__':
+    main()
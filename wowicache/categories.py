@@ -0,0 +1,28 @@
+from wowicache.models import Building, UseUnit, Communication, Contract, Contractor
+from wowicache.models import BuildingType, UsageType, FinancingType, Floor, CommunicationType, ContractStatus
+from wowicache.models import ContractLife, ContractRestriction, ContractorType
+
+# Modell -> (Spalte mit der ID, Feld mit der Bezeichnung aus dem Mapper, Nachschlagetabelle)
+CATEGORY_COLUMNS = {
+    Building: (("building_type_id", "building_type_name", BuildingType),),
+    UseUnit: (("use_unit_usage_type_id", "use_unit_usage_type", UsageType),
+              ("financing_type_id", "financing_type", FinancingType),
+              ("floor_id", "floor_name", Floor)),
+    Communication: (("communication_type_id", "communication_type", CommunicationType),),
+    Contract: (("status_id", "status_name", ContractStatus),
+               ("life_id", "life_name", ContractLife),
+               ("restriction_id", "restriction_name", ContractRestriction)),
+    Contractor: (("type_id", "type_name", ContractorType),),
+}
+
+CATEGORY_MODELS = [category for columns in CATEGORY_COLUMNS.values() for _, _, category in columns]
+
+
+def map_categories(model, row: dict) -> list:
+    # Nimmt die Bezeichnungen aus der Zeile und liefert je gesetzter ID eine Zeile der Nachschlagetabelle
+    categories = []
+    for id_column, name_column, category in CATEGORY_COLUMNS.get(model, ()):
+        name = row.pop(name_column, None)
+        if row.get(id_column) is not None:
+            categories.append((category, {"internal_id": row[id_column], "name": name}))
+    return categories
@@ -0,0 +1,42 @@
+import logging
+from sqlalchemy import delete, select
+from wowicache.models import SyncCheckpoint
+
+logger = logging.getLogger('root')
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+
+
+class Checkpoints:
+    # Fortschritt je Entität: Anzahl der bereits geschriebenen API-Datensätze. Wird in derselben Transaktion
+    # wie die Seite selbst gespeichert, Daten und Stand passen daher nach einem Absturz immer zusammen.
+    def __init__(self, session):
+        self.session = session
+        self.progress = {}
+
+    def load(self) -> dict:
+        self.progress = {checkpoint.entity: (checkpoint.status, checkpoint.record_offset, checkpoint.rows)
+                         for checkpoint in self.session.scalars(select(SyncCheckpoint))}
+        self.session.commit()
+        return self.progress
+
+    def is_done(self, entity: str) -> bool:
+        return self.progress.get(entity, (None,))[0] == STATUS_DONE
+
+    def start_offset(self, entity: str) -> int:
+        status, record_offset, _ = self.progress.get(entity, (None, 0, 0))
+        return (record_offset or 0) if status == STATUS_RUNNING else 0
+
+    def start_rows(self, entity: str) -> int:
+        status, _, rows = self.progress.get(entity, (None, 0, 0))
+        return (rows or 0) if status == STATUS_RUNNING else 0
+
+    def save(self, entity: str, record_offset: int, rows: int, done: bool = False):
+        # Kein Commit, das übernimmt der Writer zusammen mit den Daten der Seite
+        self.session.merge(SyncCheckpoint(entity, STATUS_DONE if done else STATUS_RUNNING, record_offset, rows))
+
+    def clear(self):
+        self.session.execute(delete(SyncCheckpoint))
+        self.session.commit()
+        self.progress = {}
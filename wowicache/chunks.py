@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+logger = logging.getLogger('root')
+
+MANIFEST_SUFFIX = ".manifest"
+CHUNK_DIR = "chunks"
+CHUNK_SUFFIX = ".gz"
+# Vielfaches der sqlite-Seitengröße, damit eine geänderte Seite nur einen Block betrifft
+CHUNK_SIZE = 256 * 1024
+DIGEST_SIZE = 16
+
+
+class ChunkStore:
+    # Sicherungen als Liste inhaltsadressierter Blöcke. Unveränderte Blöcke werden zwischen den
+    # Generationen geteilt und nur einmal gespeichert, jede Generation ist eine kleine Manifest-Datei.
+    def __init__(self, backup_path: str, compression_level: int = 6):
+        self.backup_path = backup_path
+        self.chunk_path = os.path.join(backup_path, CHUNK_DIR)
+        self.compression_level = compression_level
+
+    def _chunk_file(self, digest: str) -> str:
+        return os.path.join(self.chunk_path, digest[:2], digest + CHUNK_SUFFIX)
+
+    def write_backup(self, source_file: str, manifest_file: str, chunk_size: int = CHUNK_SIZE) -> dict:
+        digests = []
+        new_chunks = 0
+        written = 0
+        size = 0
+        with open(source_file, "rb") as source:
+            while True:
+                data = source.read(chunk_size)
+                if not data:
+                    break
+                size += len(data)
+                digest = hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+                digests.append(digest)
+                chunk_file = self._chunk_file(digest)
+                if os.path.exists(chunk_file):
+                    continue
+                os.makedirs(os.path.dirname(chunk_file), exist_ok=True)
+                partial_file = f"{chunk_file}.part"
+                with gzip.open(partial_file, "wb", compresslevel=self.compression_level) as target:
+                    target.write(data)
+                os.replace(partial_file, chunk_file)
+                new_chunks += 1
+                written += os.path.getsize(chunk_file)
+
+        manifest = {"created": datetime.now().isoformat(timespec="seconds"), "size": size,
+                    "chunk_size": chunk_size, "chunks": digests}
+        # Manifest zuletzt und atomar schreiben, erst dann gilt die Generation als vorhanden
+        partial_manifest = f"{manifest_file}.part"
+        with open(partial_manifest, "w", encoding="utf-8") as target:
+            json.dump(manifest, target)
+        os.replace(partial_manifest, manifest_file)
+        logger.info(f"Incremental backup: {len(digests)} chunks, {new_chunks} new, "
+                    f"{written / 1024 / 1024:.1f} MB written")
+        return {"chunks": len(digests), "new_chunks": new_chunks, "written_bytes": written}
+
+    def restore(self, manifest_file: str, target_file: str):
+        with open(manifest_file, encoding="utf-8") as source:
+            manifest = json.load(source)
+        with open(target_file, "wb") as target:
+            for digest in manifest["chunks"]:
+                with gzip.open(self._chunk_file(digest), "rb") as chunk:
+                    data = chunk.read()
+                # Beschädigte oder fehlende Blöcke machen die ganze Generation unbrauchbar
+                if hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest() != digest:
+                    raise ValueError(f"Chunk {digest} of '{os.path.basename(manifest_file)}' is damaged")
+                target.write(data)
+        if os.path.getsize(target_file) != manifest["size"]:
+            raise ValueError(f"Restored size of '{os.path.basename(manifest_file)}' does not match the manifest")
+
+    def collect_garbage(self, manifest_files: list) -> int:
+        # Blöcke löschen, auf die keine der behaltenen Generationen mehr verweist
+        if not os.path.isdir(self.chunk_path):
+            return 0
+        used = set()
+        try:
+            for manifest_file in manifest_files:
+                with open(manifest_file, encoding="utf-8") as source:
+                    used.update(json.load(source)["chunks"])
+        except (OSError, ValueError, KeyError) as e:
+            # Ohne vollständige Liste der benutzten Blöcke lieber nichts löschen
+            logger.error(f"Could not read backup manifests, skipping chunk cleanup: {e}")
+            return 0
+        removed = 0
+        for directory, _, files in os.walk(self.chunk_path):
+            for file_name in files:
+                digest = file_name[:-len(CHUNK_SUFFIX)] if file_name.endswith(CHUNK_SUFFIX) else None
+                if digest in used:
+                    continue
+                try:
+                    os.remove(os.path.join(directory, file_name))
+                    removed += 1
+                except OSError as e:
+                    logger.error(f"Error while deletion of chunk {file_name}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} unused backup chunks.")
+        return removed
@@ -0,0 +1,258 @@
+import argparse
+import csv
+import logging
+import os
+from datetime import date
+from sqlalchemy import create_engine, select, or_, bindparam
+from sqlalchemy import BigInteger, Integer, Float, Numeric, Boolean, Date, DateTime
+from wowicache.models import Base, UseUnit, Contract, UsageType, FinancingType, ContractStatus, PostalAddress
+
+logger = logging.getLogger('root')
+
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+# Wie bei Hive: Verzeichnis je Wert, Zeilen ohne Wert landen in einem eigenen Verzeichnis
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Vorgefertigte Joins, werden wie Tabellen über ihren Namen exportiert. :on_date ist der Stichtag (heute).
+EXPORT_QUERIES = {
+    "use_units_with_active_contracts": (
+        select(UseUnit.internal_id.label("use_unit_id"), UseUnit.id_num.label("use_unit_id_num"), UseUnit.company_id,
+               UseUnit.economic_unit_id, UseUnit.building_id, PostalAddress.street_complete,
+               PostalAddress.house_number_complete, PostalAddress.postcode, PostalAddress.town,
+               UsageType.name.label("usage_type"),
+               FinancingType.name.label("financing_type"), UseUnit.living_space, UseUnit.usable_space,
+               UseUnit.number_of_rooms, Contract.internal_id.label("contract_id"),
+               Contract.id_num.label("contract_id_num"), ContractStatus.name.label("contract_status"),
+               Contract.contract_start, Contract.contract_end)
+        .join(Contract, Contract.use_unit_id == UseUnit.internal_id)
+        .outerjoin(PostalAddress, PostalAddress.internal_id == UseUnit.postal_address_id)
+        .outerjoin(UsageType, UsageType.internal_id == UseUnit.use_unit_usage_type_id)
+        .outerjoin(FinancingType, FinancingType.internal_id == UseUnit.financing_type_id)
+        .outerjoin(ContractStatus, ContractStatus.internal_id == Contract.status_id)
+        .where(Contract.is_vacancy.is_not(True),
+               or_(Contract.contract_end.is_(None), Contract.contract_end >= bindparam("on_date")))
+        .order_by(UseUnit.internal_id, Contract.internal_id)
+    ),
+}
+
+
+def export_tables() -> list:
+    # Alle Cache-Tabellen ohne die internen Tabellen des Syncs
+    return [table.name for table in Base.metadata.sorted_tables if not table.name.startswith("wowi_sync")]
+
+
+def _statement(name: str):
+    if name in EXPORT_QUERIES:
+        return EXPORT_QUERIES[name]
+    table = Base.metadata.tables.get(name)
+    if table is None:
+        available = ", ".join(export_tables() + list(EXPORT_QUERIES))
+        raise ValueError(f"Unknown export source '{name}', available: {available}")
+    return select(table).order_by(*table.primary_key.columns)
+
+
+def _arrow_type(pa, column_type):
+    if isinstance(column_type, (Integer, BigInteger)):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Numeric):
+        # Summen aus dem ERP ohne feste Nachkommastellen
+        if column_type.precision is not None:
+            return pa.decimal128(column_type.precision, column_type.scale or 0)
+        return pa.float64()
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+class CsvFile:
+    def __init__(self, path: str, columns: list):
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows: list):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ArrowFile:
+    def __init__(self, path: str, columns: list, types: list, file_format: str):
+        # pyarrow ist optional (pip install wowicache[export]), CSV geht auch ohne
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError(f"Export as {file_format} requires pyarrow, install it with: "
+                              f"pip install wowicache[export]")
+        self._pa = pyarrow
+        self.schema = pyarrow.schema([(name, _arrow_type(pyarrow, column_type))
+                                      for name, column_type in zip(columns, types)])
+        # Numeric ohne Genauigkeit kommt als Decimal und wird als float64 geschrieben
+        self._as_float = [isinstance(column_type, Numeric) and not isinstance(column_type, Float)
+                          and column_type.precision is None for column_type in types]
+        if file_format == "parquet":
+            self._writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self._sink = pyarrow.OSFile(path, "wb")
+            self._writer = pyarrow.ipc.new_file(self._sink, self.schema)
+
+    def write(self, rows: list):
+        # Spaltenweise umbauen, je Aufruf eine Row Group bzw. ein Record Batch
+        arrays = [self._pa.array([None if value is None else float(value) for value in values] if as_float
+                                 else values, type=field.type)
+                  for values, field, as_float in zip(zip(*rows), self.schema, self._as_float)]
+        self._writer.write_batch(self._pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+        if hasattr(self, "_sink"):
+            self._sink.close()
+
+
+class ExportTarget:
+    # Eine Datei je Quelle oder je Partition, geschrieben als .tmp und erst beim Abschluss umbenannt,
+    # damit Leser nie halbe Dateien sehen
+    def __init__(self, directory: str, name: str, columns: list, types: list, file_format: str,
+                 partition_index: int = None, partition_by: str = None):
+        self.directory = directory
+        self.name = name
+        self.columns = columns
+        self.types = types
+        self.file_format = file_format
+        self.partition_index = partition_index
+        self.partition_by = partition_by
+        self.files = {}
+        self.rows = 0
+
+    @property
+    def file_name(self) -> str:
+        return f"{self.name}{EXPORT_FORMATS[self.file_format]}"
+
+    def _path(self, partition) -> str:
+        if self.partition_index is None:
+            return os.path.join(self.directory, self.file_name)
+        value = NULL_PARTITION if partition is None else partition
+        directory = os.path.join(self.directory, self.name, f"{self.partition_by}={value}")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, self.file_name)
+
+    def _remove_stale_partitions(self, paths: list):
+        # Partitionen aus einem früheren Export, die es im aktuellen Stand nicht mehr gibt
+        root = os.path.join(self.directory, self.name)
+        for entry in os.listdir(root):
+            path = os.path.join(root, entry, self.file_name)
+            if entry.startswith(f"{self.partition_by}=") and path not in paths and os.path.exists(path):
+                os.remove(path)
+
+    def _file(self, partition):
+        if partition not in self.files:
+            path = self._path(partition)
+            # Die Partitionsspalte steht wie bei Hive nur im Verzeichnisnamen
+            columns = [column for index, column in enumerate(self.columns) if index != self.partition_index]
+            types = [column_type for index, column_type in enumerate(self.types) if index != self.partition_index]
+            if self.file_format == "csv":
+                writer = CsvFile(path + ".tmp", columns)
+            else:
+                writer = ArrowFile(path + ".tmp", columns, types, self.file_format)
+            self.files[partition] = (path, writer)
+        return self.files[partition][1]
+
+    def write(self, rows: list):
+        self.rows += len(rows)
+        if self.partition_index is None:
+            self._file(None).write(rows)
+            return
+        partitions = {}
+        index = self.partition_index
+        for row in rows:
+            partitions.setdefault(row[index], []).append(row[:index] + row[index + 1:])
+        for partition, partition_rows in partitions.items():
+            self._file(partition).write(partition_rows)
+
+    def close(self, commit: bool = True) -> list:
+        if not self.files and commit:
+            # Leere Quelle: trotzdem eine Datei mit Spalten, damit nachfolgende Schritte sie finden
+            self._file(None if self.partition_index is None else NULL_PARTITION)
+        paths = []
+        for path, writer in self.files.values():
+            writer.close()
+            if commit:
+                os.replace(path + ".tmp", path)
+                paths.append(path)
+            else:
+                os.remove(path + ".tmp")
+        if commit and self.partition_index is not None:
+            self._remove_stale_partitions(paths)
+        return paths
+
+
+def export_source(engine, name: str, directory: str, file_format: str = "parquet", batch_size: int = 50000,
+                  partition_by: str = None, on_date: date = None) -> dict:
+    # Seitenweise aus einem Server-Cursor (stream_results), der Speicherbedarf hängt nur von batch_size ab
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{file_format}', available: {', '.join(EXPORT_FORMATS)}")
+    statement = _statement(name)
+    columns = [column.key for column in statement.selected_columns]
+    types = [column.type for column in statement.selected_columns]
+    partition_index = columns.index(partition_by) if partition_by in columns else None
+    if partition_by and partition_index is None:
+        logger.debug(f"Export {name}: no column {partition_by}, written unpartitioned.")
+    target = ExportTarget(directory, name, columns, types, file_format, partition_index, partition_by)
+    params = {"on_date": on_date or date.today()} if name in EXPORT_QUERIES else {}
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(statement, params)
+            for rows in result.partitions(batch_size):
+                target.write(rows)
+    except BaseException:
+        target.close(commit=False)
+        raise
+    paths = target.close()
+    logger.info(f"Exported {target.rows} rows of {name} to {len(paths)} {file_format} file(s).")
+    return {"source": name, "rows": target.rows, "files": paths}
+
+
+def export_cache(connection_string_or_engine, directory: str, sources: list = None, file_format: str = "parquet",
+                 batch_size: int = 50000, partition_by: str = None, on_date: date = None) -> list:
+    # Ohne Angabe alle Cache-Tabellen, Quellen sind Tabellennamen (wowi_use_units) oder Namen aus EXPORT_QUERIES
+    engine = connection_string_or_engine
+    if isinstance(engine, str):
+        engine = create_engine(engine)
+    os.makedirs(directory, exist_ok=True)
+    return [export_source(engine, name, directory, file_format, batch_size, partition_by, on_date)
+            for name in sources or export_tables()]
+
+
+def parse_sources(value: str | None) -> list | None:
+    # Format: "wowi_use_units, use_units_with_active_contracts"
+    if not value:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export cache tables in batches to Parquet, Arrow IPC or CSV files.")
+    parser.add_argument("--db", required=True, help="SQLAlchemy connection string of the cache database")
+    parser.add_argument("--out", required=True, help="target directory")
+    parser.add_argument("--format", dest="file_format", default="parquet", choices=list(EXPORT_FORMATS))
+    parser.add_argument("--sources", help="comma separated tables or export queries, default: all cache tables")
+    parser.add_argument("--batch-size", type=int, default=50000, help="rows per batch (row group)")
+    parser.add_argument("--partition-by", help="column to partition by, e.g. company_id")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    for export in export_cache(args.db, args.out, parse_sources(args.sources), args.file_format, args.batch_size,
+                               args.partition_by):
+        print(f"{export['source']:<35}{export['rows']:>10}{len(export['files']):>6} file(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import logging
+from sqlalchemy import Index, MetaData, Table, inspect
+from wowicache.models import Base
+from wowicache.queries import LOOKUP_QUERIES
+
+logger = logging.getLogger('root')
+
+INDEX_PREFIX = "ix_"
+# Zweiter Name, damit Indizes auf Staging-Tabellen nicht mit denen der Live-Tabellen kollidieren
+ALTERNATE_SUFFIX = "_b"
+
+# Tabelle -> Spalten der Rückwärtssuche
+MANAGED_INDEXES = [
+    ("wowi_communications", ("phone_number",)),
+    ("wowi_communications", ("phone_reversed",)),
+    ("wowi_communications", ("person_id",)),
+    ("wowi_addresses", ("person_id",)),
+    ("wowi_persons", ("id_num",)),
+    ("wowi_economic_units", ("id_num",)),
+    ("wowi_buildings", ("id_num",)),
+    ("wowi_buildings", ("economic_unit_id",)),
+    ("wowi_use_units", ("id_num",)),
+    ("wowi_use_units", ("building_id",)),
+    ("wowi_use_units", ("economic_unit_id",)),
+    ("wowi_contracts", ("id_num",)),
+    ("wowi_contracts", ("use_unit_id",)),
+    ("wowi_contracts", ("virtual_iban",)),
+    ("wowi_contractors", ("person_id",)),
+    ("wowi_contractors", ("use_unit_id",)),
+    ("wowi_contractors", ("contract_id",)),
+    ("wowi_memberships", ("id_num",)),
+    ("wowi_payment_modes", ("contract_id",)),
+    ("wowi_buildings", ("postal_address_id",)),
+    ("wowi_use_units", ("postal_address_id",)),
+    ("wowi_addresses", ("postal_address_id",)),
+    ("wowi_postal_addresses", ("street",)),
+    ("wowi_postal_addresses", ("match_key",)),
+    ("wowi_current_occupancy", ("use_unit_id",)),
+    ("wowi_current_occupancy", ("building_id",)),
+    ("wowi_current_occupancy", ("person_id",)),
+    ("wowi_current_occupancy", ("phone",)),
+]
+
+
+def parse_custom_indexes(setting: str | None) -> list:
+    # Format: "wowi_persons:last_name,first_name;wowi_use_units:floor_id"
+    indexes = []
+    if not setting:
+        return indexes
+    for part in setting.split(";"):
+        if not part.strip():
+            continue
+        try:
+            table_name, columns = part.split(":")
+        except ValueError:
+            logger.error(f"Invalid custom index definition '{part}', expected table:column[,column]")
+            continue
+        indexes.append((table_name.strip(), tuple(column.strip() for column in columns.split(","))))
+    return indexes
+
+
+def index_name(table_name: str, columns: tuple) -> str:
+    return f"{INDEX_PREFIX}{table_name}_{'_'.join(columns)}"
+
+
+def _drop_index(engine, table_name: str, index: dict):
+    # Über die Tabelle aus der Datenbank, der Index kann auf Spalten liegen, die es im Modell nicht mehr gibt
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    Index(index["name"], *[table.c[column] for column in index["column_names"]]).drop(bind=engine)
+
+
+def _create_index(engine, table_name: str, name: str, columns: tuple):
+    # Ebenfalls über eine reflektierte Tabelle, sonst bleibt der Index an den Modell-Metadaten hängen und
+    # create_all legt ihn beim nächsten Lauf im selben Prozess ein zweites Mal an
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    Index(name, *[table.c[column] for column in columns]).create(bind=engine)
+
+
+def drop_indexes(engine, tables: dict = None):
+    # Vor einem vollständigen Neuladen, damit die Inserts keine Indizes pflegen müssen
+    inspector = inspect(engine)
+    dropped = 0
+    for table in Base.metadata.sorted_tables:
+        target = (tables or {}).get(table, table)
+        if not inspector.has_table(target.name):
+            continue
+        for index in inspector.get_indexes(target.name):
+            if index["name"] and index["name"].startswith(INDEX_PREFIX):
+                _drop_index(engine, target.name, index)
+                dropped += 1
+    logger.info(f"Dropped {dropped} indexes before load.")
+
+
+def drop_retired_indexes(engine, tables: dict = None, custom_indexes: list = None) -> int:
+    # Verwaltete Indizes (Präfix ix_), die nicht mehr in MANAGED_INDEXES oder custom_indexes stehen, z.B. aus
+    # älteren Versionen auf Spalten, deren Werte jetzt in der Adressdimension liegen
+    wanted = {(table_name, tuple(columns)) for table_name, columns in MANAGED_INDEXES + (custom_indexes or [])}
+    inspector = inspect(engine)
+    dropped = 0
+    for table in Base.metadata.sorted_tables:
+        target = (tables or {}).get(table, table)
+        if not inspector.has_table(target.name):
+            continue
+        for index in inspector.get_indexes(target.name):
+            name = index["name"]
+            if name and name.startswith(INDEX_PREFIX) and (table.name, tuple(index["column_names"])) not in wanted:
+                _drop_index(engine, target.name, index)
+                logger.info(f"Dropped retired index {name} on {target.name}({', '.join(index['column_names'])})")
+                dropped += 1
+    return dropped
+
+
+def create_indexes(engine, tables: dict = None, custom_indexes: list = None):
+    drop_retired_indexes(engine, tables, custom_indexes)
+    inspector = inspect(engine)
+    live_tables = {table.name: table for table in Base.metadata.sorted_tables}
+    used_names = set()
+    for table_name in inspector.get_table_names():
+        used_names.update(index["name"] for index in inspector.get_indexes(table_name) if index["name"])
+
+    created = 0
+    for table_name, columns in MANAGED_INDEXES + (custom_indexes or []):
+        table = live_tables.get(table_name)
+        if table is None or any(column not in table.c for column in columns):
+            logger.error(f"Cannot create index on {table_name}({', '.join(columns)}): unknown table or column")
+            continue
+        target = (tables or {}).get(table, table)
+        existing = {tuple(index["column_names"]) for index in inspector.get_indexes(target.name)} \
+            if inspector.has_table(target.name) else set()
+        if columns in existing:
+            continue
+        name = index_name(table_name, columns)
+        if name in used_names:
+            name += ALTERNATE_SUFFIX
+        if name in used_names:
+            logger.error(f"Cannot create index {name}: name already in use")
+            continue
+        _create_index(engine, target.name, name, columns)
+        used_names.add(name)
+        created += 1
+    logger.info(f"Created {created} indexes.")
+
+
+def _explain(conn, statement, params: dict) -> tuple:
+    sql = str(statement.params(**params).compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+        # SCAN bedeutet Durchlauf über Tabelle oder ganzen Index statt gezielter Suche
+        uses_index = not any(line.startswith("SCAN") for line in plan)
+        return uses_index, plan
+    if dialect == "postgresql":
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {sql}")]
+        return not any("Seq Scan" in line for line in plan), plan
+    if dialect == "mysql":
+        result = conn.exec_driver_sql(f"EXPLAIN {sql}")
+        rows = [dict(zip(result.keys(), row)) for row in result]
+        plan = [f"{row.get('table')}: {row.get('type')} {row.get('key')}" for row in rows]
+        return not any(row.get("type") == "ALL" for row in rows), plan
+    return None, []
+
+
+def verify_index_usage(engine) -> dict:
+    results = {}
+    with engine.begin() as conn:
+        for name, (statement, params) in LOOKUP_QUERIES.items():
+            uses_index, plan = _explain(conn, statement, params)
+            results[name] = uses_index
+            if uses_index is None:
+                logger.info(f"Index check for {name} not supported on {engine.dialect.name}")
+            elif uses_index:
+                logger.info(f"Lookup {name} uses indexes: {' | '.join(plan)}")
+            else:
+                logger.warning(f"Lookup {name} does not use an index: {' | '.join(plan)}")
+    return results
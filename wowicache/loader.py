@@ -0,0 +1,355 @@
+import logging
+import time
+import hashlib
+from collections import Counter
+from sqlalchemy import inspect, select, and_, bindparam
+from wowicache.models import Base, SyncFingerprint
+from wowicache.backends import LoadBackend
+
+logger = logging.getLogger('root')
+
+LOAD_MODE_ORM = "orm"
+LOAD_MODE_BULK = "bulk"
+SYNC_MODE_FULL = "full"
+SYNC_MODE_DELTA = "delta"
+DEFAULT_CHUNK_SIZE = 5000
+
+# Tabellen, auf die Fremdschlüssel zeigen. Nur deren Schlüssel werden für die Prüfung im Speicher gehalten.
+REFERENCED_TABLES = {fk.column.table.name for table in Base.metadata.tables.values() for fk in table.foreign_keys}
+
+
+class OrmWriter:
+    mode = LOAD_MODE_ORM
+    unique_keys = False
+
+    def __init__(self, session):
+        self.session = session
+        self.stats = {}
+        self.rejected = {}
+        self._pending = set()
+        self._column_keys = {}
+        self._primary_keys = {}
+        self._foreign_keys = {}
+        self._seen_keys = {}
+
+    def _keys_for(self, model) -> dict:
+        # Attributname -> Spaltenname (z.B. UseUnit.description_of_position -> position_description)
+        keys = self._column_keys.get(model)
+        if keys is None:
+            mapper = inspect(model)
+            keys = {attr.key: attr.columns[0].key for attr in mapper.column_attrs}
+            self._column_keys[model] = keys
+            self._primary_keys[model] = [mapper.get_property_by_column(col).key for col in mapper.primary_key]
+            self._foreign_keys[model] = [(mapper.get_property_by_column(fk.parent).key, fk.column.table.name)
+                                         for fk in model.__table__.foreign_keys]
+        return keys
+
+    def begin(self, *models, shared: bool = False):
+        # Ab hier gilt die Tabelle als in diesem Lauf geladen, Fremdschlüssel darauf werden geprüft.
+        # shared: Dimensionstabelle, die von mehreren Abschnitten befüllt wird (nur für den Delta-Modus relevant)
+        for model in models:
+            if model.__tablename__ in REFERENCED_TABLES:
+                self._seen_keys.setdefault(model.__tablename__, set())
+
+    def finish(self):
+        pass
+
+    def changes(self, model) -> dict | None:
+        # Nur im Delta-Modus: eingefügte, geänderte, unveränderte und gelöschte Zeilen der Tabelle
+        return None
+
+    def has_key(self, model, pk: tuple) -> bool:
+        seen = self._seen_keys.get(model.__tablename__)
+        return seen is not None and pk in seen
+
+    def load_seen_keys(self, model):
+        # Beim Fortsetzen eines abgebrochenen Laufs: bereits geschriebene Schlüssel übernehmen,
+        # damit Duplikat- und Fremdschlüsselprüfung auch über den Abbruch hinweg greifen
+        self._keys_for(model)
+        table = getattr(self, "tables", {}).get(model.__table__, model.__table__)
+        columns = [table.c[column.name] for column in model.__table__.primary_key.columns]
+        seen = self._seen_keys.setdefault(model.__tablename__, set())
+        seen.update(tuple(row) for row in self.session.execute(select(*columns)))
+
+    def _accept(self, model, row: dict, validate: bool) -> bool:
+        self._keys_for(model)
+        table_name = model.__tablename__
+        seen = self._seen_keys.get(table_name)
+        if seen is None:
+            if not validate:
+                return True
+            seen = self._seen_keys.setdefault(table_name, set())
+
+        pk = tuple(row.get(attr) for attr in self._primary_keys[model])
+        reason = None
+        if pk in seen and (validate or self.unique_keys):
+            reason = "duplicate key"
+        elif validate:
+            for attr, parent_table in self._foreign_keys[model]:
+                value = row.get(attr)
+                parent_keys = self._seen_keys.get(parent_table)
+                # Nur gegen Tabellen prüfen, die in diesem Lauf geladen wurden
+                if value is not None and parent_keys is not None and (value,) not in parent_keys:
+                    reason = f"unknown {parent_table}"
+                    break
+        if reason is not None:
+            self.rejected.setdefault(table_name, Counter())[reason] += 1
+            return False
+        seen.add(pk)
+        return True
+
+    def log_rejected(self, model, label: str) -> Counter:
+        reasons = self.rejected.pop(model.__tablename__, None)
+        if reasons:
+            details = ", ".join(f"{reason} {count}" for reason, count in reasons.most_common())
+            logger.warning(f"Rejected {sum(reasons.values())} {label}: {details}")
+        return reasons or Counter()
+
+    def _count(self, table_name: str, rows: int, seconds: float):
+        count, elapsed = self.stats.get(table_name, (0, 0.0))
+        self.stats[table_name] = (count + rows, elapsed + seconds)
+
+    def add(self, model, row: dict, validate: bool = False) -> bool:
+        if not self._accept(model, row, validate):
+            return False
+        start = time.perf_counter()
+        self.session.add(model(**row))
+        self._pending.add(model.__tablename__)
+        self._count(model.__tablename__, 1, time.perf_counter() - start)
+        return True
+
+    def end_page(self):
+        # Objekte nach dem Schreiben aus der Session lösen, damit der Speicher pro Seite konstant bleibt
+        start = time.perf_counter()
+        self.session.flush()
+        self.session.expunge_all()
+        elapsed = time.perf_counter() - start
+        for table_name in self._pending:
+            self._count(table_name, 0, elapsed / len(self._pending))
+
+    def commit(self):
+        start = time.perf_counter()
+        self.session.commit()
+        elapsed = time.perf_counter() - start
+        # Commit-Zeit auf die Tabellen verteilen, die seit dem letzten Commit Zeilen bekommen haben
+        for table_name in self._pending:
+            self._count(table_name, 0, elapsed / len(self._pending))
+        self._pending.clear()
+
+    def log_stats(self):
+        for table_name, (count, elapsed) in self.stats.items():
+            rate = count / elapsed if elapsed > 0 else 0.0
+            logger.info(f"Load stats ({self.mode}) {table_name}: {count} rows in {elapsed:.2f}s "
+                        f"({rate:.0f} rows/s)")
+
+
+class BulkWriter(OrmWriter):
+    mode = LOAD_MODE_BULK
+
+    def __init__(self, session, chunk_size: int = DEFAULT_CHUNK_SIZE, tables: dict = None,
+                 backend: LoadBackend = None):
+        super().__init__(session)
+        self.chunk_size = chunk_size
+        # Dialektspezifischer Schreibweg (COPY, mehrzeilige INSERTs), sonst executemany
+        self.backend = backend or LoadBackend(None)
+        # Optionale Umleitung Live-Tabelle -> Zieltabelle (z.B. Staging-Tabellen)
+        self.tables = tables or {}
+        self._buffers = {}
+
+    def add(self, model, row: dict, validate: bool = False) -> bool:
+        if not self._accept(model, row, validate):
+            return False
+        keys = self._column_keys[model]
+        buffer = self._buffers.setdefault(model.__table__, [])
+        buffer.append({keys[attr]: value for attr, value in row.items()})
+        if len(buffer) >= self.chunk_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        # Tabellen in Fremdschlüssel-Reihenfolge schreiben, damit Kinder nie vor ihren Eltern landen
+        for table in Base.metadata.sorted_tables:
+            rows = self._buffers.get(table)
+            if not rows:
+                continue
+            start = time.perf_counter()
+            self.backend.insert(self.session, self.tables.get(table, table), rows)
+            self._count(table.name, len(rows), time.perf_counter() - start)
+            self._pending.add(table.name)
+            self._buffers[table] = []
+
+    def end_page(self):
+        # Puffer sind bereits durch chunk_size begrenzt
+        pass
+
+    def commit(self):
+        self.flush()
+        super().commit()
+
+
+class DeltaWriter(BulkWriter):
+    mode = SYNC_MODE_DELTA
+    # Updates und Löschungen laufen über den Primärschlüssel, Duplikate daher immer verwerfen
+    unique_keys = True
+
+    def __init__(self, session, chunk_size: int = DEFAULT_CHUNK_SIZE, backend: LoadBackend = None):
+        super().__init__(session, chunk_size, backend=backend)
+        self._existing = {}
+        self._updates = {}
+        self._fingerprints = {}
+        self._stale_fingerprints = {}
+        self._shared = set()
+        self.summary = {}
+
+    @staticmethod
+    def row_key(pk: tuple) -> str:
+        return "|".join(str(value) for value in pk)
+
+    @staticmethod
+    def fingerprint(values: dict) -> str:
+        return hashlib.blake2b(repr(sorted(values.items())).encode(), digest_size=16).hexdigest()
+
+    def begin(self, *models, shared: bool = False):
+        super().begin(*models)
+        # Vorhandene Schlüssel und Fingerprints der Tabellen laden, die dieser Abschnitt vollständig liefert
+        fp_table = SyncFingerprint.__table__
+        for model in models:
+            if shared:
+                self._shared.add(model)
+            if model in self._existing:
+                continue
+            self._keys_for(model)
+            table = model.__table__
+            known = {row_key: fingerprint for row_key, fingerprint in self.session.execute(
+                select(fp_table.c.row_key, fp_table.c.fingerprint).where(fp_table.c.table_name == table.name))}
+            existing = {}
+            for pk in self.session.execute(select(*table.primary_key.columns)):
+                pk = tuple(pk)
+                existing[pk] = known.get(self.row_key(pk))
+            self._existing[model] = existing
+            self._seen_keys.setdefault(table.name, set())
+            self.summary[table.name] = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    def add(self, model, row: dict, validate: bool = False) -> bool:
+        if model not in self._existing:
+            self.begin(model)
+        if not self._accept(model, row, validate):
+            return False
+        keys = self._column_keys[model]
+        pk = tuple(row.get(attr) for attr in self._primary_keys[model])
+
+        values = {keys[attr]: value for attr, value in row.items()}
+        fingerprint = self.fingerprint(values)
+        summary = self.summary[model.__tablename__]
+        existing = self._existing[model]
+        if pk in existing:
+            if existing[pk] == fingerprint:
+                summary["unchanged"] += 1
+                return True
+            summary["updated"] += 1
+            self._updates.setdefault(model.__table__, []).append(values)
+            if existing[pk] is not None:
+                self._stale_fingerprints.setdefault(model.__tablename__, []).append(self.row_key(pk))
+        else:
+            summary["inserted"] += 1
+            self._buffers.setdefault(model.__table__, []).append(values)
+        self._fingerprints.setdefault(model.__tablename__, []).append((self.row_key(pk), fingerprint))
+        if len(self._buffers.get(model.__table__, ())) + len(self._updates.get(model.__table__, ())) \
+                >= self.chunk_size:
+            self.flush()
+        return True
+
+    def changes(self, model) -> dict | None:
+        # Dasselbe Objekt wie in summary, die Löschungen trägt finish() am Ende des Laufs nach
+        return self.summary.get(model.__tablename__)
+
+    def flush(self):
+        super().flush()
+        for table in Base.metadata.sorted_tables:
+            rows = self._updates.get(table)
+            if not rows:
+                continue
+            pk_columns = list(table.primary_key.columns)
+            pk_keys = {column.key for column in pk_columns}
+            stmt = table.update().where(and_(*[column == bindparam(f"pk_{column.key}") for column in pk_columns]))
+            params = []
+            for values in rows:
+                param = {key: value for key, value in values.items() if key not in pk_keys}
+                param.update({f"pk_{column.key}": values[column.key] for column in pk_columns})
+                params.append(param)
+            start = time.perf_counter()
+            self.session.execute(stmt, params)
+            self._count(table.name, len(rows), time.perf_counter() - start)
+            self._pending.add(table.name)
+            self._updates[table] = []
+        self._write_fingerprints()
+
+    def _write_fingerprints(self):
+        fp_table = SyncFingerprint.__table__
+        for table_name, row_keys in self._stale_fingerprints.items():
+            if row_keys:
+                self._delete_fingerprints(table_name, row_keys)
+                self._stale_fingerprints[table_name] = []
+        for table_name, fingerprints in self._fingerprints.items():
+            if not fingerprints:
+                continue
+            self.backend.insert(self.session, fp_table, [
+                {"table_name": table_name, "row_key": row_key, "fingerprint": fingerprint}
+                for row_key, fingerprint in fingerprints])
+            self._fingerprints[table_name] = []
+
+    def _delete_fingerprints(self, table_name: str, row_keys: list):
+        fp_table = SyncFingerprint.__table__
+        stmt = fp_table.delete().where(and_(fp_table.c.table_name == table_name,
+                                            fp_table.c.row_key == bindparam("fp_row_key")))
+        self.session.execute(stmt, [{"fp_row_key": row_key} for row_key in row_keys])
+
+    def _referenced_keys(self, table) -> set:
+        # Schlüssel, auf die noch Zeilen anderer Tabellen zeigen
+        keys = set()
+        for child in Base.metadata.sorted_tables:
+            for fk in child.foreign_keys:
+                if fk.column.table is table:
+                    keys.update(tuple(row) for row in self.session.execute(
+                        select(fk.parent).where(fk.parent.is_not(None)).distinct()))
+        return keys
+
+    def finish(self):
+        # Zeilen, die die API nicht mehr liefert, erst ganz am Ende löschen (Kinder vor Eltern)
+        self.flush()
+        models = {model.__table__: model for model in self._existing}
+        for table in reversed(Base.metadata.sorted_tables):
+            model = models.get(table)
+            if model is None:
+                continue
+            missing = [pk for pk in self._existing[model] if pk not in self._seen_keys[table.name]]
+            if missing and model in self._shared:
+                # Dimensionen: nur Zeilen löschen, auf die nichts mehr verweist. Abschnitte, die in diesem Lauf
+                # nicht geladen wurden, verweisen weiter auf ihre Einträge.
+                referenced = self._referenced_keys(table)
+                missing = [pk for pk in missing if pk not in referenced]
+            if missing:
+                pk_columns = list(table.primary_key.columns)
+                stmt = table.delete().where(and_(*[column == bindparam(f"pk_{column.key}")
+                                                   for column in pk_columns]))
+                start = time.perf_counter()
+                self.session.execute(stmt, [{f"pk_{column.key}": value for column, value in zip(pk_columns, pk)}
+                                            for pk in missing])
+                self._count(table.name, len(missing), time.perf_counter() - start)
+                self._pending.add(table.name)
+                self._delete_fingerprints(table.name, [self.row_key(pk) for pk in missing])
+            self.summary[table.name]["deleted"] = len(missing)
+        self.commit()
+        for table_name, counts in self.summary.items():
+            logger.info(f"Delta {table_name}: inserted {counts['inserted']}, updated {counts['updated']}, "
+                        f"deleted {counts['deleted']}, unchanged {counts['unchanged']}")
+
+
+def create_writer(session, load_mode: str = None, chunk_size: int = None, sync_mode: str = None,
+                  staging_tables: dict = None, backend: LoadBackend = None) -> OrmWriter:
+    if sync_mode is not None and sync_mode.lower() == SYNC_MODE_DELTA:
+        return DeltaWriter(session, chunk_size or DEFAULT_CHUNK_SIZE, backend)
+    # ORM-Objekte sind fest an die Live-Tabellen gebunden, Staging geht daher immer über den Bulk-Pfad
+    if staging_tables or (load_mode is not None and load_mode.lower() == LOAD_MODE_BULK):
+        return BulkWriter(session, chunk_size or DEFAULT_CHUNK_SIZE, staging_tables, backend)
+    return OrmWriter(session)
@@ -0,0 +1,292 @@
+import keyword
+from datetime import datetime
+from functools import lru_cache
+
+DATE_FORMAT = "%Y-%m-%d"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Stichtage wiederholen sich über sehr viele Datensätze, geparst wird jeder Wert nur einmal
+DATE_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_date(value) -> datetime:
+    return datetime.strptime(str(value), DATE_FORMAT)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_datetime(value) -> datetime:
+    return datetime.strptime(str(value), DATETIME_FORMAT)
+
+
+def parse_date(value) -> datetime | None:
+    # Die API liefert je nach Endpunkt date-Objekte oder Strings
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return _parse_date(value)
+
+
+def parse_datetime(value) -> datetime | None:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return _parse_datetime(value)
+
+
+def _path_expression(path: str) -> str:
+    # "a.b?.c" -> entry.a.b.c, wobei ein leeres entry.a.b zu None führt.
+    # Pfade mit "parent." beginnen beim übergeordneten Datensatz (z.B. Person einer Adresse).
+    parts = path.split(".")
+    root = "entry"
+    if parts[0] == "parent":
+        root = "parent"
+        parts = parts[1:]
+    optional = []
+    expression = root
+    for part in parts:
+        name = part.rstrip("?")
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError(f"Invalid attribute '{name}' in field path '{path}'")
+        expression += "." + name
+        if part.endswith("?"):
+            optional.append(expression)
+    for guard in reversed(optional):
+        expression = f"({expression} if {guard} else None)"
+    return expression
+
+
+def compile_mapper(name: str, fields: dict):
+    # Feld -> Pfad, (Pfad, Konverter) oder Funktion(entry). Daraus wird einmalig eine Funktion
+    # erzeugt, die das Dictionary in einem Ausdruck baut, ohne Schleife über die Felder je Datensatz.
+    namespace = {}
+    items = []
+    for number, (column, spec) in enumerate(fields.items()):
+        if callable(spec):
+            namespace[f"_f{number}"] = spec
+            items.append(f"{column!r}: _f{number}(entry)")
+            continue
+        convert = None
+        if isinstance(spec, tuple):
+            spec, convert = spec
+        expression = _path_expression(spec)
+        if convert is not None:
+            namespace[f"_c{number}"] = convert
+            expression = f"_c{number}({expression})"
+        items.append(f"{column!r}: {expression}")
+    source = f"def map_{name}(entry, parent=None):\n    return {{{', '.join(items)}}}\n"
+    exec(compile(source, f"<mapper {name}>", "exec"), namespace)
+    mapper = namespace[f"map_{name}"]
+    mapper.fields = fields
+    mapper.source = source
+    return mapper
+
+
+DISTRICT_FIELDS = {
+    "internal_id": "id_",
+    "name": "name",
+}
+
+ECONOMIC_UNIT_FIELDS = {
+    "internal_id": "id_",
+    "id_num": "id_num",
+    "company_id": "company_code.id_",
+    "name": "name",
+    "location": "location",
+    "construction_year": "construction_year",
+    "info": "info",
+    "owner_id": "owner.id_",
+    "district_id": "district?.id_",
+}
+
+BUILDING_FIELDS = {
+    "internal_id": "id_",
+    "id_num": "id_num",
+    "company_id": "company_code.id_",
+    "building_land_type": "building_land_type",
+    "entry_date": ("entry_date", parse_date),
+    "economic_unit_id": "economic_unit.id_",
+    "postcode": "estate_address.zip_",
+    "town": "estate_address.town",
+    "street": "estate_address.street",
+    "house_number": "estate_address.house_number",
+    "house_number_addition": "estate_address.house_number_addition",
+    "country_id": "estate_address.country_id",
+    "country": "estate_address.country_code",
+    "street_complete": "estate_address.street_complete",
+    "house_number_complete": "estate_address.house_number_complete",
+    "construction_year": "building.construction_year",
+    "move_in_date": ("building.move_in_date", parse_date),
+    "building_type_id": "building.building_type.id_",
+    "building_type_name": "building.building_type.name",
+    "district_id": "building.district?.id_",
+}
+
+USE_UNIT_FIELDS = {
+    "internal_id": "id_",
+    "id_num": "id_num",
+    "company_id": "company_code.id_",
+    "entry_date": ("entry_date", parse_date),
+    "building_id": "building_land.id_",
+    "economic_unit_id": "economic_unit.id_",
+    "postcode": "estate_address.zip_",
+    "town": "estate_address.town",
+    "street": "estate_address.street",
+    "house_number": "estate_address.house_number",
+    "house_number_addition": "estate_address.house_number_addition",
+    "country_id": "estate_address.country_id",
+    "country": "estate_address.country_code",
+    "street_complete": "estate_address.street_complete",
+    "house_number_complete": "estate_address.house_number_complete",
+    "financing_type_id": "financing_type?.id_",
+    "financing_type": "financing_type?.name",
+    "use_unit_usage_type_id": "current_use_unit_type.use_unit_usage_type.id_",
+    "use_unit_usage_type": "current_use_unit_type.use_unit_usage_type.name",
+    "usable_space": "usable_space",
+    "living_space": "living_space",
+    "heating_space": "heating_space",
+    "number_of_rooms": "number_of_rooms",
+    "number_of_half_rooms": "number_of_half_rooms",
+    "description_of_position": "description_of_position",
+    "management_start": ("management_start", parse_date),
+    "management_end": ("management_end", parse_date),
+    "move_in_date": ("move_in_date", parse_date),
+    "exit_date": ("exit_date", parse_date),
+    "position_id": "position?.id_",
+    "position": "position?.name",
+    "floor_id": "floor?.id_",
+    "floor_name": "floor?.name",
+    "floor_level": "floor?.level_to_ground",
+}
+
+PERSON_FIELDS = {
+    "internal_id": "id_",
+    "id_num": "id_num",
+    "name": "name",
+    "short_name": "shortname",
+    "valid_from": ("valid_from", parse_date),
+    "valid_to": ("valid_to", parse_date),
+    "long_name_1": "legal_person.long_name1",
+    "long_name_2": "legal_person.long_name2",
+    "vat_id": "legal_person.vat_id",
+    "commercial_register_number": "legal_person.commercial_register_number",
+    "commercial_register_town": "legal_person.commercial_register_town",
+    "first_name": "natural_person.first_name",
+    "last_name": "natural_person.last_name",
+    "birth_date": ("natural_person.birth_date", parse_date),
+    "gender_id": "natural_person.gender?.id_",
+    "gender_name": "natural_person.gender?.name",
+    "death_date": "natural_person.death_date",
+    "title": "natural_person.title",
+    "is_natural_person": lambda entry: not (entry.natural_person.first_name is None and
+                                            entry.natural_person.last_name is None),
+}
+
+ADDRESS_FIELDS = {
+    "internal_id": "id_",
+    "postcode": "zip_",
+    "town": "town",
+    "street": "street",
+    "house_number": "house_number",
+    "house_number_addition": "house_number_addition",
+    "country_id": "country?.id_",
+    "country": "country?.code",
+    "street_complete": "street_complete",
+    "house_number_complete": "house_number_complete",
+    "address_type_id": "address_type?.id_",
+    "address_type": "address_type?.name",
+    "valid_from": ("valid_from", parse_date),
+    "valid_to": ("valid_to", parse_date),
+    "person_id": "parent.id_",
+}
+
+COMMUNICATION_FIELDS = {
+    "internal_id": "id_",
+    "related_address_id": "related_address_id",
+    "content": "content",
+    "explanation": "explanation",
+    "communication_type_id": "communication_type.id_",
+    "communication_type": "communication_type.name",
+    "person_id": "parent.id_",
+}
+
+CONTRACT_FIELDS = {
+    "internal_id": "id_",
+    "id_num": "id_num",
+    "use_unit_id": "use_unit.id_",
+    "restriction_id": "restriction_of_use.id_",
+    "restriction_name": "restriction_of_use.name",
+    "is_vacancy": "restriction_of_use.is_vacancy",
+    "status_id": "status_contract.id_",
+    "status_name": "status_contract.name",
+    "life_id": "life_of_contract.id_",
+    "life_name": "life_of_contract.name",
+    "contract_start": ("start_contract", parse_datetime),
+    "contract_end": ("end_of_contract", parse_datetime),
+    "virtual_iban": "banking?.virtual_iban",
+    "virtual_bic": "banking?.collective_account?.bic",
+}
+
+CONTRACTOR_FIELDS = {
+    "internal_id": "id_",
+    "contract_id": "license_agreement_id",
+    "use_unit_id": "use_unit.id_",
+    "person_id": "person.id_",
+    "type_id": "contractor_type.id_",
+    "type_name": "contractor_type.name",
+    "valid_from": ("contractual_use_valid_from", parse_date),
+    "valid_to": ("contractual_use_valid_to", parse_date),
+}
+
+MEMBERSHIP_FIELDS = {
+    "internal_id": "id_",
+    "id_num": "id_num",
+    "creation_date": ("creation_date", parse_date),
+    "valid_from": ("valid_from", parse_date),
+    "valid_to": ("valid_to", parse_date),
+    "is_payout_block_account": "is_payout_block_account",
+    "cooperative_account_clearing_lock": "cooperative_account_clearing_lock",
+    "subsidy_application_for_several_fiscal_years_allowed": "subsidy_application_for_several_fiscal_years_allowed",
+    "no_participation_electoral_district": "no_participation_electoral_district",
+    "active_amount_sum": "active_amount_sum",
+    "active_count_sum": "active_count_sum",
+    "membership_status_id": "membership_status_id",
+    "membership_status_code": "membership_status_code",
+    "electoral_district_id": "electoral_district_id",
+    "electoral_district_code": "electoral_district_code",
+    "membership_end_reason_id": "membership_end_reason_id",
+    "membership_end_reason_code": "membership_end_reason_code",
+    "description": "description",
+    "active_main_member_person_id": "active_main_member_person_id",
+    "active_main_member_person_id_num": "active_main_member_person_id_num",
+}
+
+PAYMENT_MODE_FIELDS = {
+    "internal_id": "id_",
+    "contract_id": "license_agreement.id_",
+    "active_from": ("active_from", parse_date),
+    "active_to": ("active_to", parse_date),
+    "mode_id": "mode_id",
+    "mode_name": "mode_name",
+    "type_id": "type_id",
+    "type_name": "type_name",
+    "sepa_id": "sepa_id",
+    "sepa_iban": "sepa_iban",
+    "sepa_mandate_id": "sepa_mandate_id",
+    "bank_account_id": "bank_account_id",
+    "bank_account_bic": "bank_account_bic",
+    "bank_account_iban": "bank_account_iban",
+}
+
+map_district = compile_mapper("district", DISTRICT_FIELDS)
+map_economic_unit = compile_mapper("economic_unit", ECONOMIC_UNIT_FIELDS)
+map_building = compile_mapper("building", BUILDING_FIELDS)
+map_use_unit = compile_mapper("use_unit", USE_UNIT_FIELDS)
+map_person = compile_mapper("person", PERSON_FIELDS)
+map_address = compile_mapper("address", ADDRESS_FIELDS)
+map_communication = compile_mapper("communication", COMMUNICATION_FIELDS)
+map_contract = compile_mapper("contract", CONTRACT_FIELDS)
+map_contractor = compile_mapper("contractor", CONTRACTOR_FIELDS)
+map_membership = compile_mapper("membership", MEMBERSHIP_FIELDS)
+map_payment_mode = compile_mapper("payment_mode", PAYMENT_MODE_FIELDS)
@@ -1,17 +1,209 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Date, Float, Boolean, Numeric
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, Date, DateTime, Float, Boolean, Numeric
 from sqlalchemy.orm import relationship, declarative_base
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy.ext.associationproxy import AssociationProxy
+from sqlalchemy import create_engine, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import sessionmaker, scoped_session
+from datetime import date, datetime
+import threading
+import time
+from wowicache.mappers import parse_date
+from wowicache.object_cache import ObjectCache
 
 Base = declarative_base()
 
 
+def read_only_url(connection_string):
+    # sqlite öffnet die Datei über eine URI mit mode=ro, Schreibversuche scheitern dann in sqlite selbst
+    url = make_url(connection_string)
+    if url.get_backend_name() != "sqlite":
+        return url
+    if url.database in (None, "", ":memory:"):
+        raise ValueError("An in-memory sqlite database cannot be opened read-only")
+    database = url.database if url.database.startswith("file:") else f"file:{url.database}"
+    return url.set(database=database).update_query_dict({"mode": "ro", "uri": "true"})
+
+
+def read_only_options(url) -> dict:
+    # PostgreSQL: jede Transaktion als READ ONLY, z.B. zusammen mit der Adresse eines Lesereplikats
+    if url.get_backend_name() == "postgresql":
+        return {"execution_options": {"postgresql_readonly": True}}
+    return {}
+
+
 class WowiCache:
-    def __init__(self, connection_string: str):
-        engine = create_engine(connection_string, echo=False, pool_pre_ping=True)
-        Session = sessionmaker(bind=engine)
-        self.session = Session()
+    def __init__(self, connection_string: str, query_cache_size: int = 500, read_only: bool = False,
+                 pool_size: int = None, max_overflow: int = None, object_cache_size: int = 0,
+                 object_cache_ttl: float = 300.0, generation_check_interval: float = 1.0,
+                 phone_country_code: str = "49", **engine_options):
+        url = make_url(connection_string)
+        if read_only:
+            url = read_only_url(url)
+            engine_options = {**read_only_options(url), **engine_options}
+        if pool_size is not None:
+            engine_options["pool_size"] = pool_size
+        if max_overflow is not None:
+            engine_options["max_overflow"] = max_overflow
+        # Kompilierte Lookup-Statements landen im Cache der Engine und werden pro Aufruf nur neu gebunden
+        engine = create_engine(url, echo=False, pool_pre_ping=True, query_cache_size=query_cache_size,
+                               **engine_options)
+        self.engine = engine
+        self.read_only = read_only
+        self.phone_country_code = phone_country_code
+        # Eine Engine mit Pool für alle Threads. session ist je Thread eine eigene Session,
+        # Session() liefert eine neue Session für with-Blöcke.
+        self.Session = sessionmaker(bind=engine)
+        self.session = scoped_session(self.Session)
+        # Optionaler Zwischenspeicher für Lookups. Der Generationszähler aus cache_to_db wird höchstens
+        # alle generation_check_interval Sekunden gelesen, ein neuer Stand leert den Zwischenspeicher.
+        self.object_cache = ObjectCache(object_cache_size, object_cache_ttl) if object_cache_size > 0 else None
+        self.generation_check_interval = generation_check_interval
+        self._generation_due = 0.0
+        self._generation_lock = threading.Lock()
+
+    def _check_generation(self):
+        # Nur ein Thread prüft, die anderen arbeiten in der Zwischenzeit mit dem bisherigen Stand weiter.
+        # Vor der ersten Prüfung warten alle, damit nichts unter einer unbekannten Generation gespeichert wird.
+        if time.monotonic() < self._generation_due:
+            return
+        if not self._generation_lock.acquire(blocking=self._generation_due == 0.0):
+            return
+        try:
+            now = time.monotonic()
+            if now < self._generation_due:
+                return
+            try:
+                generation = self.session.scalar(select(SyncGeneration.generation)
+                                                 .where(SyncGeneration.internal_id == 1))
+            except DBAPIError:
+                # Cache ohne Generationstabelle (noch nicht mit dieser Version aufgebaut)
+                self.session.rollback()
+                generation = None
+            self.object_cache.set_generation(generation)
+            self._generation_due = now + self.generation_check_interval
+        finally:
+            self._generation_lock.release()
+
+    def _cached(self, key: tuple, load):
+        if self.object_cache is None:
+            return load()
+        self._check_generation()
+
+        def load_detached():
+            # Zwischengespeicherte Objekte werden von mehreren Threads geteilt und gehören keiner Session,
+            # Beziehungen lassen sich darüber deshalb nicht nachladen
+            result = load()
+            for instance in result if isinstance(result, list) else [result]:
+                # Suchtreffer tragen das geladene Objekt in instance
+                instance = getattr(instance, "instance", instance)
+                if instance is not None and instance in self.session:
+                    self.session.expunge(instance)
+            return result
+
+        return self.object_cache.get_or_load(key, load_detached)
+
+    def cache_stats(self) -> dict | None:
+        return self.object_cache.stats() if self.object_cache is not None else None
+
+    def get(self, model, primary_key):
+        return self._cached(("get", model.__tablename__, primary_key), lambda: self.session.get(model, primary_key))
+
+    def load_preset(self, name: str, ids) -> list:
+        # Ganzer Objektgraph (z.B. Mieter einer Wirtschaftseinheit) mit fester Anzahl Abfragen
+        from wowicache.queries import LOAD_PRESETS
+        if name not in LOAD_PRESETS:
+            raise ValueError(f"Unknown load preset '{name}', available: {', '.join(LOAD_PRESETS)}")
+        ids = [ids] if isinstance(ids, int) else list(ids)
+        return self.session.scalars(LOAD_PRESETS[name], {"ids": ids}).unique().all()
+
+    def remove_session(self):
+        # Am Ende einer Anfrage im Worker-Thread aufrufen, gibt die Verbindung an den Pool zurück
+        self.session.remove()
+
+    def close(self):
+        self.session.remove()
+        self.engine.dispose()
+
+    def persons_by_phone(self, phone: str, match_suffix: bool = True) -> list:
+        # Erst die vollständige Nummer, dann über die Endung (Anrufer oder gespeicherte Nummer ohne Vorwahl)
+        from wowicache.queries import PERSONS_BY_PHONE, PERSONS_BY_PHONE_SUFFIX
+        from wowicache.phones import canonical_phone, phone_suffix_params
+        phone = canonical_phone(phone, self.phone_country_code)
+
+        def load():
+            persons = self.session.scalars(PERSONS_BY_PHONE, {"phone": phone}).all() if phone else []
+            suffix_params = phone_suffix_params(phone) if match_suffix and not persons else None
+            if suffix_params:
+                persons = self.session.scalars(PERSONS_BY_PHONE_SUFFIX, suffix_params).all()
+            return persons
+
+        return self._cached(("persons_by_phone", phone, match_suffix), load)
+
+    def persons_by_use_unit(self, use_unit_id: int) -> list:
+        from wowicache.queries import PERSONS_BY_USE_UNIT
+        return self._cached(("persons_by_use_unit", use_unit_id),
+                            lambda: self.session.scalars(PERSONS_BY_USE_UNIT, {"use_unit_id": use_unit_id}).all())
+
+    def current_tenants(self, building_id: int, on_date: date = None) -> list:
+        from wowicache.queries import CURRENT_TENANTS_OF_BUILDING
+        params = {"building_id": building_id, "on_date": on_date or date.today()}
+        return self._cached(("current_tenants", building_id, params["on_date"]),
+                            lambda: self.session.scalars(CURRENT_TENANTS_OF_BUILDING, params).all())
+
+    def persons_with_address_at_building(self, building_id: int) -> list:
+        # Personen mit einer Anschrift im Gebäude, verknüpft über die gemeinsame Adressdimension
+        from wowicache.queries import PERSONS_WITH_ADDRESS_AT_BUILDING
+        return self._cached(("persons_with_address_at_building", building_id),
+                            lambda: self.session.scalars(PERSONS_WITH_ADDRESS_AT_BUILDING,
+                                                         {"building_id": building_id}).all())
+
+    def use_units_by_street(self, street: str) -> list:
+        from wowicache.queries import USE_UNITS_BY_STREET
+        return self._cached(("use_units_by_street", street),
+                            lambda: self.session.scalars(USE_UNITS_BY_STREET, {"street": street}).all())
+
+    def contract_by_virtual_iban(self, virtual_iban: str):
+        from wowicache.queries import CONTRACT_BY_VIRTUAL_IBAN, normalize_virtual_iban
+        virtual_iban = normalize_virtual_iban(virtual_iban)
+        return self._cached(("contract_by_virtual_iban", virtual_iban),
+                            lambda: self.session.scalars(CONTRACT_BY_VIRTUAL_IBAN,
+                                                         {"virtual_iban": virtual_iban}).first())
+
+    def search(self, query: str, kinds: list = None, limit: int = 20, fuzzy: bool = True, load: bool = False) -> list:
+        # Suchindex aus cache_to_db (wowi_search), Arten: person, address, building, use_unit
+        from wowicache.search import search_index, load_instances
+
+        def run_search():
+            hits = search_index(self.session, query, kinds, limit, fuzzy)
+            if load:
+                load_instances(self.session, hits)
+            return hits
+
+        return self._cached(("search", query, tuple(kinds or ()), limit, fuzzy, load), run_search)
+
+    # Vorberechnete Belegung (wowi_current_occupancy, Stand des letzten Laufs), Abfrage ohne Joins
+    def occupancy_by_use_unit(self, use_unit_id: int) -> list:
+        from wowicache.queries import OCCUPANCY_BY_USE_UNIT
+        return self._cached(("occupancy_by_use_unit", use_unit_id),
+                            lambda: self.session.scalars(OCCUPANCY_BY_USE_UNIT, {"use_unit_id": use_unit_id}).all())
+
+    def occupancy_by_building(self, building_id: int) -> list:
+        from wowicache.queries import OCCUPANCY_BY_BUILDING
+        return self._cached(("occupancy_by_building", building_id),
+                            lambda: self.session.scalars(OCCUPANCY_BY_BUILDING, {"building_id": building_id}).all())
+
+    def occupancy_by_person(self, person_id: int) -> list:
+        from wowicache.queries import OCCUPANCY_BY_PERSON
+        return self._cached(("occupancy_by_person", person_id),
+                            lambda: self.session.scalars(OCCUPANCY_BY_PERSON, {"person_id": person_id}).all())
+
+    def occupancy_by_phone(self, phone: str) -> list:
+        from wowicache.queries import OCCUPANCY_BY_PHONE
+        from wowicache.phones import canonical_phone
+        phone = canonical_phone(phone, self.phone_country_code)
+        return self._cached(("occupancy_by_phone", phone),
+                            lambda: self.session.scalars(OCCUPANCY_BY_PHONE, {"phone": phone}).all())
 
 
 class District(Base):
@@ -30,6 +222,134 @@ class District(Base):
         return f"District {self.name} ({self.internal_id})"
 
 
+class Category:
+    # Nachschlagetabelle für wiederkehrende Bezeichnungen (Gebäudeart, Vertragsstatus, ...), Schlüssel ist die
+    # ID aus dem ERP. Die Modelle speichern nur die ID und lesen die Bezeichnung über eine Beziehung, die direkt
+    # nach dem Objekt mit einer zweiten Abfrage geladen wird (lazy="selectin", kein JOIN in jeder Abfrage),
+    # damit sie auch an gelösten Objekten lesbar bleibt.
+    internal_id = Column("internal_id", Integer, primary_key=True, autoincrement=False)
+    name = Column("name", String(100), nullable=True)
+
+    def __init__(self, internal_id, name):
+        self.internal_id = internal_id
+        self.name = name
+
+    def __repr__(self):
+        return f"{type(self).__name__} {self.name} ({self.internal_id})"
+
+
+def _category(category, internal_id, name):
+    # Eintrag der Nachschlagetabelle aus ID und Bezeichnung (Konstruktoraufruf wie vor den Nachschlagetabellen)
+    if internal_id is None or name is None:
+        return None
+    return category(internal_id, name)
+
+
+class BuildingType(Category, Base):
+    __tablename__ = "wowi_building_types"
+
+
+class UsageType(Category, Base):
+    __tablename__ = "wowi_usage_types"
+
+
+class FinancingType(Category, Base):
+    __tablename__ = "wowi_financing_types"
+
+
+class Floor(Category, Base):
+    __tablename__ = "wowi_floors"
+
+
+class CommunicationType(Category, Base):
+    __tablename__ = "wowi_communication_types"
+
+
+class ContractStatus(Category, Base):
+    __tablename__ = "wowi_contract_statuses"
+
+
+class ContractLife(Category, Base):
+    __tablename__ = "wowi_contract_lives"
+
+
+class ContractRestriction(Category, Base):
+    __tablename__ = "wowi_contract_restrictions"
+
+
+class ContractorType(Category, Base):
+    __tablename__ = "wowi_contractor_types"
+
+
+class ReadOnlyProxy(AssociationProxy):
+    # Anschriften und Bezeichnungen liegen in Zeilen, die sich viele Objekte teilen. Eine Zuweisung über den
+    # Proxy würde alle diese Objekte ändern (oder eine Zeile ohne Schlüssel anlegen), geändert wird nur per Sync.
+    def __set__(self, obj, values):
+        raise AttributeError(f"{type(obj).__name__}.{self.value_attr} is read-only, "
+                             f"it is read from {self.target_collection}")
+
+    def __delete__(self, obj):
+        raise AttributeError(f"{type(obj).__name__}.{self.value_attr} is read-only, "
+                             f"it is read from {self.target_collection}")
+
+
+def read_only_proxy(target_collection: str, attr: str) -> ReadOnlyProxy:
+    return ReadOnlyProxy(target_collection, attr)
+
+
+# Anschriftsfelder, die Gebäude, Nutzungseinheiten und Personenadressen in wowi_postal_addresses teilen
+POSTAL_FIELDS = ("postcode", "town", "street", "house_number", "house_number_addition", "country_id", "country",
+                 "street_complete", "house_number_complete")
+
+
+class PostalAddress(Base):
+    # Gemeinsame Adressdimension für Gebäude, Nutzungseinheiten und Personenadressen. Jede Schreibweise einer
+    # Anschrift wird einmal gespeichert, der Schlüssel ist ein Hash über alle Felder. match_key wird aus
+    # Postleitzahl, Straße und Hausnummer (normalisiert) berechnet und verbindet abweichende Schreibweisen.
+    __tablename__ = "wowi_postal_addresses"
+    internal_id = Column("internal_id", BigInteger, primary_key=True, autoincrement=False)
+    match_key = Column("match_key", BigInteger, nullable=True)
+    postcode = Column("postcode", String(30), nullable=True)
+    town = Column("town", String(50), nullable=True)
+    street = Column("street", String(100), nullable=True)
+    house_number = Column("house_number", String(30), nullable=True)
+    house_number_addition = Column("house_number_addition", String(30), nullable=True)
+    country_id = Column("country_id", Integer, nullable=True)
+    country = Column("country", String(50), nullable=True)
+    street_complete = Column("street_complete", String(100), nullable=True)
+    house_number_complete = Column("house_number_complete", String(60), nullable=True)
+
+    buildings = relationship('Building', back_populates='postal_address')
+    use_units = relationship('UseUnit', back_populates='postal_address')
+    addresses = relationship('Address', back_populates='postal_address')
+
+    def __init__(self, internal_id, match_key, postcode, town, street, house_number, house_number_addition,
+                 country_id, country, street_complete, house_number_complete):
+        self.internal_id = internal_id
+        self.match_key = match_key
+        self.postcode = postcode
+        self.town = town
+        self.street = street
+        self.house_number = house_number
+        self.house_number_addition = house_number_addition
+        self.country_id = country_id
+        self.country = country
+        self.street_complete = street_complete
+        self.house_number_complete = house_number_complete
+
+    def __repr__(self):
+        return f"Postal Address {self.street_complete}, {self.postcode} {self.town}"
+
+
+def _postal_address(*values):
+    # Anschrift aus den Einzelfeldern (Konstruktoraufruf wie vor der Adressdimension). Teilen sich mehrere
+    # neue Objekte eine Anschrift, mit session.merge() speichern, damit die Zeile nur einmal angelegt wird.
+    from wowicache.postal import map_postal_address
+    row = dict(zip(POSTAL_FIELDS, values))
+    postal_row = map_postal_address(row)
+    return PostalAddress(**postal_row) if postal_row is not None else None
+
+
 class EconomicUnit(Base):
     __tablename__ = "wowi_economic_units"
     internal_id = Column("internal_id", Integer, primary_key=True)
@@ -70,51 +390,54 @@ class Building(Base):
     entry_date = Column("entry_date", Date)
     economic_unit_id = Column(Integer, ForeignKey("wowi_economic_units.internal_id"))
     economic_unit = relationship('EconomicUnit', back_populates='buildings')
-    postcode = Column("postcode", String(30))
-    town = Column("town", String(50))
-    street = Column("street", String(70))
-    house_number = Column("house_number", String(30))
-    house_number_addition = Column("house_number_addition", String(30), nullable=True)
-    country_id = Column("country_id", Integer)
-    country = Column("country", String(50))
-    street_complete = Column("street_complete", String(80))
-    house_number_complete = Column("house_number_complete", String(50))
-
     construction_year = Column("construction_year", Integer, nullable=True)
     move_in_date = Column("move_in_date", Date, nullable=True)
 
-    building_type_id = Column("building_type_id", Integer)
-    building_type_name = Column("building_type_name", String(60))
+    building_type_id = Column(Integer, ForeignKey("wowi_building_types.internal_id"), nullable=True)
+    building_type = relationship('BuildingType', lazy="selectin")
+    building_type_name = read_only_proxy('building_type', 'name')
 
     district_id = Column(Integer, ForeignKey("wowi_districts.internal_id"), nullable=True)
     district = relationship('District', back_populates='buildings')
 
     use_units = relationship('UseUnit', back_populates='building')
 
+    # Anschrift aus der Adressdimension, mit dem Gebäude zusammen geladen (eine Abfrage je Ergebnis)
+    postal_address_id = Column(BigInteger, ForeignKey("wowi_postal_addresses.internal_id"), nullable=True)
+    postal_address = relationship('PostalAddress', back_populates='buildings', lazy="selectin")
+    postcode = read_only_proxy('postal_address', 'postcode')
+    town = read_only_proxy('postal_address', 'town')
+    street = read_only_proxy('postal_address', 'street')
+    house_number = read_only_proxy('postal_address', 'house_number')
+    house_number_addition = read_only_proxy('postal_address', 'house_number_addition')
+    country_id = read_only_proxy('postal_address', 'country_id')
+    country = read_only_proxy('postal_address', 'country')
+    street_complete = read_only_proxy('postal_address', 'street_complete')
+    house_number_complete = read_only_proxy('postal_address', 'house_number_complete')
+
     def __init__(self, internal_id, id_num, company_id, building_land_type, entry_date, economic_unit_id,
-                 postcode, town, street, house_number, house_number_addition, country_id, country,
-                 street_complete, house_number_complete, construction_year, move_in_date,
-                 building_type_id, building_type_name, district_id):
+                 postcode=None, town=None, street=None, house_number=None, house_number_addition=None,
+                 country_id=None, country=None, street_complete=None, house_number_complete=None,
+                 construction_year=None, move_in_date=None, building_type_id=None, building_type_name=None,
+                 district_id=None, postal_address_id=None):
         self.internal_id = internal_id
         self.id_num = id_num
         self.company_id = company_id
         self.building_land_type = building_land_type
         self.entry_date = entry_date
         self.economic_unit_id = economic_unit_id
-        self.postcode = postcode
-        self.town = town
-        self.street = street
-        self.house_number = house_number
-        self.house_number_addition = house_number_addition
-        self.country_id = country_id
-        self.country = country
-        self.street_complete = street_complete
-        self.house_number_complete = house_number_complete
         self.construction_year = construction_year
         self.move_in_date = move_in_date
         self.building_type_id = building_type_id
-        self.building_type_name = building_type_name
         self.district_id = district_id
+        building_type = _category(BuildingType, building_type_id, building_type_name)
+        if building_type is not None:
+            self.building_type = building_type
+        self.postal_address_id = postal_address_id
+        postal_address = _postal_address(postcode, town, street, house_number, house_number_addition, country_id,
+                                         country, street_complete, house_number_complete)
+        if postal_address is not None:
+            self.postal_address = postal_address
 
     def __repr__(self):
         return f"Building {self.id_num}, {self.street_complete}, {self.postcode} {self.town}"
@@ -129,19 +452,12 @@ class UseUnit(Base):
     building = relationship('Building', back_populates='use_units')
     economic_unit_id = Column(Integer, ForeignKey("wowi_economic_units.internal_id"))
     economic_unit = relationship('EconomicUnit', back_populates='use_units')
-    postcode = Column("postcode", String(30))
-    town = Column("town", String(50))
-    street = Column("street", String(100))
-    house_number = Column("house_number", String(30))
-    house_number_addition = Column("house_number_addition", String(30), nullable=True)
-    country_id = Column("country_id", Integer)
-    country = Column("country", String(50))
-    street_complete = Column("street_complete", String(100))
-    house_number_complete = Column("house_number_complete", String(30))
-    financing_type_id = Column("financing_type_id", Integer)
-    financing_type = Column("financing_type", String(50))
-    use_unit_usage_type_id = Column("use_unit_usage_type_id", Integer)
-    use_unit_usage_type = Column("use_unit_usage_type", String(50))
+    financing_type_id = Column(Integer, ForeignKey("wowi_financing_types.internal_id"), nullable=True)
+    financing = relationship('FinancingType', lazy="selectin")
+    financing_type = read_only_proxy('financing', 'name')
+    use_unit_usage_type_id = Column(Integer, ForeignKey("wowi_usage_types.internal_id"), nullable=True)
+    usage_type = relationship('UsageType', lazy="selectin")
+    use_unit_usage_type = read_only_proxy('usage_type', 'name')
     usable_space = Column("usable_space", Float, nullable=True)
     living_space = Column("living_space", Float, nullable=True)
     heating_space = Column("heating_space", Float, nullable=True)
@@ -155,37 +471,39 @@ class UseUnit(Base):
     entry_date = Column("entry_date", Date, nullable=True)
     position_id = Column("position_id", Integer, nullable=True)
     position = Column("position", String(100), nullable=True)
-    floor_id = Column("floor_id", Integer, nullable=True)
-    floor_name = Column("floor_name", String(100), nullable=True)
+    floor_id = Column(Integer, ForeignKey("wowi_floors.internal_id"), nullable=True)
+    floor = relationship('Floor', lazy="selectin")
+    floor_name = read_only_proxy('floor', 'name')
     floor_level = Column("floor_level", Float, nullable=True)
     contracts = relationship('Contract', back_populates='use_unit')
     contractors = relationship('Contractor', back_populates='use_unit')
-
-    def __init__(self, internal_id, id_num, company_id, building_id, economic_unit_id,
-                 postcode, town, street, house_number, house_number_addition, country_id, country,
-                 street_complete, house_number_complete, financing_type_id, financing_type,
-                 use_unit_usage_type_id, use_unit_usage_type, usable_space, living_space, heating_space,
-                 number_of_rooms, number_of_half_rooms, description_of_position, management_start,
-                 management_end, move_in_date, exit_date, entry_date, position_id, position, floor_id,
-                 floor_name, floor_level):
+    postal_address_id = Column(BigInteger, ForeignKey("wowi_postal_addresses.internal_id"), nullable=True)
+    postal_address = relationship('PostalAddress', back_populates='use_units', lazy="selectin")
+    postcode = read_only_proxy('postal_address', 'postcode')
+    town = read_only_proxy('postal_address', 'town')
+    street = read_only_proxy('postal_address', 'street')
+    house_number = read_only_proxy('postal_address', 'house_number')
+    house_number_addition = read_only_proxy('postal_address', 'house_number_addition')
+    country_id = read_only_proxy('postal_address', 'country_id')
+    country = read_only_proxy('postal_address', 'country')
+    street_complete = read_only_proxy('postal_address', 'street_complete')
+    house_number_complete = read_only_proxy('postal_address', 'house_number_complete')
+
+    def __init__(self, internal_id, id_num, company_id, building_id, economic_unit_id, postcode=None, town=None,
+                 street=None, house_number=None, house_number_addition=None, country_id=None, country=None,
+                 street_complete=None, house_number_complete=None, financing_type_id=None, financing_type=None,
+                 use_unit_usage_type_id=None, use_unit_usage_type=None, usable_space=None, living_space=None,
+                 heating_space=None, number_of_rooms=None, number_of_half_rooms=None, description_of_position=None,
+                 management_start=None, management_end=None, move_in_date=None, exit_date=None, entry_date=None,
+                 position_id=None, position=None, floor_id=None, floor_name=None, floor_level=None,
+                 postal_address_id=None):
         self.internal_id = internal_id
         self.id_num = id_num
         self.company_id = company_id
         self.building_id = building_id
         self.economic_unit_id = economic_unit_id
-        self.postcode = postcode
-        self.town = town
-        self.street = street
-        self.house_number = house_number
-        self.house_number_addition = house_number_addition
-        self.country_id = country_id
-        self.country = country
-        self.street_complete = street_complete
-        self.house_number_complete = house_number_complete
         self.financing_type_id = financing_type_id
-        self.financing_type = financing_type
         self.use_unit_usage_type_id = use_unit_usage_type_id
-        self.use_unit_usage_type = use_unit_usage_type
         self.usable_space = usable_space
         self.living_space = living_space
         self.heating_space = heating_space
@@ -200,8 +518,17 @@ class UseUnit(Base):
         self.position_id = position_id
         self.position = position
         self.floor_id = floor_id
-        self.floor_name = floor_name
         self.floor_level = floor_level
+        self.postal_address_id = postal_address_id
+        for relation, category in (("financing", _category(FinancingType, financing_type_id, financing_type)),
+                                   ("usage_type", _category(UsageType, use_unit_usage_type_id, use_unit_usage_type)),
+                                   ("floor", _category(Floor, floor_id, floor_name))):
+            if category is not None:
+                setattr(self, relation, category)
+        postal_address = _postal_address(postcode, town, street, house_number, house_number_addition, country_id,
+                                         country, street_complete, house_number_complete)
+        if postal_address is not None:
+            self.postal_address = postal_address
 
     def __repr__(self):
         return f"Use Unit {self.id_num}"
@@ -210,15 +537,6 @@ class UseUnit(Base):
 class Address(Base):
     __tablename__ = "wowi_addresses"
     internal_id = Column("internal_id", Integer, primary_key=True)
-    postcode = Column("postcode", String(30))
-    town = Column("town", String(50))
-    street = Column("street", String(100), nullable=True)
-    house_number = Column("house_number", String(30), nullable=True)
-    house_number_addition = Column("house_number_addition", String(30), nullable=True)
-    country_id = Column("country_id", Integer, nullable=True)
-    country = Column("country", String(50), nullable=True)
-    street_complete = Column("street_complete", String(100))
-    house_number_complete = Column("house_number_complete", String(60))
     address_type_id = Column("address_type_id", Integer, nullable=True)
     address_type = Column("address_type", String(50), nullable=True)
     valid_from = Column("valid_from", Date)
@@ -227,25 +545,33 @@ class Address(Base):
     communications = relationship('Communication', back_populates='related_address')
     person_id = Column(Integer, ForeignKey("wowi_persons.internal_id"))
     person = relationship('Person', back_populates='addresses')
-
-    def __init__(self, internal_id, postcode, town, street, house_number, house_number_addition, country_id, country,
-                 street_complete, house_number_complete, address_type_id, address_type, valid_from, valid_to,
-                 person_id):
+    postal_address_id = Column(BigInteger, ForeignKey("wowi_postal_addresses.internal_id"), nullable=True)
+    postal_address = relationship('PostalAddress', back_populates='addresses', lazy="selectin")
+    postcode = read_only_proxy('postal_address', 'postcode')
+    town = read_only_proxy('postal_address', 'town')
+    street = read_only_proxy('postal_address', 'street')
+    house_number = read_only_proxy('postal_address', 'house_number')
+    house_number_addition = read_only_proxy('postal_address', 'house_number_addition')
+    country_id = read_only_proxy('postal_address', 'country_id')
+    country = read_only_proxy('postal_address', 'country')
+    street_complete = read_only_proxy('postal_address', 'street_complete')
+    house_number_complete = read_only_proxy('postal_address', 'house_number_complete')
+
+    def __init__(self, internal_id, postcode=None, town=None, street=None, house_number=None,
+                 house_number_addition=None, country_id=None, country=None, street_complete=None,
+                 house_number_complete=None, address_type_id=None, address_type=None, valid_from=None,
+                 valid_to=None, person_id=None, postal_address_id=None):
         self.internal_id = internal_id
-        self.postcode = postcode
-        self.town = town
-        self.street = street
-        self.house_number = house_number
-        self.house_number_addition = house_number_addition
-        self.country_id = country_id
-        self.country = country
-        self.street_complete = street_complete
-        self.house_number_complete = house_number_complete
         self.address_type_id = address_type_id
         self.address_type = address_type
         self.valid_from = valid_from
         self.valid_to = valid_to
         self.person_id = person_id
+        self.postal_address_id = postal_address_id
+        postal_address = _postal_address(postcode, town, street, house_number, house_number_addition, country_id,
+                                         country, street_complete, house_number_complete)
+        if postal_address is not None:
+            self.postal_address = postal_address
 
     def __repr__(self):
         return f"Address {self.street_complete}, {self.postcode} {self.town}"
@@ -258,20 +584,28 @@ class Communication(Base):
     related_address = relationship('Address', back_populates='communications')
     content = Column("content", String(100))
     explanation = Column("explanation", String(100), nullable=True)
-    communication_type_id = Column("communication_type_id", Integer)
-    communication_type = Column("communication_type", String(50))
+    communication_type_id = Column(Integer, ForeignKey("wowi_communication_types.internal_id"), nullable=True)
+    type = relationship('CommunicationType', lazy="selectin")
+    communication_type = read_only_proxy('type', 'name')
     person_id = Column(Integer, ForeignKey("wowi_persons.internal_id"))
     person = relationship('Person', back_populates='communications')
+    # Telefonnummern: E.164 (bzw. nur Ziffern ohne Vorwahl) und die Ziffern rückwärts für die Suche nach der Endung
+    phone_number = Column("phone_number", String(30), nullable=True)
+    phone_reversed = Column("phone_reversed", String(30), nullable=True)
 
     def __init__(self, internal_id, related_address_id, content, explanation, communication_type_id,
-                 communication_type, person_id):
+                 communication_type=None, person_id=None, phone_number=None, phone_reversed=None):
         self.internal_id = internal_id
         self.related_address_id = related_address_id
         self.content = content
         self.explanation = explanation
         self.communication_type_id = communication_type_id
-        self.communication_type = communication_type
         self.person_id = person_id
+        self.phone_number = phone_number
+        self.phone_reversed = phone_reversed
+        communication_type = _category(CommunicationType, communication_type_id, communication_type)
+        if communication_type is not None:
+            self.type = communication_type
 
     def __repr__(self):
         return f"Communication Id {self.internal_id}: {self.content}"
@@ -305,7 +639,7 @@ class Person(Base):
 
     def __init__(self, internal_id, id_num, name, short_name, valid_from, valid_to, long_name_1, long_name_2,
                  vat_id, commercial_register_number, commercial_register_town, first_name, last_name, birth_date,
-                 gender_id, gender_name, death_date, title):
+                 gender_id, gender_name, death_date, title, is_natural_person=None):
         self.internal_id = internal_id
         self.id_num = id_num
         self.name = name
@@ -325,7 +659,9 @@ class Person(Base):
         self.death_date = death_date
         self.title = title
 
-        if self.first_name is None and self.last_name is None:
+        if is_natural_person is not None:
+            self.is_natural_person = is_natural_person
+        elif self.first_name is None and self.last_name is None:
             self.is_natural_person = False
         else:
             self.is_natural_person = True
@@ -340,13 +676,16 @@ class Contract(Base):
     id_num = Column("id_num", String(30))
     use_unit_id = Column(Integer, ForeignKey("wowi_use_units.internal_id"))
     use_unit = relationship('UseUnit', back_populates='contracts')
-    restriction_id = Column("restriction_id", Integer)
-    restriction_name = Column("restriction_name", String(40))
+    restriction_id = Column(Integer, ForeignKey("wowi_contract_restrictions.internal_id"), nullable=True)
+    restriction = relationship('ContractRestriction', lazy="selectin")
+    restriction_name = read_only_proxy('restriction', 'name')
     is_vacancy = Column("is_vacancy", Boolean)
-    status_id = Column("status_id", Integer)
-    status_name = Column("status_name", String(30))
-    life_id = Column("life_id", Integer)
-    life_name = Column("life_name", String(50))
+    status_id = Column(Integer, ForeignKey("wowi_contract_statuses.internal_id"), nullable=True)
+    status = relationship('ContractStatus', lazy="selectin")
+    status_name = read_only_proxy('status', 'name')
+    life_id = Column(Integer, ForeignKey("wowi_contract_lives.internal_id"), nullable=True)
+    life = relationship('ContractLife', lazy="selectin")
+    life_name = read_only_proxy('life', 'name')
     contract_start = Column("contract_start", Date)
     contract_end = Column("contract_end", Date, nullable=True)
     virtual_iban = Column("virtual_iban", String(50), nullable=True)
@@ -354,23 +693,25 @@ class Contract(Base):
     contractors = relationship('Contractor', back_populates='contract')
     payment_modes = relationship('PaymentMode', back_populates='contract')
 
-    def __init__(self, internal_id, id_num, use_unit_id, restriction_id, restriction_name, is_vacancy,
-                 status_id, status_name, life_id, life_name, contract_start, contract_end, virtual_iban=None,
-                 virtual_bic=None):
+    def __init__(self, internal_id, id_num, use_unit_id, restriction_id, restriction_name=None, is_vacancy=None,
+                 status_id=None, status_name=None, life_id=None, life_name=None, contract_start=None,
+                 contract_end=None, virtual_iban=None, virtual_bic=None):
         self.internal_id = internal_id
         self.id_num = id_num
         self.use_unit_id = use_unit_id
         self.restriction_id = restriction_id
-        self.restriction_name = restriction_name
         self.is_vacancy = is_vacancy
         self.status_id = status_id
-        self.status_name = status_name
         self.life_id = life_id
-        self.life_name = life_name
         self.contract_start = contract_start
         self.contract_end = contract_end
         self.virtual_bic = virtual_bic
         self.virtual_iban = virtual_iban
+        for relation, category in (("restriction", _category(ContractRestriction, restriction_id, restriction_name)),
+                                   ("status", _category(ContractStatus, status_id, status_name)),
+                                   ("life", _category(ContractLife, life_id, life_name))):
+            if category is not None:
+                setattr(self, relation, category)
 
     def __repr__(self):
         return f"Contract IdNum {self.id_num} Id {self.internal_id}"
@@ -380,27 +721,30 @@ class Contractor(Base):
     __tablename__ = "wowi_contractors"
     internal_id = Column("internal_id", Integer, primary_key=True)
     contract_id = Column(Integer, ForeignKey("wowi_contracts.internal_id"), primary_key=True)
-    type_id = Column("type_id", Integer, primary_key=True)
+    type_id = Column(Integer, ForeignKey("wowi_contractor_types.internal_id"), primary_key=True)
     person_id = Column(Integer, ForeignKey("wowi_persons.internal_id"))
     contract = relationship('Contract', back_populates='contractors')
     use_unit_id = Column(Integer, ForeignKey("wowi_use_units.internal_id"))
     use_unit = relationship('UseUnit', back_populates='contractors')
     person = relationship('Person', back_populates='contractors')
 
-    type_name = Column("type_name", String(50))
+    type = relationship('ContractorType', lazy="selectin")
+    type_name = read_only_proxy('type', 'name')
     valid_from = Column("valid_from", Date)
     valid_to = Column("valid_to", Date, nullable=True)
 
-    def __init__(self, internal_id, contract_id, use_unit_id, person_id, type_id,
-                 type_name, valid_from, valid_to):
+    def __init__(self, internal_id, contract_id, use_unit_id, person_id, type_id, type_name=None, valid_from=None,
+                 valid_to=None):
         self.internal_id = internal_id
         self.contract_id = contract_id
         self.use_unit_id = use_unit_id
         self.person_id = person_id
         self.type_id = type_id
-        self.type_name = type_name
         self.valid_from = valid_from
         self.valid_to = valid_to
+        contractor_type = _category(ContractorType, type_id, type_name)
+        if contractor_type is not None:
+            self.type = contractor_type
 
     def __repr__(self):
         return f"Contractor {self.internal_id}"
@@ -431,22 +775,11 @@ class Membership(Base):
     active_main_member_person_id_num = Column("active_main_member_person_id_num", String(30), nullable=True)
 
     def __init__(self, **kwargs):
-        self.internal_id = kwargs.get("id")
+        self.internal_id = kwargs.get("internal_id", kwargs.get("id"))
         self.id_num = kwargs.get("id_num")
-        t_creation_date = kwargs.get("creation_date")
-        if isinstance(t_creation_date, str):
-            t_creation_date = datetime.strptime(t_creation_date, "%Y-%m-%d")
-        self.creation_date = t_creation_date
-
-        t_valid_from = kwargs.get("valid_from")
-        if isinstance(t_valid_from, str):
-            t_valid_from = datetime.strptime(t_valid_from, "%Y-%m-%d")
-        self.valid_from = t_valid_from
-
-        t_valid_to = kwargs.get("valid_to")
-        if isinstance(t_valid_to, str):
-            t_valid_to = datetime.strptime(t_valid_to, "%Y-%m-%d")
-        self.valid_to = t_valid_to
+        self.creation_date = parse_date(kwargs.get("creation_date"))
+        self.valid_from = parse_date(kwargs.get("valid_from"))
+        self.valid_to = parse_date(kwargs.get("valid_to"))
 
         self.is_payout_block_account = kwargs.get("is_payout_block_account")
         self.cooperative_account_clearing_lock = kwargs.get("cooperative_account_clearing_lock")
@@ -491,15 +824,8 @@ class PaymentMode(Base):
         self.internal_id = kwargs.get("internal_id")
         self.contract_id = kwargs.get("contract_id")
 
-        t_active_from = kwargs.get("active_from")
-        if isinstance(t_active_from, str):
-            t_active_from = datetime.strptime(t_active_from, "%Y-%m-%d")
-        self.active_from = t_active_from
-
-        t_active_to = kwargs.get("active_to")
-        if isinstance(t_active_to, str):
-            t_active_to = datetime.strptime(t_active_to, "%Y-%m-%d")
-        self.active_to = t_active_to
+        self.active_from = parse_date(kwargs.get("active_from"))
+        self.active_to = parse_date(kwargs.get("active_to"))
 
         self.mode_id = kwargs.get("mode_id")
         self.mode_name = kwargs.get("mode_name")
@@ -515,3 +841,82 @@ class PaymentMode(Base):
         self.bank_account_iban = kwargs.get("bank_account_iban")
 
 
+class SyncFingerprint(Base):
+    __tablename__ = "wowi_sync_fingerprints"
+    table_name = Column("table_name", String(50), primary_key=True)
+    row_key = Column("row_key", String(100), primary_key=True)
+    fingerprint = Column("fingerprint", String(32))
+
+    def __init__(self, table_name, row_key, fingerprint):
+        self.table_name = table_name
+        self.row_key = row_key
+        self.fingerprint = fingerprint
+
+    def __repr__(self):
+        return f"SyncFingerprint {self.table_name} {self.row_key}"
+
+
+class SyncCheckpoint(Base):
+    __tablename__ = "wowi_sync_checkpoints"
+    entity = Column("entity", String(50), primary_key=True)
+    status = Column("status", String(10))
+    record_offset = Column("record_offset", Integer)
+    rows = Column("rows", Integer)
+    updated = Column("updated", DateTime)
+
+    def __init__(self, entity, status, record_offset, rows, updated=None):
+        self.entity = entity
+        self.status = status
+        self.record_offset = record_offset
+        self.rows = rows
+        self.updated = updated or datetime.now()
+
+    def __repr__(self):
+        return f"SyncCheckpoint {self.entity} {self.status} {self.record_offset}"
+
+
+class SyncGeneration(Base):
+    __tablename__ = "wowi_sync_generation"
+    internal_id = Column("internal_id", Integer, primary_key=True)
+    generation = Column("generation", Integer)
+    finished = Column("finished", DateTime)
+
+    def __init__(self, internal_id, generation, finished=None):
+        self.internal_id = internal_id
+        self.generation = generation
+        self.finished = finished or datetime.now()
+
+    def __repr__(self):
+        return f"SyncGeneration {self.generation} ({self.finished})"
+
+
+class CurrentOccupancy(Base):
+    # Wird am Ende jedes Laufs aus Nutzungseinheiten, Verträgen, Vertragsnehmern, Personen und Kommunikation
+    # neu aufgebaut: eine Zeile je aktuell gültigem Vertragsnehmer, Stand on_date
+    __tablename__ = "wowi_current_occupancy"
+    internal_id = Column("internal_id", Integer, primary_key=True)
+    on_date = Column("on_date", Date)
+    use_unit_id = Column("use_unit_id", Integer)
+    use_unit_id_num = Column("use_unit_id_num", String(50))
+    building_id = Column("building_id", Integer)
+    economic_unit_id = Column("economic_unit_id", Integer)
+    street_complete = Column("street_complete", String(100))
+    house_number_complete = Column("house_number_complete", String(60))
+    postcode = Column("postcode", String(30))
+    town = Column("town", String(50))
+    contract_id = Column("contract_id", Integer)
+    contract_id_num = Column("contract_id_num", String(30))
+    contract_start = Column("contract_start", Date)
+    contract_end = Column("contract_end", Date, nullable=True)
+    contractor_type_id = Column("contractor_type_id", Integer)
+    contractor_type_name = Column("contractor_type_name", String(50))
+    person_id = Column("person_id", Integer)
+    person_id_num = Column("person_id_num", String(50))
+    name = Column("name", String(60))
+    first_name = Column("first_name", String(60), nullable=True)
+    last_name = Column("last_name", String(60), nullable=True)
+    phone = Column("phone", String(100), nullable=True)
+    email = Column("email", String(100), nullable=True)
+
+    def __repr__(self):
+        return f"Occupancy {self.use_unit_id_num}: {self.name} ({self.contract_id_num})"
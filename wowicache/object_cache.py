@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ObjectCache:
+    # LRU mit Ablaufzeit für Lookup-Ergebnisse, gemeinsam für alle Threads einer WowiCache-Instanz.
+    # Beim Wechsel der Sync-Generation in der Datenbank wird der ganze Inhalt verworfen.
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, load):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            generation = self.generation
+
+        # Laden außerhalb der Sperre, damit parallele Treffer nicht auf die Datenbank warten
+        value = load()
+        with self._lock:
+            # Ergebnis einer inzwischen abgelösten Generation nicht mehr aufnehmen
+            if generation == self.generation:
+                self._entries[key] = (time.monotonic() + self.ttl if self.ttl else None, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def set_generation(self, generation):
+        with self._lock:
+            if generation == self.generation:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.generation = generation
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 3) if requests else None,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "invalidations": self.invalidations,
+                "generation": self.generation,
+            }
@@ -0,0 +1,81 @@
+import logging
+from datetime import date
+from sqlalchemy import delete, func, literal, or_, select
+from wowicache.models import UseUnit, Contract, Contractor, ContractorType, Person, Communication, CurrentOccupancy
+from wowicache.models import PostalAddress
+from wowicache.queries import PHONE_TYPES, EMAIL_TYPES
+
+logger = logging.getLogger('root')
+
+
+def _first_communication(communications, persons, types: tuple, column: str = "content"):
+    # Erster Eintrag der Person, Telefon vor Mobil
+    return (
+        select(communications.c[column])
+        .where(communications.c.person_id == persons.c.internal_id,
+               communications.c.communication_type_id.in_(types))
+        .order_by(communications.c.communication_type_id, communications.c.internal_id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def build_current_occupancy(engine, tables: dict = None, on_date: date = None) -> int:
+    # Denormalisierte Belegung für Lookups ohne Join, gleiche Bedingungen wie CURRENT_TENANTS_OF_BUILDING.
+    # Beim Staging-Neuaufbau wird die Staging-Tabelle befüllt und mit den anderen getauscht.
+    def table_of(model):
+        return (tables or {}).get(model.__table__, model.__table__)
+
+    on_date = on_date or date.today()
+    use_units = table_of(UseUnit)
+    contracts = table_of(Contract)
+    contractors = table_of(Contractor)
+    persons = table_of(Person)
+    communications = table_of(Communication)
+    contractor_types = table_of(ContractorType)
+    postal_addresses = table_of(PostalAddress)
+    occupancy = table_of(CurrentOccupancy)
+
+    columns = {
+        "on_date": literal(on_date, CurrentOccupancy.on_date.type),
+        "use_unit_id": use_units.c.internal_id,
+        "use_unit_id_num": use_units.c.id_num,
+        "building_id": use_units.c.building_id,
+        "economic_unit_id": use_units.c.economic_unit_id,
+        "street_complete": postal_addresses.c.street_complete,
+        "house_number_complete": postal_addresses.c.house_number_complete,
+        "postcode": postal_addresses.c.postcode,
+        "town": postal_addresses.c.town,
+        "contract_id": contracts.c.internal_id,
+        "contract_id_num": contracts.c.id_num,
+        "contract_start": contracts.c.contract_start,
+        "contract_end": contracts.c.contract_end,
+        "contractor_type_id": contractors.c.type_id,
+        "contractor_type_name": contractor_types.c.name,
+        "person_id": persons.c.internal_id,
+        "person_id_num": persons.c.id_num,
+        "name": persons.c.name,
+        "first_name": persons.c.first_name,
+        "last_name": persons.c.last_name,
+        "phone": _first_communication(communications, persons, PHONE_TYPES, "phone_number"),
+        "email": _first_communication(communications, persons, EMAIL_TYPES),
+    }
+    source = (
+        select(*columns.values())
+        .select_from(contractors)
+        .join(persons, persons.c.internal_id == contractors.c.person_id)
+        .join(use_units, use_units.c.internal_id == contractors.c.use_unit_id)
+        .outerjoin(postal_addresses, postal_addresses.c.internal_id == use_units.c.postal_address_id)
+        .join(contracts, contracts.c.internal_id == contractors.c.contract_id)
+        .outerjoin(contractor_types, contractor_types.c.internal_id == contractors.c.type_id)
+        .where(contracts.c.is_vacancy.is_not(True),
+               or_(contracts.c.contract_end.is_(None), contracts.c.contract_end >= on_date),
+               or_(contractors.c.valid_from.is_(None), contractors.c.valid_from <= on_date),
+               or_(contractors.c.valid_to.is_(None), contractors.c.valid_to >= on_date))
+    )
+    with engine.begin() as conn:
+        conn.execute(delete(occupancy))
+        conn.execute(occupancy.insert().from_select(list(columns), source))
+        rows = conn.execute(select(func.count()).select_from(occupancy)).scalar()
+    logger.info(f"Current occupancy: {rows} active contractors as of {on_date}.")
+    return rows
@@ -0,0 +1,47 @@
+import re
+
+# Ländervorwahl für Nummern in nationaler Schreibweise (0301234567 -> +49301234567)
+PHONE_COUNTRY_CODE = "49"
+# Kürzeste Endung, nach der bei Nummern ohne Vorwahl gesucht wird
+MIN_PHONE_SUFFIX = 6
+
+_TRUNK_PREFIX = re.compile(r"\(0\)")
+_NON_DIGITS = re.compile(r"\D")
+
+
+def canonical_phone(phone: str | None, country_code: str = PHONE_COUNTRY_CODE) -> str | None:
+    # E.164 (+49301234567), wenn sich die Vorwahl ergibt, sonst nur die Ziffern (z.B. Nummer ohne Vorwahl)
+    if phone is None:
+        return None
+    # +49 (0)30 ...: die eingeklammerte Null gehört nicht zur internationalen Nummer
+    phone = _TRUNK_PREFIX.sub("", phone.strip())
+    digits = _NON_DIGITS.sub("", phone)
+    if not digits:
+        return None
+    if phone.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    if digits.startswith("0"):
+        return f"+{country_code}{digits[1:]}"
+    return digits
+
+
+def reversed_digits(phone: str | None) -> str | None:
+    # Umgedreht wird aus der Suche nach der Endung einer Nummer eine Präfixsuche, die ein Index bedienen kann
+    if phone is None:
+        return None
+    return _NON_DIGITS.sub("", phone)[::-1] or None
+
+
+def phone_suffix_params(phone: str | None) -> dict | None:
+    reversed_phone = reversed_digits(phone)
+    if reversed_phone is None or len(reversed_phone) < MIN_PHONE_SUFFIX:
+        return None
+    return {
+        # Gespeicherte Nummer endet auf die gesuchte (Suche ohne Vorwahl): Bereich über den Index
+        "reversed": reversed_phone,
+        "reversed_end": reversed_phone + ":",
+        # Gesuchte Nummer endet auf die gespeicherte (gespeichert ohne Vorwahl): alle Endungen als IN-Liste
+        "reversed_prefixes": [reversed_phone[:length] for length in range(MIN_PHONE_SUFFIX, len(reversed_phone) + 1)],
+    }
@@ -0,0 +1,34 @@
+import hashlib
+from wowicache.models import POSTAL_FIELDS
+from wowicache.search import normalize_search_text
+
+
+def _key(text: str) -> int:
+    # 63 Bit, damit der Schlüssel in BIGINT-Spalten passt
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+def postal_address_key(postcode: str | None, street: str | None, house_number: str | None) -> int:
+    # Stabiler Schlüssel aus der normalisierten Anschrift, gleich für abweichende Schreibweisen (match_key)
+    parts = [normalize_search_text(str(value or "")).replace(" ", "") for value in (postcode, street, house_number)]
+    return _key("|".join(parts))
+
+
+def map_postal_address(row: dict) -> dict | None:
+    # Nimmt die Anschriftsfelder aus einer Gebäude-, Nutzungseinheits- oder Adresszeile und liefert die Zeile der
+    # Adressdimension, in der Zeile bleibt nur postal_address_id
+    values = {field: row.pop(field, None) for field in POSTAL_FIELDS}
+    if all(value is None for value in values.values()):
+        row["postal_address_id"] = None
+        return None
+    # Gleiche Werte ergeben denselben Schlüssel, jede Schreibweise wird also genau einmal gespeichert
+    key = _key(repr(tuple(values.values())))
+    row["postal_address_id"] = key
+
+    street = values["street"] or values["street_complete"]
+    house_number = values["house_number_complete"] or \
+        " ".join(str(value) for value in (values["house_number"], values["house_number_addition"]) if value)
+    match_key = postal_address_key(values["postcode"], street, house_number) \
+        if street or values["postcode"] else None
+    return {"internal_id": key, "match_key": match_key, **values}
@@ -0,0 +1,171 @@
+from datetime import date
+from sqlalchemy import select, bindparam, or_, and_
+from sqlalchemy.orm import selectinload, joinedload, aliased
+from wowicache.models import EconomicUnit, Building, UseUnit, Communication, Person, Contract, Contractor
+from wowicache.models import CurrentOccupancy, Address, PostalAddress
+
+
+# Kommunikationstypen mit Telefonnummern, die normalisiert gespeichert werden
+PHONE_TYPES = (1, 3)
+EMAIL_TYPES = (4,)
+
+
+def normalize_phone(phone: str | None) -> str | None:
+    # Schreibweise der Spalte content wie bisher (ohne Leerzeichen, 0049/+49 -> 0). Die Suche nach Nummern
+    # läuft über phone_number und phone_reversed (wowicache.phones), content bleibt nur für Bestandsabfragen gleich.
+    if phone is None:
+        return None
+    phone = phone.replace(' ', '').strip()
+    phone = phone.replace('0049', '0')
+    return phone.replace('+49', '0')
+
+
+def normalize_virtual_iban(virtual_iban: str) -> str:
+    return virtual_iban.replace(" ", "").upper()
+
+
+# Die Abfragen werden einmal gebaut und nur über Bind-Parameter variiert,
+# dadurch greift der Statement-Cache von SQLAlchemy bei jeder Wiederholung.
+
+PERSONS_BY_PHONE = (
+    select(Person)
+    .join(Communication, Communication.person_id == Person.internal_id)
+    .where(Communication.phone_number == bindparam("phone"))
+    .distinct()
+)
+
+PERSONS_BY_PHONE_SUFFIX = (
+    select(Person)
+    .join(Communication, Communication.person_id == Person.internal_id)
+    .where(or_(Communication.phone_reversed.in_(bindparam("reversed_prefixes", expanding=True)),
+               and_(Communication.phone_reversed >= bindparam("reversed"),
+                    Communication.phone_reversed < bindparam("reversed_end"))))
+    .distinct()
+)
+
+PERSONS_BY_USE_UNIT = (
+    select(Person)
+    .join(Contractor, Contractor.person_id == Person.internal_id)
+    .where(Contractor.use_unit_id == bindparam("use_unit_id"))
+    .distinct()
+)
+
+CURRENT_TENANTS_OF_BUILDING = (
+    select(Person)
+    .join(Contractor, Contractor.person_id == Person.internal_id)
+    .join(UseUnit, UseUnit.internal_id == Contractor.use_unit_id)
+    .join(Contract, Contract.internal_id == Contractor.contract_id)
+    .where(UseUnit.building_id == bindparam("building_id"),
+           Contract.is_vacancy.is_not(True),
+           or_(Contract.contract_end.is_(None), Contract.contract_end >= bindparam("on_date")),
+           or_(Contractor.valid_from.is_(None), Contractor.valid_from <= bindparam("on_date")),
+           or_(Contractor.valid_to.is_(None), Contractor.valid_to >= bindparam("on_date")))
+    .distinct()
+)
+
+# Anschrift des Gebäudes und der Person können unterschiedlich geschrieben sein, verbunden über match_key
+_building_address = aliased(PostalAddress)
+_person_address = aliased(PostalAddress)
+
+PERSONS_WITH_ADDRESS_AT_BUILDING = (
+    select(Person)
+    .join(Address, Address.person_id == Person.internal_id)
+    .join(_person_address, _person_address.internal_id == Address.postal_address_id)
+    .join(_building_address, _building_address.match_key == _person_address.match_key)
+    .join(Building, Building.postal_address_id == _building_address.internal_id)
+    .where(Building.internal_id == bindparam("building_id"))
+    .distinct()
+)
+
+USE_UNITS_BY_STREET = (
+    select(UseUnit)
+    .join(PostalAddress, PostalAddress.internal_id == UseUnit.postal_address_id)
+    .where(PostalAddress.street == bindparam("street"))
+)
+
+BUILDINGS_BY_STREET = (
+    select(Building)
+    .join(PostalAddress, PostalAddress.internal_id == Building.postal_address_id)
+    .where(PostalAddress.street == bindparam("street"))
+)
+
+CONTRACT_BY_VIRTUAL_IBAN = (
+    select(Contract)
+    .where(Contract.virtual_iban == bindparam("virtual_iban"))
+)
+
+OCCUPANCY_BY_USE_UNIT = (
+    select(CurrentOccupancy)
+    .where(CurrentOccupancy.use_unit_id == bindparam("use_unit_id"))
+)
+
+OCCUPANCY_BY_BUILDING = (
+    select(CurrentOccupancy)
+    .where(CurrentOccupancy.building_id == bindparam("building_id"))
+)
+
+OCCUPANCY_BY_PERSON = (
+    select(CurrentOccupancy)
+    .where(CurrentOccupancy.person_id == bindparam("person_id"))
+)
+
+OCCUPANCY_BY_PHONE = (
+    select(CurrentOccupancy)
+    .where(CurrentOccupancy.phone == bindparam("phone"))
+)
+
+# Name -> (Abfrage, Beispielparameter für EXPLAIN)
+LOOKUP_QUERIES = {
+    "persons_by_phone": (PERSONS_BY_PHONE, {"phone": "+49301234567"}),
+    "persons_by_phone_suffix": (PERSONS_BY_PHONE_SUFFIX, {"reversed": "7654321", "reversed_end": "7654321:",
+                                                          "reversed_prefixes": ["765432", "7654321"]}),
+    "persons_by_use_unit": (PERSONS_BY_USE_UNIT, {"use_unit_id": 1}),
+    "current_tenants_of_building": (CURRENT_TENANTS_OF_BUILDING, {"building_id": 1, "on_date": date.today()}),
+    "persons_with_address_at_building": (PERSONS_WITH_ADDRESS_AT_BUILDING, {"building_id": 1}),
+    "use_units_by_street": (USE_UNITS_BY_STREET, {"street": "Teststr."}),
+    "buildings_by_street": (BUILDINGS_BY_STREET, {"street": "Teststr."}),
+    "contract_by_virtual_iban": (CONTRACT_BY_VIRTUAL_IBAN, {"virtual_iban": "DE00000000000000000000"}),
+    "occupancy_by_use_unit": (OCCUPANCY_BY_USE_UNIT, {"use_unit_id": 1}),
+    "occupancy_by_building": (OCCUPANCY_BY_BUILDING, {"building_id": 1}),
+    "occupancy_by_person": (OCCUPANCY_BY_PERSON, {"person_id": 1}),
+    "occupancy_by_phone": (OCCUPANCY_BY_PHONE, {"phone": "+49301234567"}),
+}
+
+
+# Ladevorgaben für ganze Objektgraphen: Name -> (Ausgangsmodell, Beziehungspfade). Statt jede Beziehung
+# einzeln beim Zugriff nachzuladen (eine Abfrage je Objekt und Ebene), wird jede Ebene eines Pfades mit
+# einer Abfrage für alle Objekte geladen (selectinload), n:1-Beziehungen per JOIN in derselben Abfrage.
+LOAD_PRESET_PATHS = {
+    "tenant_roster": (EconomicUnit, [
+        (EconomicUnit.use_units, UseUnit.contracts, Contract.contractors, Contractor.person, Person.communications),
+    ]),
+    "person_portfolio": (Person, [
+        (Person.contractors, Contractor.contract, Contract.use_unit, UseUnit.building),
+        (Person.addresses,),
+        (Person.communications,),
+    ]),
+    "building_occupancy": (Building, [
+        (Building.use_units, UseUnit.contracts, Contract.contractors, Contractor.person),
+    ]),
+}
+
+
+def preset_options(paths: list) -> list:
+    options = []
+    for path in paths:
+        option = None
+        for attribute in path:
+            strategy = selectinload if attribute.property.uselist else joinedload
+            option = strategy(attribute) if option is None else getattr(option, strategy.__name__)(attribute)
+        options.append(option)
+    return options
+
+
+LOAD_PRESETS = {
+    name: (
+        select(model)
+        .where(model.internal_id.in_(bindparam("ids", expanding=True)))
+        .options(*preset_options(paths))
+    )
+    for name, (model, paths) in LOAD_PRESET_PATHS.items()
+}
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from wowicache.stream import PeakMemory, peak_rss_mb
+
+logger = logging.getLogger('root')
+
+_END = object()
+
+
+class Stopwatch:
+    def __init__(self):
+        self.seconds = 0.0
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds += time.perf_counter() - self._start
+
+
+class SectionStats:
+    def __init__(self, name: str, label: str):
+        self.name = name
+        self.label = label
+        self.fetch = Stopwatch()
+        self.transform = Stopwatch()
+        self.write = Stopwatch()
+        self.rows = 0
+        self.pages = 0
+        # Anzahl der bereits verarbeiteten API-Datensätze (Checkpoint)
+        self.offset = 0
+        self.rejected = {}
+        # Delta-Modus: inserted/updated/unchanged/deleted der Haupttabelle, sonst None
+        self.changes = None
+        self.memory = PeakMemory()
+
+    def pages_from(self, pages):
+        # Gemessen wird nur das Warten auf die nächste Seite, bei fetch_workers > 0 also die Zeit,
+        # in der das Laden nicht mit dem Schreiben überlappt
+        iterator = iter(pages)
+        while True:
+            with self.fetch:
+                page = next(iterator, _END)
+            if page is _END:
+                return
+            self.pages += 1
+            yield page
+            self.memory.sample()
+
+    def done(self, changes: dict = None):
+        self.changes = changes
+        if changes is None:
+            logger.info(f"Added {self.rows} {self.label}. {self.memory}")
+            return
+        # rows zählt im Delta-Modus auch unveränderte Zeilen, gelöscht wird erst am Ende des Laufs
+        logger.info(f"Synced {self.rows} {self.label}: inserted {changes['inserted']}, updated {changes['updated']}, "
+                    f"unchanged {changes['unchanged']}. {self.memory}")
+
+    def as_dict(self) -> dict:
+        total = self.fetch.seconds + self.transform.seconds + self.write.seconds
+        return {
+            "section": self.name,
+            "rows": self.rows,
+            "pages": self.pages,
+            "fetch_seconds": round(self.fetch.seconds, 3),
+            "transform_seconds": round(self.transform.seconds, 3),
+            "write_seconds": round(self.write.seconds, 3),
+            "rows_per_second": round(self.rows / total, 1) if total > 0 else None,
+            "rejected": dict(self.rejected),
+            "changes": dict(self.changes) if self.changes is not None else None,
+            "peak_rss_mb": round(self.memory.peak_mb, 1) if self.memory.peak_mb is not None else None,
+        }
+
+
+class SyncReport:
+    def __init__(self, settings: dict = None):
+        self.settings = settings or {}
+        self.started = datetime.now()
+        self.finished = None
+        self.sections = []
+        self.phases = {}
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def section(self, name: str, label: str = None) -> SectionStats:
+        section = SectionStats(name, label or name.replace("_", " "))
+        self.sections.append(section)
+        return section
+
+    def phase(self, name: str) -> Stopwatch:
+        # Arbeitsschritte außerhalb der Entitäten (Leeren, Indizes, Tausch der Staging-Tabellen, ...)
+        return self.phases.setdefault(name, Stopwatch())
+
+    def finish(self):
+        self.finished = datetime.now()
+        self.duration = time.perf_counter() - self._start
+
+    def as_dict(self) -> dict:
+        peak = peak_rss_mb()
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "finished": self.finished.isoformat(timespec="seconds") if self.finished else None,
+            "duration_seconds": round(self.duration, 3) if self.duration is not None else None,
+            "rows": sum(section.rows for section in self.sections),
+            "peak_rss_mb": round(peak, 1) if peak is not None else None,
+            "settings": self.settings,
+            "sections": [section.as_dict() for section in self.sections],
+            "phases": {name: round(stopwatch.seconds, 3) for name, stopwatch in self.phases.items()},
+        }
+
+    def log(self):
+        # Die extra-Felder landen bei Graylog als eigene GELF-Felder und lassen sich dort auswerten
+        for section in self.sections:
+            values = section.as_dict()
+            changes = values.pop("changes")
+            extra = {f"sync_{key}": value for key, value in values.items() if key != "rejected"}
+            delta = ""
+            if changes is not None:
+                delta = (f", inserted {changes['inserted']}, updated {changes['updated']}, "
+                         f"unchanged {changes['unchanged']}, deleted {changes['deleted']}")
+                extra.update({f"sync_{key}": value for key, value in changes.items()})
+            logger.info(f"Sync stats {section.name}: {values['rows']} rows{delta}, {values['pages']} pages, "
+                        f"fetch {values['fetch_seconds']:.2f}s, transform {values['transform_seconds']:.2f}s, "
+                        f"write {values['write_seconds']:.2f}s", extra=extra)
+        for name, stopwatch in self.phases.items():
+            logger.info(f"Sync phase {name}: {stopwatch.seconds:.2f}s",
+                        extra={"sync_phase": name, "sync_phase_seconds": round(stopwatch.seconds, 3)})
+        rows = sum(section.rows for section in self.sections)
+        logger.info(f"Sync run: {rows} rows in {self.duration or 0:.2f}s",
+                    extra={"sync_run_rows": rows, "sync_run_seconds": round(self.duration or 0, 3)})
+
+    def write_json(self, report_path: str) -> str:
+        # Ein Verzeichnis bekommt je Lauf eine eigene Datei, damit sich die Läufe über die Zeit auswerten lassen
+        if os.path.isdir(report_path) or report_path.endswith(os.sep):
+            os.makedirs(report_path, exist_ok=True)
+            file_name = f"wowicache_run_{self.started.strftime('%Y_%m_%d_%H%M%S')}.json"
+            report_path = os.path.join(report_path, file_name)
+        with open(report_path, "w", encoding="utf-8") as report_file:
+            json.dump(self.as_dict(), report_file, indent=2)
+        logger.info(f"Run report written to {report_path}")
+        return report_path
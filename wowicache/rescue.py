@@ -2,10 +2,24 @@ import logging
 import os
 import shutil
 import glob
+import gzip
+import sqlite3
+import zlib
 from datetime import datetime
+from wowicache.chunks import ChunkStore, MANIFEST_SUFFIX
 
 logger = logging.getLogger('root')
 
+DEFAULT_BACKUP_KEEP = 7
+DEFAULT_COMPRESSION_LEVEL = 6
+BACKUP_SUFFIX = ".gz"
+# Unfertige Dateien, werden erst nach vollständigem Schreiben umbenannt
+PARTIAL_SUFFIX = ".part"
+# Seiten je Schritt der Online-Sicherung, dazwischen kommen andere Verbindungen zum Zug
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.005
+COPY_BUFFER_SIZE = 1024 * 1024
+
 
 def backup_possible(connection_string: str, backup_path: str) -> bool:
     if not connection_string or not backup_path:
@@ -40,50 +54,109 @@ def get_abs_db_file_name(connection_string: str) -> str | None:
     return abs_db_file
 
 
-def restore_last_backup(backup_path: str, connection_string: str) -> bool:
-    if not backup_possible(connection_string, backup_path):
-        return False
-
-    abs_db_file = get_abs_db_file_name(connection_string)
-    if not abs_db_file:
-        logger.error(f"Could not get absolute db file path from '{connection_string}'")
-        return False
-
+def list_backups(backup_path: str) -> list:
+    # Neueste zuerst, unfertige Dateien abgebrochener Sicherungen zählen nicht
     files = glob.glob(os.path.join(backup_path, "*"))
-    files_with_time = [(file, os.path.getmtime(file)) for file in files if os.path.isfile(file)]
+    files_with_time = [(tfile, os.path.getmtime(tfile)) for tfile in files
+                       if os.path.isfile(tfile) and not tfile.endswith(PARTIAL_SUFFIX)]
+    return [tfile for tfile, _ in sorted(files_with_time, key=lambda x: x[1], reverse=True)]
 
-    if files_with_time:
-        newest_file = max(files_with_time, key=lambda x: x[1])[0]
 
+def integrity_ok(db_file: str) -> bool:
+    try:
+        conn = sqlite3.connect(db_file)
         try:
-            shutil.copy(newest_file, abs_db_file)
-            logger.warning(f"Backup '{os.path.basename(newest_file)}' has been copied to '{abs_db_file}'.")
-        except Exception as e:
-            logger.error(f"Error copying the file: {e}")
-            return False
-    else:
-        print("No files found in the source folder.")
+            result = conn.execute("PRAGMA integrity_check").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        logger.error(f"Integrity check of '{db_file}' failed: {e}")
+        return False
+    if result is None or result[0] != "ok":
+        logger.error(f"Integrity check of '{db_file}' failed: {result[0] if result else 'no result'}")
         return False
     return True
 
 
-def cleanup_backups(backup_path: str):
-    files = glob.glob(os.path.join(backup_path, "*"))
+def unpack_backup(backup_file: str, target_file: str):
+    if backup_file.endswith(MANIFEST_SUFFIX):
+        ChunkStore(os.path.dirname(backup_file)).restore(backup_file, target_file)
+        return
+    # Ältere, unkomprimierte Sicherungen werden unverändert übernommen
+    opener = gzip.open if backup_file.endswith(BACKUP_SUFFIX) else open
+    with opener(backup_file, "rb") as source, open(target_file, "wb") as target:
+        shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+
+
+def copy_database(source_file: str, target_file: str):
+    # Online-Sicherung von sqlite: konsistenter Stand, auch wenn parallel gelesen oder im WAL geschrieben wird
+    source = sqlite3.connect(source_file)
+    target = sqlite3.connect(target_file)
+    try:
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+    finally:
+        target.close()
+        source.close()
+
+
+def restore_last_backup(backup_path: str, connection_string: str) -> bool:
+    if not backup_possible(connection_string, backup_path):
+        return False
 
-    files_with_time = [(tfile, os.path.getmtime(tfile)) for tfile in files if os.path.isfile(tfile)]
-    sorted_files = sorted(files_with_time, key=lambda x: x[1],
-                          reverse=True)
+    abs_db_file = get_abs_db_file_name(connection_string)
+    if not abs_db_file:
+        logger.error(f"Could not get absolute db file path from '{connection_string}'")
+        return False
 
-    files_to_delete = sorted_files[7:]
+    backups = list_backups(backup_path)
+    if not backups:
+        logger.error(f"No backups found in '{backup_path}'.")
+        return False
 
-    for tfile, _ in files_to_delete:
+    restore_file = f"{abs_db_file}.restore"
+    for backup_file in backups:
+        try:
+            unpack_backup(backup_file, restore_file)
+            if not integrity_ok(restore_file):
+                logger.error(f"Backup '{os.path.basename(backup_file)}' is damaged, trying the next older one.")
+                continue
+            # Zurückspielen ebenfalls über die Online-Sicherung statt Dateikopie, damit eine vorhandene
+            # WAL-Datei und offene Verbindungen die wiederhergestellte Datenbank nicht beschädigen
+            try:
+                copy_database(restore_file, abs_db_file)
+            except sqlite3.DatabaseError as e:
+                # Zieldatei selbst unlesbar: Datei ersetzen, alte WAL-/SHM-Dateien gehören nicht zur Sicherung
+                logger.warning(f"Could not restore into '{abs_db_file}' ({e}), replacing the file.")
+                for suffix in ("-wal", "-shm"):
+                    if os.path.exists(abs_db_file + suffix):
+                        os.remove(abs_db_file + suffix)
+                os.replace(restore_file, abs_db_file)
+            logger.warning(f"Backup '{os.path.basename(backup_file)}' has been restored to '{abs_db_file}'.")
+            return True
+        except (OSError, EOFError, ValueError, zlib.error, sqlite3.Error) as e:
+            logger.error(f"Error restoring backup '{os.path.basename(backup_file)}': {e}")
+        finally:
+            if os.path.exists(restore_file):
+                os.remove(restore_file)
+    logger.error("No usable backup found.")
+    return False
+
+
+def cleanup_backups(backup_path: str, keep: int = DEFAULT_BACKUP_KEEP):
+    files_to_delete = list_backups(backup_path)[keep:]
+
+    for tfile in files_to_delete:
         try:
             os.remove(tfile)
         except Exception as e:
             print(f"Error while deletion of {tfile}: {e}")
 
+    manifests = [tfile for tfile in list_backups(backup_path) if tfile.endswith(MANIFEST_SUFFIX)]
+    ChunkStore(backup_path).collect_garbage(manifests)
 
-def backup_database(connection_string: str, backup_path: str) -> bool:
+
+def backup_database(connection_string: str, backup_path: str, keep: int = DEFAULT_BACKUP_KEEP,
+                    compression_level: int = DEFAULT_COMPRESSION_LEVEL, incremental: bool = False) -> bool:
     if not backup_possible(connection_string, backup_path):
         return False
 
@@ -92,17 +165,35 @@ def backup_database(connection_string: str, backup_path: str) -> bool:
         logger.error(f"Could not get absolute db file path from '{connection_string}'")
         return False
 
-    # Aktuelle DB-Datei in Backup-Path kopieren
+    if not os.path.isfile(abs_db_file):
+        logger.error(f"Backup of cache database failed: File {abs_db_file} not found!")
+        return False
+
+    # Konsistente Kopie der DB-Datei erstellen und komprimiert in den Backup-Path schreiben
     stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file_name = f"{stamp}_{os.path.basename(abs_db_file)}"
+    backup_file_name = f"{stamp}_{os.path.basename(abs_db_file)}{MANIFEST_SUFFIX if incremental else BACKUP_SUFFIX}"
     abs_backup_path = os.path.join(backup_path, backup_file_name)
+    snapshot_file = os.path.join(backup_path, f"{stamp}_{os.path.basename(abs_db_file)}.snapshot{PARTIAL_SUFFIX}")
+    partial_backup_path = abs_backup_path + PARTIAL_SUFFIX
 
     try:
         if not os.path.exists(backup_path):
             os.makedirs(backup_path)
 
-        shutil.copy(abs_db_file, abs_backup_path)
-        logger.info(f"Backup of cache database successful! Destination file: {abs_backup_path}")
+        copy_database(abs_db_file, snapshot_file)
+        snapshot_mb = os.path.getsize(snapshot_file) / 1024 / 1024
+        if incremental:
+            # Nur geänderte Blöcke werden geschrieben, die Generation selbst ist ein Manifest
+            result = ChunkStore(backup_path, compression_level).write_backup(snapshot_file, abs_backup_path)
+            written_mb = result["written_bytes"] / 1024 / 1024
+        else:
+            with open(snapshot_file, "rb") as source, \
+                    gzip.open(partial_backup_path, "wb", compresslevel=compression_level) as target:
+                shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+            os.replace(partial_backup_path, abs_backup_path)
+            written_mb = os.path.getsize(abs_backup_path) / 1024 / 1024
+        logger.info(f"Backup of cache database successful! Destination file: {abs_backup_path} "
+                    f"({snapshot_mb:.1f} MB database, {written_mb:.1f} MB written)")
 
     except FileNotFoundError:
         logger.error(f"Backup of cache database failed: File {abs_db_file} not found!")
@@ -113,7 +204,11 @@ def backup_database(connection_string: str, backup_path: str) -> bool:
     except Exception as e:
         logger.error(f"Backup of cache database failed. Unexpected error: {str(e)}")
         return False
+    finally:
+        for tfile in (snapshot_file, partial_backup_path):
+            if os.path.exists(tfile):
+                os.remove(tfile)
 
-    cleanup_backups(backup_path)
+    cleanup_backups(backup_path, keep)
 
     return True
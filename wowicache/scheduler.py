@@ -0,0 +1,86 @@
+import logging
+import queue
+import threading
+from wowicache.stream import fetch_pages
+
+logger = logging.getLogger('root')
+
+# Maximale Anzahl vorausgeladener Seiten je Endpunkt im Streaming-Modus
+PREFETCH_PAGES = 20
+
+_DONE = object()
+
+
+class _FetchError:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class FetchScheduler:
+    def __init__(self, client_factory, streaming: bool, workers: int = 0):
+        self.client_factory = client_factory
+        self.streaming = streaming
+        self.workers = workers
+        self._client = None
+        self._tasks = {}
+        self._queues = {}
+        self._task_queue = None
+        if workers > 0:
+            # Worker nehmen die Aufträge in Einreichungsreihenfolge (= Ladereihenfolge) ab,
+            # dadurch kann ein voller Puffer eines späteren Endpunkts den Verbraucher nie blockieren
+            self._task_queue = queue.Queue()
+            for number in range(workers):
+                worker = threading.Thread(target=self._work, name=f"wowicache-fetch-{number}", daemon=True)
+                worker.start()
+
+    def submit(self, name: str, method_name: str, paged: bool = True, start_offset: int = 0, **kwargs):
+        self._tasks[name] = (method_name, paged, start_offset, kwargs)
+        if self._task_queue is not None:
+            self._queues[name] = queue.Queue(maxsize=PREFETCH_PAGES if self.streaming else 0)
+            self._task_queue.put(name)
+
+    def _iter_task(self, client, name: str):
+        method_name, paged, start_offset, kwargs = self._tasks[name]
+        fetch = getattr(client, method_name)
+        if not paged:
+            yield fetch(**kwargs)[start_offset:]
+            return
+        yield from fetch_pages(fetch, self.streaming, start_offset=start_offset, **kwargs)
+
+    def _work(self):
+        client = None
+        while True:
+            name = self._task_queue.get()
+            if name is None:
+                return
+            pages = self._queues[name]
+            try:
+                if client is None:
+                    client = self.client_factory()
+                logger.debug(f"Fetching {name} in {threading.current_thread().name}")
+                for page in self._iter_task(client, name):
+                    pages.put(page)
+                pages.put(_DONE)
+            except BaseException as e:
+                pages.put(_FetchError(e))
+
+    def pages(self, name: str):
+        if self._task_queue is None:
+            if self._client is None:
+                self._client = self.client_factory()
+            yield from self._iter_task(self._client, name)
+            return
+
+        pages = self._queues[name]
+        while True:
+            page = pages.get()
+            if page is _DONE:
+                return
+            if isinstance(page, _FetchError):
+                raise page.exc
+            yield page
+
+    def close(self):
+        if self._task_queue is not None:
+            for _ in range(self.workers):
+                self._task_queue.put(None)
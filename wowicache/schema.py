@@ -0,0 +1,98 @@
+import logging
+from sqlalchemy import column, inspect, select, table, update
+from wowicache.models import Base, Building, UseUnit, Address, PostalAddress, POSTAL_FIELDS
+from wowicache.categories import CATEGORY_COLUMNS
+
+logger = logging.getLogger('root')
+
+# Spalten älterer Versionen, deren Werte jetzt in anderen Tabellen liegen:
+# Modell -> {alte Spalte: (Fremdschlüssel, Modell der Quelle, Spalte der Quelle)}.
+# Solange sie in einer bestehenden Datenbank noch vorhanden sind, werden sie nach jedem Lauf nachgefüllt,
+# damit Abfragen direkt auf den Tabellen (SQL, BI-Werkzeuge) weiter Werte sehen. Ein Lauf mit
+# staging_rebuild="True" legt die Tabellen neu an und entfernt sie.
+LEGACY_COLUMNS = {
+    Building: {field: ("postal_address_id", PostalAddress, field) for field in POSTAL_FIELDS},
+    UseUnit: {field: ("postal_address_id", PostalAddress, field) for field in POSTAL_FIELDS},
+    Address: {field: ("postal_address_id", PostalAddress, field) for field in POSTAL_FIELDS},
+}
+# Bezeichnungen aus den Nachschlagetabellen (building_type_name, status_name, ...)
+for _model, _columns in CATEGORY_COLUMNS.items():
+    LEGACY_COLUMNS.setdefault(_model, {}).update(
+        {name_column: (id_column, category, "name") for id_column, name_column, category in _columns})
+
+
+def add_missing_columns(engine, metadata=Base.metadata) -> int:
+    # create_all legt nur fehlende Tabellen an. Neue, optionale Spalten werden in bestehenden
+    # Cache-Datenbanken nachgetragen, die Werte füllt der nächste Lauf.
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    added = 0
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {preparer.format_table(table)} "
+                                     f"ADD COLUMN {preparer.quote(column.name)} {column_type}")
+                logger.info(f"Added column {table.name}.{column.name}")
+                added += 1
+    return added
+
+
+def find_obsolete_columns(engine, metadata=Base.metadata) -> dict:
+    # Spalten aus älteren Versionen (z.B. Bezeichnungen und Anschriften, die jetzt in Nachschlagetabellen liegen)
+    # bleiben in bestehenden Datenbanken leer stehen, erst ein Neuaufbau der Tabellen entfernt sie
+    inspector = inspect(engine)
+    legacy_columns = {model.__tablename__: sources for model, sources in LEGACY_COLUMNS.items()}
+    obsolete = {}
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        columns = [column["name"] for column in inspector.get_columns(table.name)
+                   if column["name"] not in table.columns]
+        if not columns:
+            continue
+        obsolete[table.name] = columns
+        legacy = legacy_columns.get(table.name, {})
+        filled = [name for name in columns if name in legacy]
+        if filled:
+            logger.warning(f"Deprecated columns in {table.name}: {', '.join(filled)}. They are filled from the "
+                           f"lookup tables after each run for compatibility, run a full sync with "
+                           f"staging_rebuild=\"True\" to drop them.")
+        unfilled = [name for name in columns if name not in legacy]
+        if unfilled:
+            logger.warning(f"Obsolete columns in {table.name}: {', '.join(unfilled)}. They are no longer filled, "
+                           f"run a full sync with staging_rebuild=\"True\" to drop them.")
+    return obsolete
+
+
+def fill_legacy_columns(engine) -> int:
+    # Alte Spalten aus der Quelltabelle nachfüllen, eine UPDATE-Anweisung je Tabelle mit korrelierten Unterabfragen.
+    # Über table()/column(), die Spalten gibt es im Modell nicht mehr.
+    inspector = inspect(engine)
+    filled = 0
+    with engine.begin() as conn:
+        for model, sources in LEGACY_COLUMNS.items():
+            table_name = model.__tablename__
+            if not inspector.has_table(table_name):
+                continue
+            existing = {item["name"] for item in inspector.get_columns(table_name)}
+            targets = {name: source for name, source in sources.items()
+                       if name in existing and name not in model.__table__.c}
+            if not targets:
+                continue
+            foreign_keys = {foreign_key for foreign_key, _, _ in targets.values()}
+            target = table(table_name, *[column(name) for name in list(targets) + sorted(foreign_keys)])
+            values = {}
+            for name, (foreign_key, source_model, source_column) in targets.items():
+                source = source_model.__table__
+                values[name] = select(source.c[source_column]) \
+                    .where(source.c.internal_id == target.c[foreign_key]).scalar_subquery()
+            conn.execute(update(target).values(values))
+            logger.info(f"Filled deprecated columns in {table_name}: {', '.join(targets)}")
+            filled += len(targets)
+    return filled
@@ -0,0 +1,215 @@
+import logging
+import re
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.exc import DBAPIError, OperationalError
+from wowicache.models import Person, Address, Building, UseUnit, PostalAddress
+
+logger = logging.getLogger('root')
+
+SEARCH_TABLE = "wowi_search"
+BUILD_TABLE = "wowi_search_build"
+BATCH_SIZE = 5000
+# Kürzere Wörter lassen sich über Trigramme nicht finden
+MIN_WORD_LENGTH = 3
+
+# Art -> (Modell, durchsuchte Spalten, Spalten der Anzeige). street_complete enthält bereits die Hausnummer.
+# Anschriftsfelder kommen aus wowi_postal_addresses.
+SEARCH_SOURCES = {
+    "person": (Person, ("name", "short_name", "first_name", "last_name", "long_name_1", "long_name_2", "id_num"),
+               ("name",)),
+    "address": (Address, ("street_complete", "house_number_complete", "postcode", "town"),
+                ("street_complete", "postcode", "town")),
+    "building": (Building, ("id_num", "street_complete", "house_number_complete", "postcode", "town"),
+                 ("id_num", "street_complete", "postcode", "town")),
+    "use_unit": (UseUnit, ("id_num", "street_complete", "house_number_complete", "postcode", "town"),
+                 ("id_num", "street_complete", "postcode", "town")),
+}
+
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue"})
+_STREET = re.compile(r"(strasse|str\.)")
+_SEPARATORS = re.compile(r"[^\w]+")
+
+
+def normalize_search_text(value: str) -> str:
+    # Gleiche Schreibweise für Index und Suchbegriff: Müller/Mueller, Straße/Strasse/Str.
+    value = value.casefold().translate(_UMLAUTS)
+    value = _STREET.sub("str ", value)
+    return _SEPARATORS.sub(" ", value).strip()
+
+
+class SearchHit:
+    def __init__(self, kind, record_id, label, score):
+        self.kind = kind
+        self.record_id = record_id
+        self.label = label
+        self.score = score
+        self.instance = None
+
+    def __repr__(self):
+        return f"SearchHit {self.kind} {self.record_id} {self.label} ({self.score:.2f})"
+
+
+def _create_build_table(conn):
+    dialect = conn.dialect.name
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {BUILD_TABLE}")
+    if dialect == "sqlite":
+        # FTS5 mit Trigramm-Tokenizer: Teilwortsuche über den Index, ab sqlite 3.34
+        conn.exec_driver_sql(f"CREATE VIRTUAL TABLE {BUILD_TABLE} USING fts5(kind UNINDEXED, record_id UNINDEXED, "
+                             f"label UNINDEXED, content, tokenize='trigram')")
+        return
+    conn.exec_driver_sql(f"CREATE TABLE {BUILD_TABLE} (kind VARCHAR(20), record_id INTEGER, label VARCHAR(400), "
+                         f"content TEXT)")
+
+
+def _swap_search_table(engine):
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        # Wie beim Tausch der Staging-Tabellen explizit in einer Transaktion, Leser sehen alt oder neu
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+                cursor.execute(f"ALTER TABLE {BUILD_TABLE} RENAME TO {SEARCH_TABLE}")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        finally:
+            raw.close()
+        return
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        conn.exec_driver_sql(f"ALTER TABLE {BUILD_TABLE} RENAME TO {SEARCH_TABLE}")
+        if dialect == "postgresql":
+            conn.exec_driver_sql(f"ALTER INDEX ix_{BUILD_TABLE}_content RENAME TO ix_{SEARCH_TABLE}_content")
+
+
+def build_search_index(engine) -> int:
+    # Neuaufbau in einer zweiten Tabelle, die am Ende die alte ersetzt
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        # Ohne Rechte zum Anlegen (ProgrammingError) oder ohne installiertes contrib-Paket (OperationalError)
+        # läuft der Sync weiter, nur der Suchindex fehlt
+        try:
+            with engine.begin() as conn:
+                conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DBAPIError as e:
+            logger.error(f"Search index not built, extension pg_trgm is not available (CREATE EXTENSION pg_trgm "
+                         f"as a superuser once): {e}")
+            return 0
+
+    insert = text(f"INSERT INTO {BUILD_TABLE} (kind, record_id, label, content) "
+                  f"VALUES (:kind, :record_id, :label, :content)")
+    entries = 0
+    with engine.begin() as conn:
+        try:
+            _create_build_table(conn)
+        except OperationalError as e:
+            logger.error(f"Search index not built, full text search is not available: {e}")
+            return 0
+        for kind, (model, columns, label_columns) in SEARCH_SOURCES.items():
+            table = model.__table__
+            source = table
+            if "postal_address_id" in table.c:
+                postal = PostalAddress.__table__
+                source = table.outerjoin(postal, postal.c.internal_id == table.c.postal_address_id)
+            selected = [table.c.internal_id] + [(table.c[name] if name in table.c else postal.c[name]).label(name)
+                                                for name in dict.fromkeys(columns + label_columns)]
+            last_id = None
+            while True:
+                # Seitenweise über den Primärschlüssel, jede Seite wird vor dem Schreiben vollständig gelesen
+                statement = select(*selected).select_from(source).order_by(table.c.internal_id).limit(BATCH_SIZE)
+                if last_id is not None:
+                    statement = statement.where(table.c.internal_id > last_id)
+                rows = conn.execute(statement).mappings().all()
+                if not rows:
+                    break
+                conn.execute(insert, [{
+                    "kind": kind,
+                    "record_id": row["internal_id"],
+                    "label": " ".join(str(row[name]) for name in label_columns if row[name]),
+                    "content": normalize_search_text(" ".join(str(row[name]) for name in columns if row[name])),
+                } for row in rows])
+                entries += len(rows)
+                last_id = rows[-1]["internal_id"]
+        if dialect == "postgresql":
+            conn.exec_driver_sql(f"CREATE INDEX ix_{BUILD_TABLE}_content ON {BUILD_TABLE} "
+                                 f"USING gin (content gin_trgm_ops)")
+    _swap_search_table(engine)
+    logger.info(f"Search index: {entries} entries.")
+    return entries
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _trigrams(words: list) -> list:
+    return list(dict.fromkeys(word[i:i + 3] for word in words for i in range(len(word) - 2)))
+
+
+def _search_statements(dialect: str, words: list, fuzzy: bool, kind_filter: str) -> list:
+    # Abfragen in absteigender Genauigkeit: erst alle Wörter als Teilzeichenkette, dann unscharf
+    long_words = [word for word in words if len(word) >= MIN_WORD_LENGTH]
+    patterns = {f"word_{number}": f"%{word}%" for number, word in enumerate(words)}
+    where = " AND ".join(f"content LIKE :{name}" for name in patterns)
+    statements = []
+    if dialect == "sqlite" and long_words:
+        # Lange Wörter über den Trigramm-Index, kurze (z.B. Hausnummern) als Filter auf den Treffern
+        short_filter = "".join(f" AND content LIKE :word_{number}" for number, word in enumerate(words)
+                               if len(word) < MIN_WORD_LENGTH)
+        ranked = f"SELECT kind, record_id, label, -bm25({SEARCH_TABLE}) AS score FROM {SEARCH_TABLE} " \
+                 f"WHERE {SEARCH_TABLE} MATCH :match{{}}{kind_filter} ORDER BY bm25({SEARCH_TABLE}) LIMIT :limit"
+        statements.append((ranked.format(short_filter),
+                           {**patterns, "match": " AND ".join(_quote(word) for word in long_words)}))
+        if fuzzy:
+            # Tippfehler: Treffer mit möglichst vielen gemeinsamen (seltenen) Trigrammen zuerst
+            fuzzy_match = " OR ".join(_quote(gram) for gram in _trigrams(long_words))
+            statements.append((ranked.format(""), {"match": fuzzy_match}))
+        return statements
+
+    if dialect == "postgresql":
+        score = "word_similarity(:query, content)"
+        statements.append((f"SELECT kind, record_id, label, {score} AS score FROM {SEARCH_TABLE} "
+                           f"WHERE {where}{kind_filter} ORDER BY score DESC LIMIT :limit", patterns))
+        if fuzzy:
+            statements.append((f"SELECT kind, record_id, label, {score} AS score FROM {SEARCH_TABLE} "
+                               f"WHERE :query <% content{kind_filter} ORDER BY score DESC LIMIT :limit", {}))
+        return statements
+    statements.append((f"SELECT kind, record_id, label, 1.0 AS score FROM {SEARCH_TABLE} "
+                       f"WHERE {where}{kind_filter} LIMIT :limit", patterns))
+    return statements
+
+
+def search_index(session, query: str, kinds: list = None, limit: int = 20, fuzzy: bool = True) -> list:
+    words = normalize_search_text(query).split()
+    if not words:
+        return []
+    kind_filter = " AND kind IN :kinds" if kinds else ""
+    hits = {}
+    for sql, params in _search_statements(session.bind.dialect.name, words, fuzzy, kind_filter):
+        statement = text(sql)
+        if kinds:
+            statement = statement.bindparams(bindparam("kinds", expanding=True))
+            params = {**params, "kinds": list(kinds)}
+        params = {**params, "query": " ".join(words), "limit": limit + len(hits)}
+        for kind, record_id, label, score in session.execute(statement, params):
+            if len(hits) < limit:
+                hits.setdefault((kind, record_id), SearchHit(kind, record_id, label, score))
+        if len(hits) >= limit:
+            break
+    return list(hits.values())
+
+
+def load_instances(session, hits: list):
+    # Eine Abfrage je Art statt einer je Treffer
+    for kind, (model, _, _) in SEARCH_SOURCES.items():
+        kind_hits = [hit for hit in hits if hit.kind == kind]
+        if not kind_hits:
+            continue
+        instances = {instance.internal_id: instance for instance in session.scalars(
+            select(model).where(model.internal_id.in_([hit.record_id for hit in kind_hits])))}
+        for hit in kind_hits:
+            hit.instance = instances.get(hit.record_id)
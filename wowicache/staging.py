@@ -0,0 +1,98 @@
+import logging
+from sqlalchemy import MetaData, Table, Column, ForeignKey
+from wowicache.models import Base
+
+logger = logging.getLogger('root')
+
+STAGING_PREFIX = "wowi_stage_"
+RETIRED_PREFIX = "wowi_old_"
+# Verwaltungstabellen des Syncs, die nicht mit neu aufgebaut werden
+UNSTAGED_TABLES = {"wowi_sync_checkpoints", "wowi_sync_generation"}
+
+
+def staging_name(table_name: str) -> str:
+    return STAGING_PREFIX + table_name[len("wowi_"):]
+
+
+def retired_name(table_name: str) -> str:
+    return RETIRED_PREFIX + table_name[len("wowi_"):]
+
+
+def build_staging_tables(metadata: MetaData = Base.metadata) -> dict:
+    # Kopien aller Cache-Tabellen, deren Fremdschlüssel auf die jeweils anderen Staging-Tabellen zeigen
+    staging_metadata = MetaData()
+    tables = {}
+    for table in metadata.sorted_tables:
+        if table.name in UNSTAGED_TABLES:
+            continue
+        columns = []
+        for column in table.columns:
+            foreign_keys = [ForeignKey(f"{staging_name(fk.column.table.name)}.{fk.column.name}")
+                            for fk in column.foreign_keys]
+            columns.append(Column(column.name, column.type, *foreign_keys,
+                                  primary_key=column.primary_key, nullable=column.nullable))
+        tables[table] = Table(staging_name(table.name), staging_metadata, *columns)
+    return tables
+
+
+def enable_concurrent_reads(engine):
+    # Im WAL-Modus blockiert der schreibende Sync keine lesenden Verbindungen (nur sqlite, bleibt in der Datei)
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            mode = conn.exec_driver_sql("PRAGMA journal_mode=WAL").scalar()
+        logger.info(f"SQLite journal mode: {mode}")
+
+
+def create_staging_tables(engine, keep_existing: bool = False) -> dict:
+    tables = build_staging_tables()
+    staging_metadata = next(iter(tables.values())).metadata
+    # Reste eines abgebrochenen Laufs verwerfen, außer dieser Lauf setzt ihn fort
+    if not keep_existing:
+        staging_metadata.drop_all(bind=engine)
+    staging_metadata.create_all(bind=engine)
+    logger.info(f"Created {len(tables)} staging tables.")
+    return tables
+
+
+def swap_staging_tables(engine, tables: dict):
+    live_tables = list(tables.keys())
+    renames = []
+    for table in live_tables:
+        renames.append((table.name, retired_name(table.name)))
+        renames.append((tables[table].name, table.name))
+    drops = [retired_name(table.name) for table in reversed(live_tables)]
+
+    preparer = engine.dialect.identifier_preparer
+    if engine.dialect.name == "mysql":
+        # RENAME TABLE mit mehreren Paaren ist in MySQL/MariaDB atomar
+        statement = "RENAME TABLE " + ", ".join(f"{preparer.quote(old)} TO {preparer.quote(new)}"
+                                                for old, new in renames)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(statement)
+            for name in drops:
+                conn.exec_driver_sql(f"DROP TABLE {preparer.quote(name)}")
+    elif engine.dialect.name == "sqlite":
+        # pysqlite öffnet vor DDL keine Transaktion, deshalb explizit, damit Leser nur alt oder neu sehen
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.execute("PRAGMA legacy_alter_table=OFF")
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for old, new in renames:
+                    cursor.execute(f"ALTER TABLE {preparer.quote(old)} RENAME TO {preparer.quote(new)}")
+                for name in drops:
+                    cursor.execute(f"DROP TABLE {preparer.quote(name)}")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        finally:
+            raw.close()
+    else:
+        with engine.begin() as conn:
+            for old, new in renames:
+                conn.exec_driver_sql(f"ALTER TABLE {preparer.quote(old)} RENAME TO {preparer.quote(new)}")
+            for name in drops:
+                conn.exec_driver_sql(f"DROP TABLE {preparer.quote(name)}")
+    logger.info(f"Swapped {len(live_tables)} staging tables into place.")
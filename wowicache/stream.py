@@ -0,0 +1,71 @@
+import os
+import sys
+
+# OPENWOWI liefert maximal 100 Einträge pro Seite
+PAGE_SIZE = 100
+
+
+def fetch_pages(fetch, streaming: bool, page_size: int = PAGE_SIZE, start_offset: int = 0, **kwargs):
+    if not streaming:
+        yield fetch(fetch_all=True, **kwargs)[start_offset:]
+        return
+
+    offset = start_offset
+    while True:
+        page = fetch(limit=page_size, offset=offset, **kwargs)
+        if page:
+            yield page
+        if len(page) < page_size:
+            break
+        offset += page_size
+
+
+def current_rss_mb() -> float | None:
+    # Linux: aktuelle RSS aus /proc, sonst Höchststand über resource (nicht unter Windows verfügbar)
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return max_rss / 1024 / 1024
+    return max_rss / 1024
+
+
+def peak_rss_mb() -> float | None:
+    # Höchststand des gesamten Prozesses (Linux: VmHWM), sonst über resource
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return max_rss / 1024 / 1024
+    return max_rss / 1024
+
+
+class PeakMemory:
+    def __init__(self):
+        self.peak_mb = None
+
+    def sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def __repr__(self):
+        if self.peak_mb is None:
+            return "Peak RSS n/a"
+        return f"Peak RSS {self.peak_mb:.1f} MB"
@@ -0,0 +1,235 @@
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace as Record
+
+# Anzahl Datensätze je Endpunkt im Verhältnis zur Zahl der Nutzungseinheiten (scale)
+SCALE_RATIOS = {
+    "economic_units": 1 / 40,
+    "buildings": 1 / 8,
+    "use_units": 1,
+    "persons": 6 / 5,
+    "contracts": 3 / 2,
+    "memberships": 3 / 5,
+}
+DISTRICT_NAMES = ["Mitte", "Nord", "Süd", "Ost", "West", "Altstadt", "Neustadt", "Hafen", "Am Park", "Gartenstadt",
+                  "Bahnhofsviertel", "Oberdorf"]
+STREETS = ["Hauptstraße", "Schulstraße", "Gartenstraße", "Bahnhofstraße", "Dorfstraße", "Bergstraße", "Birkenweg",
+           "Lindenstraße", "Kirchstraße", "Waldstraße", "Ringstraße", "Schillerstraße", "Goethestraße", "Am Markt",
+           "Mühlenweg", "Wiesenweg", "Rosenstraße", "Friedhofstraße", "Feldstraße", "Parkstraße"]
+TOWNS = [("10115", "Berlin"), ("20095", "Hamburg"), ("50667", "Köln"), ("04109", "Leipzig"), ("44135", "Dortmund"),
+         ("28195", "Bremen"), ("01067", "Dresden"), ("30159", "Hannover")]
+FIRST_NAMES = ["Anna", "Peter", "Maria", "Thomas", "Sabine", "Michael", "Julia", "Andreas", "Laura", "Stefan", "Emma",
+               "Jan", "Sophie", "Markus", "Lea", "Frank", "Mia", "Jürgen", "Hannah", "Uwe"]
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker", "Schulz", "Hoffmann",
+              "Koch", "Richter", "Klein", "Wolf", "Schröder", "Neumann", "Schwarz", "Zimmermann", "Braun", "Krüger"]
+COMPANY_SUFFIXES = ["GmbH", "GmbH & Co. KG", "e.V.", "AG", "eG"]
+BUILDING_TYPES = [(1, "Mehrfamilienhaus"), (2, "Reihenhaus"), (3, "Hochhaus"), (4, "Geschäftshaus")]
+USAGE_TYPES = [(1, "Wohnung"), (1, "Wohnung"), (1, "Wohnung"), (2, "Gewerbe"), (3, "Garage"), (4, "Stellplatz")]
+FINANCING_TYPES = [(1, "frei finanziert"), (2, "öffentlich gefördert")]
+POSITIONS = [(1, "links"), (2, "rechts"), (3, "Mitte")]
+COMMUNICATION_TYPES = [(1, "Telefon"), (3, "Mobil"), (4, "E-Mail")]
+CONTRACTOR_TYPES = [(1, "Hauptmieter"), (2, "Mitmieter")]
+BASE_DATE = date(1990, 1, 1)
+
+
+def _pick(values: list, number: int, salt: int = 0):
+    # Deterministische, gut gestreute Auswahl ohne Zufallsgenerator je Datensatz
+    return values[(number * 2654435761 + salt * 40503) % len(values)]
+
+
+def _day(number: int, salt: int = 0, span: int = 12000) -> str:
+    return (BASE_DATE + timedelta(days=(number * 7919 + salt * 104729) % span)).isoformat()
+
+
+class SyntheticWowiPy:
+    # Ersatz für WowiPy mit denselben Abrufmethoden. Die Daten werden je Seite aus der laufenden Nummer
+    # erzeugt, auch bei einer Million Nutzungseinheiten liegt nie der ganze Bestand im Speicher.
+    def __init__(self, scale: int = 10000, latency: float = 0.0, **kwargs):
+        self.scale = scale
+        self.latency = latency
+        self.counts = {name: max(1, int(scale * ratio)) for name, ratio in SCALE_RATIOS.items()}
+        # Ein Hauptmieter je Vertrag, jeder vierte Vertrag hat zusätzlich einen Mitmieter
+        self.counts["contractors"] = self.counts["contracts"] + self.counts["contracts"] // 4
+        # Zahlungsweisen nur für laufende Verträge (Abruf mit Stichtag)
+        self.counts["payment_modes"] = self.counts["use_units"]
+
+    def _page(self, name: str, build, fetch_all: bool, limit: int, offset: int) -> list:
+        if self.latency:
+            time.sleep(self.latency)
+        count = self.counts[name]
+        if fetch_all:
+            start, end = 0, count
+        else:
+            start, end = offset, min(offset + (limit or 100), count)
+        return [build(number) for number in range(start + 1, end + 1)]
+
+    def _address(self, number: int) -> Record:
+        postcode, town = _pick(TOWNS, number, 1)
+        street = _pick(STREETS, number, 2)
+        house_number = str(1 + number % 120)
+        addition = "a" if number % 17 == 0 else None
+        return Record(zip_=postcode, town=town, street=street, house_number=house_number,
+                      house_number_addition=addition, country_id=1, country_code="DE",
+                      street_complete=f"{street} {house_number}{addition or ''}",
+                      house_number_complete=f"{house_number}{addition or ''}")
+
+    def get_districts(self, **kwargs) -> list:
+        return [Record(id_=number, name=name) for number, name in enumerate(DISTRICT_NAMES, start=1)]
+
+    def get_economic_units(self, fetch_all: bool = False, limit: int = 100, offset: int = 0, **kwargs) -> list:
+        def build(number):
+            return Record(id_=number, id_num=f"{number:04d}", company_code=Record(id_=1 + number % 2),
+                          name=f"WE {number:04d} {_pick(STREETS, number)}", location=_pick(TOWNS, number)[1],
+                          construction_year=1950 + number % 70, info=None, owner=Record(id_=1),
+                          district=Record(id_=1 + number % len(DISTRICT_NAMES)) if number % 5 else None)
+        return self._page("economic_units", build, fetch_all, limit, offset)
+
+    def get_building_lands(self, fetch_all: bool = False, limit: int = 100, offset: int = 0, **kwargs) -> list:
+        economic_units = self.counts["economic_units"]
+
+        def build(number):
+            economic_unit_id = 1 + number % economic_units
+            type_id, type_name = _pick(BUILDING_TYPES, number)
+            return Record(id_=number, id_num=f"{economic_unit_id:04d}.{number:05d}", company_code=Record(id_=1),
+                          building_land_type="Building", entry_date=_day(number, 1),
+                          economic_unit=Record(id_=economic_unit_id), estate_address=self._address(number),
+                          building=Record(district=Record(id_=1 + number % len(DISTRICT_NAMES))
+                                          if number % 4 else None,
+                                          move_in_date=_day(number, 2) if number % 3 else None,
+                                          construction_year=1950 + number % 70,
+                                          building_type=Record(id_=type_id, name=type_name)))
+        return self._page("buildings", build, fetch_all, limit, offset)
+
+    def get_use_units(self, fetch_all: bool = False, limit: int = 100, offset: int = 0, **kwargs) -> list:
+        buildings = self.counts["buildings"]
+        economic_units = self.counts["economic_units"]
+
+        def build(number):
+            building_id = 1 + number % buildings
+            usage_id, usage_name = _pick(USAGE_TYPES, number)
+            financing = _pick(FINANCING_TYPES, number) if number % 3 else None
+            position = _pick(POSITIONS, number) if usage_id == 1 else None
+            floor = number % 6
+            space = 35.0 + (number * 37) % 90
+            return Record(id_=number, id_num=f"{building_id:05d}.{number:07d}", company_code=Record(id_=1),
+                          entry_date=_day(number, 3), building_land=Record(id_=building_id),
+                          economic_unit=Record(id_=1 + building_id % economic_units),
+                          estate_address=self._address(building_id),
+                          financing_type=Record(id_=financing[0], name=financing[1]) if financing else None,
+                          current_use_unit_type=Record(use_unit_usage_type=Record(id_=usage_id, name=usage_name)),
+                          usable_space=space, living_space=space if usage_id == 1 else None, heating_space=space,
+                          number_of_rooms=1 + number % 5, number_of_half_rooms=number % 2,
+                          description_of_position=position[1] if position else None,
+                          management_start=_day(number, 4), management_end=None,
+                          move_in_date=_day(number, 5), exit_date=_day(number, 6) if number % 50 == 0 else None,
+                          position=Record(id_=position[0], name=position[1]) if position else None,
+                          floor=Record(id_=floor, name=f"{floor}. OG" if floor else "EG", level_to_ground=floor))
+        return self._page("use_units", build, fetch_all, limit, offset)
+
+    def get_persons(self, fetch_all: bool = False, limit: int = 100, offset: int = 0, **kwargs) -> list:
+        def build(number):
+            natural = number % 10 != 0
+            last_name = _pick(LAST_NAMES, number, 1)
+            first_name = _pick(FIRST_NAMES, number, 2) if natural else None
+            name = f"{last_name}, {first_name}" if natural else f"{last_name} {_pick(COMPANY_SUFFIXES, number)}"
+            addresses = []
+            for position in range(1 + number % 2):
+                address = self._address(number * 3 + position)
+                addresses.append(Record(id_=number * 10 + position, zip_=address.zip_, town=address.town,
+                                        street=address.street, house_number=address.house_number,
+                                        house_number_addition=address.house_number_addition,
+                                        country=Record(id_=1, code="DE"), street_complete=address.street_complete,
+                                        house_number_complete=address.house_number_complete,
+                                        address_type=Record(id_=1 + position, name="Post" if position else "Haupt"),
+                                        valid_from=_day(number, 7 + position), valid_to=None))
+            communications = []
+            for position in range(1 + number % 3):
+                type_id, type_name = COMMUNICATION_TYPES[position]
+                if type_id == 4:
+                    content = f"{last_name.lower()}.{number}@example.org"
+                elif type_id == 3:
+                    content = f"+49 1{(number * 7) % 100:02d} {number:07d}"
+                else:
+                    content = f"0{30 + number % 70} {number * 13 % 9000000 + 1000000}"
+                communications.append(Record(id_=number * 10 + position, related_address_id=None, content=content,
+                                             explanation=None, communication_type=Record(id_=type_id,
+                                                                                         name=type_name)))
+            return Record(id_=number, id_num=f"P{number:07d}", name=name, shortname=last_name,
+                          valid_from=_day(number, 9), valid_to=None,
+                          legal_person=Record(long_name1=None if natural else name, long_name2=None, vat_id=None,
+                                              commercial_register_number=None if natural else f"HRB {number}",
+                                              commercial_register_town=None),
+                          natural_person=Record(first_name=first_name, last_name=last_name if natural else None,
+                                                birth_date=_day(number, 10, 25000) if natural else None,
+                                                gender=Record(id_=1 + number % 2,
+                                                              name="weiblich" if number % 2 else "männlich")
+                                                if natural else None,
+                                                death_date=None, title="Dr." if number % 97 == 0 else None),
+                          addresses=addresses, communications=communications)
+        return self._page("persons", build, fetch_all, limit, offset)
+
+    def get_license_agreements(self, fetch_all: bool = False, limit: int = 100, offset: int = 0, **kwargs) -> list:
+        use_units = self.counts["use_units"]
+
+        def build(number):
+            # Die ersten scale Verträge laufen, alle weiteren sind beendete Vorverträge derselben Einheiten
+            ended = number > use_units
+            vacancy = number % 25 == 0
+            return Record(id_=number, id_num=f"V{number:08d}", use_unit=Record(id_=1 + (number - 1) % use_units),
+                          restriction_of_use=Record(id_=2 if vacancy else 1,
+                                                    name="Leerstand" if vacancy else "Vermietung",
+                                                    is_vacancy=vacancy),
+                          status_contract=Record(id_=2 if ended else 1, name="beendet" if ended else "aktiv"),
+                          life_of_contract=Record(id_=1, name="unbefristet"),
+                          start_contract=f"{_day(number, 11, 9000)} 00:00:00",
+                          end_of_contract=f"{_day(number, 12, 3000)} 00:00:00" if ended else None,
+                          banking=Record(virtual_iban=f"DE{number:020d}", collective_account=Record(bic="GENODEF1XXX"))
+                          if number % 4 else None)
+        return self._page("contracts", build, fetch_all, limit, offset)
+
+    def get_contractors(self, fetch_all: bool = False, limit: int = 100, offset: int = 0, **kwargs) -> list:
+        use_units = self.counts["use_units"]
+        persons = self.counts["persons"]
+        contracts = self.counts["contracts"]
+
+        def build(number):
+            contract_id = 1 + (number - 1) % contracts
+            second = number > contracts
+            type_id, type_name = CONTRACTOR_TYPES[1 if second else 0]
+            return Record(id_=number, license_agreement_id=contract_id,
+                          use_unit=Record(id_=1 + (contract_id - 1) % use_units),
+                          person=Record(id_=1 + (number * 7) % persons),
+                          contractor_type=Record(id_=type_id, name=type_name),
+                          contractual_use_valid_from=_day(contract_id, 11, 9000),
+                          contractual_use_valid_to=_day(contract_id, 12, 3000) if contract_id > use_units else None)
+        return self._page("contractors", build, fetch_all, limit, offset)
+
+    def get_memberships(self, fetch_all: bool = False, limit: int = 100, offset: int = 0, **kwargs) -> list:
+        persons = self.counts["persons"]
+
+        def build(number):
+            person_id = 1 + (number * 3) % persons
+            ended = number % 20 == 0
+            return Record(id_=number, id_num=f"M{number:07d}", creation_date=_day(number, 13),
+                          valid_from=_day(number, 13), valid_to=_day(number, 14) if ended else None,
+                          is_payout_block_account=False, cooperative_account_clearing_lock=number % 50 == 0,
+                          subsidy_application_for_several_fiscal_years_allowed=False,
+                          no_participation_electoral_district=False, active_amount_sum=100.0 * (1 + number % 3),
+                          active_count_sum=1 + number % 3, membership_status_id=2 if ended else 1,
+                          membership_status_code="BEENDET" if ended else "AKTIV",
+                          electoral_district_id=1 + number % 5, electoral_district_code=f"WB{1 + number % 5}",
+                          membership_end_reason_id=1 if ended else None,
+                          membership_end_reason_code="KUENDIGUNG" if ended else None, description=None,
+                          active_main_member_person_id=person_id, active_main_member_person_id_num=f"P{person_id:07d}")
+        return self._page("memberships", build, fetch_all, limit, offset)
+
+    def get_payment_modes(self, fetch_all: bool = False, limit: int = 100, offset: int = 0, **kwargs) -> list:
+        def build(number):
+            sepa = number % 3 != 0
+            return Record(id_=number, license_agreement=Record(id_=number), active_from=_day(number, 11, 9000),
+                          active_to=None, mode_id=1 if sepa else 2, mode_name="Lastschrift" if sepa else "Überweisung",
+                          type_id=1, type_name="Miete", sepa_id=number if sepa else None,
+                          sepa_iban=f"DE{number * 31:020d}" if sepa else None,
+                          sepa_mandate_id=f"MANDAT{number:08d}" if sepa else None, bank_account_id=number,
+                          bank_account_bic="GENODEF1XXX", bank_account_iban=f"DE{number * 31:020d}")
+        return self._page("payment_modes", build, fetch_all, limit, offset)
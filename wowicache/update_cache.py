@@ -2,14 +2,29 @@ import sys
 import os
 from dotenv import dotenv_values
 from wowipy.wowipy import WowiPy
-from wowipy.models import Banking, CollectiveAccount
 from wowicache import log
-import sqlalchemy.exc
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from wowicache.models import Base, EconomicUnit, District, Building, UseUnit, Address, Communication, Person, Contract
-from wowicache.models import Contractor, Membership, PaymentMode
+from wowicache.models import Contractor, Membership, PaymentMode, SyncFingerprint, SyncGeneration, PostalAddress
 from wowicache.rescue import backup_database, restore_last_backup
+from wowicache.loader import create_writer, SYNC_MODE_DELTA
+from wowicache.scheduler import FetchScheduler
+from wowicache.staging import enable_concurrent_reads, create_staging_tables, swap_staging_tables
+from wowicache.queries import normalize_phone, PHONE_TYPES
+from wowicache.phones import canonical_phone, reversed_digits, PHONE_COUNTRY_CODE
+from wowicache.schema import add_missing_columns, find_obsolete_columns, fill_legacy_columns
+from wowicache.occupancy import build_current_occupancy
+from wowicache.search import build_search_index
+from wowicache.postal import map_postal_address
+from wowicache.categories import map_categories, CATEGORY_MODELS
+from wowicache.mappers import map_district, map_economic_unit, map_building, map_use_unit, map_person, map_address
+from wowicache.mappers import map_communication, map_contract, map_contractor, map_membership, map_payment_mode
+from wowicache.indexes import parse_custom_indexes, drop_indexes, create_indexes, verify_index_usage
+from wowicache.report import SyncReport
+from wowicache.backends import create_backend
+from wowicache.checkpoints import Checkpoints
+from wowicache.export import export_cache, parse_sources
 from datetime import datetime
 
 ENBUILDINGS = 1
@@ -27,6 +42,11 @@ def handle_unhandled_exception(exc_type, exc_value, exc_traceback):
         sys.__excepthook__(exc_type, exc_value, exc_traceback)
         return
     logger.critical("Unhandled exception", exc_info=(exc_type, exc_value, exc_traceback))
+    str_resume = settings.get("resume_sync")
+    if str_resume is not None and str_resume.lower() == "true":
+        # Teilweise geladene Daten und Checkpoints bleiben stehen, der nächste Lauf setzt dort fort
+        logger.error("Backup not restored, the next run resumes from the last checkpoint.")
+        return
     backup_path = settings.get("backup_path")
     connection_string = settings.get("db_connection_string")
     restore_result = restore_last_backup(backup_path, connection_string)
@@ -46,12 +66,20 @@ logger = log.setup_custom_logger('root', settings.get("log_method", "file"),
 sys.excepthook = handle_unhandled_exception
 
 
-def cache_to_db():
+def cache_to_db(env_file: str = None, client_class=None):
+    global settings
+    if env_file is not None:
+        settings = dotenv_values(env_file)
+    if client_class is None:
+        client_class = WowiPy
     logger.info("cache_to_db started.")
     connection_string = settings.get("db_connection_string")
     rescue_path = settings.get("backup_path")
     if rescue_path:
-        backup_database(connection_string, rescue_path)
+        str_backup_incremental = settings.get("backup_incremental")
+        backup_database(connection_string, rescue_path, int(settings.get("backup_keep", 7)),
+                        int(settings.get("backup_compression_level", 6)),
+                        str_backup_incremental is not None and str_backup_incremental.lower() == "true")
 
     wowi_host = settings.get("wowi_host")
     wowi_user = settings.get("wowi_user")
@@ -67,6 +95,29 @@ def cache_to_db():
     str_en_memberships = settings.get("enable_memberships")
     str_en_payment_modes = settings.get("enable_payment_modes")
 
+    load_mode = settings.get("load_mode", "orm")
+    sync_mode = settings.get("sync_mode", "full")
+    bulk_chunk_size = int(settings.get("bulk_chunk_size", 5000))
+    str_streaming = settings.get("streaming")
+    streaming = str_streaming is not None and str_streaming.lower() == "true"
+    fetch_workers = int(settings.get("fetch_workers", 0))
+    str_staging = settings.get("staging_rebuild")
+    staging = str_staging is not None and str_staging.lower() == "true"
+    custom_indexes = parse_custom_indexes(settings.get("custom_indexes"))
+    str_verify_indexes = settings.get("verify_indexes")
+    str_occupancy = settings.get("current_occupancy")
+    str_search = settings.get("search_index")
+    phone_country_code = settings.get("phone_country_code") or PHONE_COUNTRY_CODE
+    run_report_path = settings.get("run_report_path")
+    load_backend = settings.get("load_backend", "auto")
+    str_resume = settings.get("resume_sync")
+    resume = str_resume is not None and str_resume.lower() == "true"
+    export_path = settings.get("export_path")
+    export_format = settings.get("export_format", "parquet")
+    export_sources = parse_sources(settings.get("export_sources"))
+    export_batch_size = int(settings.get("export_batch_size", 50000))
+    export_partition_by = settings.get("export_partition_by") or None
+
     user_agent = settings.get("user_agent")
     if user_agent is None or len(user_agent.strip()) == 0:
         user_agent = "WowiCache/1.0"
@@ -89,390 +140,300 @@ def cache_to_db():
     if str_en_payment_modes is not None and str_en_payment_modes.lower() == "true":
         entities.append(ENPAYMENTMODES)
 
+    # Für Contractors benötigen wir auch Personen
+    if ENCONTRACTORS in entities and ENPERSONS not in entities:
+        entities.append(ENPERSONS)
+
+    # Für Contractors brauchen wir auch Contracts
+    if ENCONTRACTORS in entities and ENCONTRACTS not in entities:
+        entities.append(ENCONTRACTS)
+
     logger.info(f"Entities activated: {entities}")
 
-    wowicon = WowiPy(hostname=wowi_host, user=wowi_user,
-                     password=wowi_pass, api_key=wowi_key,
-                     user_agent=user_agent)
+    def create_client():
+        return client_class(hostname=wowi_host, user=wowi_user,
+                            password=wowi_pass, api_key=wowi_key,
+                            user_agent=user_agent)
+
+    report = SyncReport({"load_mode": load_mode, "sync_mode": sync_mode, "streaming": streaming,
+                         "fetch_workers": fetch_workers, "staging_rebuild": staging, "entities": entities})
 
     engine = create_engine(connection_string, echo=False, pool_pre_ping=True)
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    find_obsolete_columns(engine)
+    backend = create_backend(engine, load_backend)
+    backend.prepare()
     Session = sessionmaker(bind=engine)
     session = Session()
 
-    session.query(Contractor).delete()
-    session.query(Contract).delete()
-    session.query(Communication).delete()
-    session.query(Address).delete()
-    session.query(Person).delete()
-    session.query(UseUnit).delete()
-    session.query(Building).delete()
-    session.query(EconomicUnit).delete()
-    session.query(District).delete()
-    session.query(Membership).delete()
-    session.query(PaymentMode).delete()
-    session.commit()
+    checkpoints = None
+    resuming = False
+    if resume:
+        if sync_mode.lower() == SYNC_MODE_DELTA:
+            logger.warning("resume_sync is ignored in delta mode, the next delta run only repeats changes.")
+        else:
+            checkpoints = Checkpoints(session)
+            resuming = bool(checkpoints.load())
+            if resuming:
+                logger.warning(f"Resuming interrupted sync: {checkpoints.progress}")
+
+    # Abrufe in Ladereihenfolge (Fremdschlüssel) einreihen. Mit fetch_workers > 0 laufen sie parallel
+    # in eigenen Threads mit eigenem WowiPy-Client, geschrieben wird trotzdem in dieser Reihenfolge.
+    fetcher = FetchScheduler(create_client, streaming, fetch_workers)
+
+    def submit(name: str, method_name: str, paged: bool = True, **kwargs):
+        # Entitäten, die ein abgebrochener Lauf vollständig geladen hat, nicht erneut abrufen
+        if checkpoints is not None and checkpoints.is_done(name):
+            return
+        start_offset = checkpoints.start_offset(name) if checkpoints is not None else 0
+        fetcher.submit(name, method_name, paged, start_offset, **kwargs)
 
     if ENECONOMICUNITS in entities or ENBUILDINGS in entities:
-        sectioncount = 0
-        districts = wowicon.get_districts()
-        for entry in districts:
-            new_entry = District(internal_id=entry.id_,
-                                 name=entry.name)
-            session.add(new_entry)
-            sectioncount += 1
-        session.commit()
-        logger.info(f"Added {sectioncount} districts.")
+        submit("districts", "get_districts", paged=False)
+    if ENECONOMICUNITS in entities:
+        submit("economic_units", "get_economic_units")
+    if ENBUILDINGS in entities:
+        submit("buildings", "get_building_lands")
+    if ENUSEUNITS in entities:
+        submit("use_units", "get_use_units")
+    if ENPERSONS in entities:
+        submit("persons", "get_persons")
+    if ENCONTRACTS in entities:
+        submit("contracts", "get_license_agreements")
+    if ENCONTRACTORS in entities:
+        submit("contractors", "get_contractors")
+    if ENMEMBERSHIPS in entities:
+        submit("memberships", "get_memberships")
+    if ENPAYMENTMODES in entities:
+        submit("payment_modes", "get_payment_modes", license_agreement_active_on=datetime.now(),
+               payment_mode_active_on=datetime.now())
+
+    staging_tables = None
+    if staging:
+        if sync_mode.lower() == SYNC_MODE_DELTA:
+            logger.warning("staging_rebuild is ignored in delta mode, changes are applied in place.")
+        else:
+            # Neuaufbau in Staging-Tabellen, Leser sehen bis zum Tausch am Ende den alten Stand
+            with report.phase("prepare"):
+                enable_concurrent_reads(engine)
+                staging_tables = create_staging_tables(engine, keep_existing=resuming)
+
+    writer = create_writer(session, load_mode, bulk_chunk_size, sync_mode, staging_tables, backend)
+    logger.info(f"Load mode: {writer.mode}, streaming: {streaming}, staging: {staging_tables is not None}")
+
+    # Im Delta-Modus bleibt der Bestand stehen, der Writer gleicht Zeile für Zeile ab
+    # Beim Fortsetzen sind die Tabellen bereits geleert und teilweise neu befüllt
+    if writer.mode != SYNC_MODE_DELTA and staging_tables is None and not resuming:
+        with report.phase("prepare"):
+            # Indizes erst nach dem Laden aufbauen
+            drop_indexes(engine)
+            session.query(Contractor).delete()
+            session.query(Contract).delete()
+            session.query(Communication).delete()
+            session.query(Address).delete()
+            session.query(Person).delete()
+            session.query(UseUnit).delete()
+            session.query(Building).delete()
+            session.query(PostalAddress).delete()
+            for category in CATEGORY_MODELS:
+                session.query(category).delete()
+            session.query(EconomicUnit).delete()
+            session.query(District).delete()
+            session.query(Membership).delete()
+            session.query(PaymentMode).delete()
+            session.query(SyncFingerprint).delete()
+            session.commit()
+
+    def resume_section(section, label: str, *models) -> bool:
+        # Liefert True, wenn der abgebrochene Lauf die Entität bereits vollständig geladen hat
+        if checkpoints is None or not (checkpoints.is_done(section.name) or checkpoints.start_offset(section.name)):
+            return False
+        for model in models:
+            writer.load_seen_keys(model)
+        if checkpoints.is_done(section.name):
+            logger.info(f"Skipping {label}, already loaded by the interrupted run.")
+            return True
+        section.offset = checkpoints.start_offset(section.name)
+        section.rows = checkpoints.start_rows(section.name)
+        logger.info(f"Resuming {label} at record {section.offset}.")
+        return False
+
+    def save_checkpoint(section, page: list, done: bool = False):
+        # Stand und Daten der Seite in einer Transaktion festschreiben
+        if checkpoints is None:
+            return
+        section.offset += len(page)
+        checkpoints.save(section.name, section.offset, section.rows, done)
+        writer.commit()
+
+    # Gemeinsame Adressdimension und Nachschlagetabellen, jeder Eintrag wird je Lauf nur einmal geschrieben
+    # Im Delta-Modus werden Anschriften und Bezeichnungen nur gelöscht, wenn keine Zeile mehr auf sie verweist,
+    # auch nicht aus Entitäten, die in diesem Lauf nicht geladen werden
+    writer.begin(PostalAddress, shared=True)
+    writer.begin(*CATEGORY_MODELS, shared=True)
+    if resuming:
+        for model in (PostalAddress, *CATEGORY_MODELS):
+            writer.load_seen_keys(model)
+
+    def add_postal_addresses(postal_rows: list):
+        for postal_row in postal_rows:
+            if postal_row is not None and not writer.has_key(PostalAddress, (postal_row["internal_id"],)):
+                writer.add(PostalAddress, postal_row)
+
+    def add_categories(category_rows: list):
+        for category, category_row in category_rows:
+            if not writer.has_key(category, (category_row["internal_id"],)):
+                writer.add(category, category_row)
+
+    def load_section(name: str, label: str, model, mapper, validate: bool = False, postal: bool = False):
+        section = report.section(name, label)
+        if resume_section(section, label, model):
+            return
+        writer.begin(model)
+        for page in section.pages_from(fetcher.pages(name)):
+            with section.transform:
+                rows = [mapper(entry) for entry in page]
+                postal_rows = [map_postal_address(row) for row in rows] if postal else []
+                category_rows = [category for row in rows for category in map_categories(model, row)]
+            with section.write:
+                add_postal_addresses(postal_rows)
+                add_categories(category_rows)
+                for row in rows:
+                    if writer.add(model, row, validate=validate):
+                        section.rows += 1
+                writer.end_page()
+                save_checkpoint(section, page)
+        with section.write:
+            save_checkpoint(section, [], done=True)
+            writer.commit()
+        section.done(writer.changes(model))
+        if validate:
+            section.rejected = writer.log_rejected(model, label)
+
+    if ENECONOMICUNITS in entities or ENBUILDINGS in entities:
+        load_section("districts", "districts", District, map_district)
 
     if ENECONOMICUNITS in entities:
-        sectioncount = 0
-        economic_units = wowicon.get_economic_units(fetch_all=True)
-        for entry in economic_units:
-            district_id = entry.district.id_ if entry.district else None
-            new_entry = EconomicUnit(internal_id=entry.id_,
-                                     id_num=entry.id_num,
-                                     company_id=entry.company_code.id_,
-                                     name=entry.name,
-                                     location=entry.location,
-                                     construction_year=entry.construction_year,
-                                     info=entry.info,
-                                     owner_id=entry.owner.id_,
-                                     district_id=district_id)
-            session.add(new_entry)
-            sectioncount += 1
-        session.commit()
-        logger.info(f"Added {sectioncount} economic units.")
+        load_section("economic_units", "economic units", EconomicUnit, map_economic_unit)
 
     if ENBUILDINGS in entities:
-        sectioncount = 0
-        buildings = wowicon.get_building_lands(fetch_all=True)
-        for entry in buildings:
-            district_id = entry.building.district.id_ if entry.building.district else None
-            move_in_date = datetime.strptime(str(entry.building.move_in_date), "%Y-%m-%d") \
-                if entry.building.move_in_date else None
-            entry_date = datetime.strptime(str(entry.entry_date), "%Y-%m-%d") \
-                if entry.entry_date else None
-            new_entry = Building(internal_id=entry.id_,
-                                 id_num=entry.id_num,
-                                 company_id=entry.company_code.id_,
-                                 building_land_type=entry.building_land_type,
-                                 entry_date=entry_date,
-                                 economic_unit_id=entry.economic_unit.id_,
-                                 postcode=entry.estate_address.zip_,
-                                 town=entry.estate_address.town,
-                                 street=entry.estate_address.street,
-                                 house_number=entry.estate_address.house_number,
-                                 house_number_addition=entry.estate_address.house_number_addition,
-                                 country_id=entry.estate_address.country_id,
-                                 country=entry.estate_address.country_code,
-                                 street_complete=entry.estate_address.street_complete,
-                                 house_number_complete=entry.estate_address.house_number_complete,
-                                 construction_year=entry.building.construction_year,
-                                 move_in_date=move_in_date,
-                                 building_type_id=entry.building.building_type.id_,
-                                 building_type_name=entry.building.building_type.name,
-                                 district_id=district_id)
-            session.add(new_entry)
-            sectioncount += 1
-        session.commit()
-        logger.info(f"Added {sectioncount} buildings.")
+        load_section("buildings", "buildings", Building, map_building, postal=True)
 
     if ENUSEUNITS in entities:
-        sectioncount = 0
-        use_units = wowicon.get_use_units(fetch_all=True)
-        for entry in use_units:
-            move_in_date = datetime.strptime(str(entry.move_in_date), "%Y-%m-%d") \
-                if entry.move_in_date else None
-            entry_date = datetime.strptime(str(entry.entry_date), "%Y-%m-%d") \
-                if entry.entry_date else None
-            exit_date = datetime.strptime(str(entry.exit_date), "%Y-%m-%d") \
-                if entry.exit_date else None
-            management_start = datetime.strptime(str(entry.management_start), "%Y-%m-%d") \
-                if entry.management_start else None
-            management_end = datetime.strptime(str(entry.management_end), "%Y-%m-%d") \
-                if entry.management_end else None
-            financing_type_id = entry.financing_type.id_ if entry.financing_type else None
-            financing_type = entry.financing_type.name if entry.financing_type else None
-
-            position_id = entry.position.id_ if entry.position else None
-            position = entry.position.name if entry.position else None
-
-            floor_id = entry.floor.id_ if entry.floor else None
-            floor_name = entry.floor.name if entry.floor else None
-            floor_level = entry.floor.level_to_ground if entry.floor else None
-            new_entry = UseUnit(internal_id=entry.id_,
-                                id_num=entry.id_num,
-                                company_id=entry.company_code.id_,
-                                entry_date=entry_date,
-                                building_id=entry.building_land.id_,
-                                economic_unit_id=entry.economic_unit.id_,
-                                postcode=entry.estate_address.zip_,
-                                town=entry.estate_address.town,
-                                street=entry.estate_address.street,
-                                house_number=entry.estate_address.house_number,
-                                house_number_addition=entry.estate_address.house_number_addition,
-                                country_id=entry.estate_address.country_id,
-                                country=entry.estate_address.country_code,
-                                street_complete=entry.estate_address.street_complete,
-                                house_number_complete=entry.estate_address.house_number_complete,
-                                financing_type_id=financing_type_id,
-                                financing_type=financing_type,
-                                use_unit_usage_type_id=entry.current_use_unit_type.use_unit_usage_type.id_,
-                                use_unit_usage_type=entry.current_use_unit_type.use_unit_usage_type.name,
-                                usable_space=entry.usable_space,
-                                living_space=entry.living_space,
-                                heating_space=entry.heating_space,
-                                number_of_rooms=entry.number_of_rooms,
-                                number_of_half_rooms=entry.number_of_half_rooms,
-                                description_of_position=entry.description_of_position,
-                                management_start=management_start,
-                                management_end=management_end,
-                                move_in_date=move_in_date,
-                                exit_date=exit_date,
-                                position_id=position_id,
-                                position=position,
-                                floor_id=floor_id,
-                                floor_name=floor_name,
-                                floor_level=floor_level)
-            session.add(new_entry)
-            sectioncount += 1
-        session.commit()
-        logger.info(f"Added {sectioncount} use units.")
-
-    # Für Contractors benötigen wir auch Personen
-    if ENCONTRACTORS in entities and ENPERSONS not in entities:
-        entities.append(ENPERSONS)
+        load_section("use_units", "use units", UseUnit, map_use_unit, postal=True)
 
     if ENPERSONS in entities:
-        sectioncount = 0
-        persons = wowicon.get_persons(fetch_all=True)
-        for entry in persons:
-            valid_from = datetime.strptime(str(entry.valid_from), "%Y-%m-%d") \
-                if entry.valid_from else None
-            valid_to = datetime.strptime(str(entry.valid_to), "%Y-%m-%d") \
-                if entry.valid_to else None
-            birth_date = datetime.strptime(str(entry.natural_person.birth_date), "%Y-%m-%d") \
-                if entry.natural_person.birth_date else None
-            gender_id = entry.natural_person.gender.id_ if entry.natural_person.gender else None
-            gender_name = entry.natural_person.gender.name if entry.natural_person.gender else None
-            new_person = Person(internal_id=entry.id_,
-                                id_num=entry.id_num,
-                                name=entry.name,
-                                short_name=entry.shortname,
-                                valid_from=valid_from,
-                                valid_to=valid_to,
-                                long_name_1=entry.legal_person.long_name1,
-                                long_name_2=entry.legal_person.long_name2,
-                                vat_id=entry.legal_person.vat_id,
-                                commercial_register_number=entry.legal_person.commercial_register_number,
-                                commercial_register_town=entry.legal_person.commercial_register_town,
-                                first_name=entry.natural_person.first_name,
-                                last_name=entry.natural_person.last_name,
-                                birth_date=birth_date,
-                                gender_id=gender_id,
-                                gender_name=gender_name,
-                                death_date=entry.natural_person.death_date,
-                                title=entry.natural_person.title)
-            session.add(new_person)
-            sectioncount += 1
-
-            if entry.addresses is not None:
-                for address_entry in entry.addresses:
-                    address_valid_from = datetime.strptime(str(address_entry.valid_from), "%Y-%m-%d") \
-                        if address_entry.valid_from else None
-                    address_valid_to = datetime.strptime(str(address_entry.valid_to), "%Y-%m-%d") \
-                        if address_entry.valid_to else None
-
-                    country_id = address_entry.country.id_ if address_entry.country else None
-                    country = address_entry.country.code if address_entry.country else None
-
-                    address_type_id = address_entry.address_type.id_ if address_entry.address_type else None
-                    address_type = address_entry.address_type.name if address_entry.address_type else None
-
-                    new_address = Address(internal_id=address_entry.id_,
-                                          postcode=address_entry.zip_,
-                                          town=address_entry.town,
-                                          street=address_entry.street,
-                                          house_number=address_entry.house_number,
-                                          house_number_addition=address_entry.house_number_addition,
-                                          country_id=country_id,
-                                          country=country,
-                                          street_complete=address_entry.street_complete,
-                                          house_number_complete=address_entry.house_number_complete,
-                                          address_type_id=address_type_id,
-                                          address_type=address_type,
-                                          valid_from=address_valid_from,
-                                          valid_to=address_valid_to,
-                                          person_id=new_person.internal_id)
-                    session.add(new_address)
-
-            if entry.communications is not None:
-                for comm_entry in entry.communications:
-                    type_phone = [1, 3]
-                    if comm_entry.communication_type.id_ in type_phone:
-                        if comm_entry.content is not None:
-                            comm_entry.content = comm_entry.content.replace(' ', '').strip()
-                            comm_entry.content = comm_entry.content.replace('0049', '0')
-                            comm_entry.content = comm_entry.content.replace('+49', '0')
-
-                    new_comm = Communication(internal_id=comm_entry.id_,
-                                             related_address_id=comm_entry.related_address_id,
-                                             content=comm_entry.content,
-                                             explanation=comm_entry.explanation,
-                                             communication_type_id=comm_entry.communication_type.id_,
-                                             communication_type=comm_entry.communication_type.name,
-                                             person_id=new_person.internal_id)
-                    session.add(new_comm)
-        session.commit()
-        logger.info(f"Added {sectioncount} persons.")
-
-    # Für Contractors brauchen wir auch Contracts
-    if ENCONTRACTORS in entities and ENCONTRACTS not in entities:
-        entities.append(ENCONTRACTS)
+        section = report.section("persons")
+        skip_persons = resume_section(section, "persons", Person, Address, Communication)
+        writer.begin(Person, Address, Communication)
+        for persons in [] if skip_persons else section.pages_from(fetcher.pages("persons")):
+            with section.transform:
+                person_rows = []
+                address_rows = []
+                comm_rows = []
+                for entry in persons:
+                    person_rows.append(map_person(entry))
+                    if entry.addresses is not None:
+                        address_rows.extend(map_address(address_entry, entry) for address_entry in entry.addresses)
+                    if entry.communications is not None:
+                        for comm_entry in entry.communications:
+                            comm_row = map_communication(comm_entry, entry)
+                            if comm_row["communication_type_id"] in PHONE_TYPES:
+                                # E.164 aus der Originalschreibweise, danach content wie bisher normalisieren
+                                phone_number = canonical_phone(comm_row["content"], phone_country_code)
+                                comm_row["phone_number"] = phone_number
+                                comm_row["phone_reversed"] = reversed_digits(phone_number)
+                                comm_row["content"] = normalize_phone(comm_row["content"])
+                            else:
+                                comm_row["phone_number"] = None
+                                comm_row["phone_reversed"] = None
+                            comm_rows.append(comm_row)
+                postal_rows = [map_postal_address(row) for row in address_rows]
+                category_rows = [category for row in comm_rows for category in map_categories(Communication, row)]
+            with section.write:
+                add_postal_addresses(postal_rows)
+                add_categories(category_rows)
+                for row in person_rows:
+                    writer.add(Person, row)
+                for row in address_rows:
+                    writer.add(Address, row)
+                for row in comm_rows:
+                    writer.add(Communication, row)
+                writer.end_page()
+                section.rows += len(person_rows)
+                save_checkpoint(section, persons)
+        with section.write:
+            if not skip_persons:
+                save_checkpoint(section, [], done=True)
+            writer.commit()
+        section.done(writer.changes(Person))
 
     if ENCONTRACTS in entities:
-        sectioncount = 0
-        contracts = wowicon.get_license_agreements(fetch_all=True)
-        for entry in contracts:
-            print(str(entry.start_contract))
-            contract_start = datetime.strptime(str(entry.start_contract), "%Y-%m-%d %H:%M:%S") \
-                if entry.start_contract else None
-            contract_end = datetime.strptime(str(entry.end_of_contract), "%Y-%m-%d  %H:%M:%S") \
-                if entry.end_of_contract else None
-
-            banking: Banking
-            banking = entry.banking
-            virtual_iban = None
-            virtual_bic = None
-            if banking:
-                virtual_iban = banking.virtual_iban
-                coll_acc: CollectiveAccount
-                coll_acc = banking.collective_account
-                if coll_acc:
-                    virtual_bic = coll_acc.bic
-
-            new_entry = Contract(internal_id=entry.id_,
-                                 id_num=entry.id_num,
-                                 use_unit_id=entry.use_unit.id_,
-                                 restriction_id=entry.restriction_of_use.id_,
-                                 restriction_name=entry.restriction_of_use.name,
-                                 is_vacancy=entry.restriction_of_use.is_vacancy,
-                                 status_id=entry.status_contract.id_,
-                                 status_name=entry.status_contract.name,
-                                 life_id=entry.life_of_contract.id_,
-                                 life_name=entry.life_of_contract.name,
-                                 contract_start=contract_start,
-                                 contract_end=contract_end,
-                                 virtual_iban=virtual_iban,
-                                 virtual_bic=virtual_bic)
-            session.add(new_entry)
-            sectioncount += 1
-        session.commit()
-        logger.info(f"Added {sectioncount} contracts.")
+        load_section("contracts", "contracts", Contract, map_contract)
 
     if ENCONTRACTORS in entities:
-        sectioncount = 0
-        contractors = wowicon.get_contractors(fetch_all=True)
-        for entry in contractors:
-            # end_contract = datetime.strptime(str(entry.end_of_contract), "%Y-%m-%d") \
-            #     if entry.end_of_contract else None
-            # if end_contract is not None:
-            #     print(f"ID: {entry.id_}")
-            #     # print(end_contract)
-            #     # print(datetime.now() > end_contract)
-            #     if datetime.now() > end_contract:
-            #         # print("Überspringen")
-            #         continue
-            valid_from = datetime.strptime(str(entry.contractual_use_valid_from), "%Y-%m-%d") \
-                if entry.contractual_use_valid_from else None
-            valid_to = datetime.strptime(str(entry.contractual_use_valid_to), "%Y-%m-%d") \
-                if entry.contractual_use_valid_to else None
-
-            new_entry = Contractor(internal_id=entry.id_,
-                                   contract_id=entry.license_agreement_id,
-                                   use_unit_id=entry.use_unit.id_,
-                                   person_id=entry.person.id_,
-                                   type_id=entry.contractor_type.id_,
-                                   type_name=entry.contractor_type.name,
-                                   valid_from=valid_from,
-                                   valid_to=valid_to)
-            try:
-                session.add(new_entry)
-                session.commit()
-                sectioncount += 1
-            except sqlalchemy.exc.IntegrityError:
-                logger.warning(f"Rolling back contractor")
-                session.rollback()
-
-        logger.info(f"Added {sectioncount} contractors.")
+        load_section("contractors", "contractors", Contractor, map_contractor, validate=True)
 
     if ENMEMBERSHIPS in entities:
-        sectioncount = 0
-        memberships = wowicon.get_memberships(fetch_all=True)
-        for entry in memberships:
-            new_entry = Membership(internal_id=entry.id_,
-                                   id_num=entry.id_num,
-                                   creation_date=entry.creation_date,
-                                   valid_from=entry.valid_from,
-                                   valid_to=entry.valid_to,
-                                   is_payout_block_account=entry.is_payout_block_account,
-                                   cooperative_account_clearing_lock=entry.cooperative_account_clearing_lock,
-                                   subsidy_application_for_several_fiscal_years_allowed=entry.
-                                   subsidy_application_for_several_fiscal_years_allowed,
-                                   no_participation_electoral_district=entry.no_participation_electoral_district,
-                                   active_amount_sum=entry.active_amount_sum,
-                                   active_count_sum=entry.active_count_sum,
-                                   membership_status_id=entry.membership_status_id,
-                                   membership_status_code=entry.membership_status_code,
-                                   electoral_district_id=entry.electoral_district_id,
-                                   electoral_district_code=entry.electoral_district_code,
-                                   membership_end_reason_id=entry.membership_end_reason_id,
-                                   membership_end_reason_code=entry.membership_end_reason_code,
-                                   description=entry.description,
-                                   active_main_member_person_id=entry.active_main_member_person_id,
-                                   active_main_member_person_id_num=entry.active_main_member_person_id_num)
-            try:
-                session.add(new_entry)
-                session.commit()
-                sectioncount += 1
-            except sqlalchemy.exc.IntegrityError:
-                logger.warning(f"Rolling back membership")
-                session.rollback()
-
-        logger.info(f"Added {sectioncount} memberships.")
+        load_section("memberships", "memberships", Membership, map_membership, validate=True)
 
     if ENPAYMENTMODES in entities:
-        sectioncount = 0
-        payment_modes = wowicon.get_payment_modes(fetch_all=True, license_agreement_active_on=datetime.now(),
-                                                  payment_mode_active_on=datetime.now())
-        for entry in payment_modes:
-            new_entry = PaymentMode(internal_id=entry.id_,
-                                    contract_id=entry.license_agreement.id_,
-                                    active_from=entry.active_from,
-                                    active_to=entry.active_to,
-                                    mode_id=entry.mode_id,
-                                    mode_name=entry.mode_name,
-                                    type_id=entry.type_id,
-                                    type_name=entry.type_name,
-                                    sepa_id=entry.sepa_id,
-                                    sepa_iban=entry.sepa_iban,
-                                    sepa_mandate_id=entry.sepa_mandate_id,
-                                    bank_account_id=entry.bank_account_id,
-                                    bank_account_bic=entry.bank_account_bic,
-                                    bank_account_iban=entry.bank_account_iban
-                                    )
-            try:
-                session.add(new_entry)
-                session.commit()
-                sectioncount += 1
-            except sqlalchemy.exc.IntegrityError:
-                logger.warning(f"Rolling back payment_mode")
-                session.rollback()
-
-        logger.info(f"Added {sectioncount} payment_modes.")
+        load_section("payment_modes", "payment_modes", PaymentMode, map_payment_mode, validate=True)
 
+    fetcher.close()
+    with report.phase("finish"):
+        writer.finish()
+    writer.log_stats()
+    session.close()
+    backend.restore(keep_wal=staging_tables is not None)
+    if staging_tables is None:
+        # Alte Anschrifts- und Bezeichnungsspalten bestehender Datenbanken, beim Staging-Neuaufbau entfallen sie
+        with report.phase("legacy_columns"):
+            fill_legacy_columns(engine)
+    with report.phase("create_indexes"):
+        create_indexes(engine, staging_tables, custom_indexes)
+    if str_occupancy is not None and str_occupancy.lower() == "true":
+        # Nach den Indizes, die Telefon- und E-Mail-Unterabfragen nutzen den Index auf person_id
+        with report.phase("current_occupancy"):
+            build_current_occupancy(engine, staging_tables)
+    if staging_tables is not None:
+        with report.phase("swap"):
+            swap_staging_tables(engine, staging_tables)
+    if str_search is not None and str_search.lower() == "true":
+        # Nach dem Tausch, der Suchindex wird aus den Live-Tabellen aufgebaut und ersetzt den alten atomar
+        with report.phase("search_index"):
+            build_search_index(engine)
+    if str_verify_indexes is not None and str_verify_indexes.lower() == "true":
+        with report.phase("verify_indexes"):
+            verify_index_usage(engine)
+    if checkpoints is not None:
+        # Lauf vollständig, der nächste beginnt wieder von vorn
+        checkpoints.clear()
+        session.close()
+    # Neue Generation: laufende WowiCache-Instanzen verwerfen daraufhin ihre zwischengespeicherten Objekte
+    generation = session.get(SyncGeneration, 1)
+    if generation is None:
+        session.add(SyncGeneration(1, 1))
+    else:
+        generation.generation += 1
+        generation.finished = datetime.now()
+    session.commit()
     session.close()
+    if export_path:
+        # Nachgelagerter Schritt, ein Fehler beim Export lässt den fertigen Cache unangetastet
+        with report.phase("export"):
+            try:
+                export_cache(engine, export_path, export_sources, export_format, export_batch_size,
+                             export_partition_by)
+            except (ImportError, OSError, ValueError) as e:
+                logger.error(f"Export to {export_path} failed: {e}")
+    report.finish()
+    report.log()
+    if run_report_path:
+        report.write_json(run_report_path)
     logger.info("Cache update complete.")
+    return report
 
 
 if __name__ == '__main__':